@@ -16,7 +16,12 @@ Usage:
         print(content["title"])
         # Learn from content...
         client.consume(content["id"], learned_concepts=["something new"])
+    
+    # High-rate consumers: one streaming response instead of a request per page
+    for content in client.doom_scroll(stream=True):
+        ...
 """
+import json
 import httpx
 from typing import List, Optional, Iterator
 
@@ -26,6 +31,7 @@ class AgentTubeClient:
         self.base_url = base_url.rstrip("/")
         self.api_key = api_key
         self.api_prefix = "/api/v1"
+        self.stream_cursor = None
     
     def _headers(self) -> dict:
         headers = {"Content-Type": "application/json"}
@@ -80,17 +86,66 @@ class AgentTubeClient:
         response.raise_for_status()
         return response.json()
     
+    def stream_feed(
+        self,
+        max_items: int = None,
+        content_type: str = None,
+        cursor: str = None,
+        chunk_size: int = 25,
+        exclude_consumed: bool = True
+    ) -> Iterator[dict]:
+        """
+        Stream FeedItems over a single NDJSON response.
+        
+        The server pushes items as fast as they are read, so there is no
+        round trip per page. `self.stream_cursor` holds the latest resume
+        cursor if the connection drops.
+        """
+        params = {"chunk_size": chunk_size, "exclude_consumed": exclude_consumed}
+        if max_items:
+            params["max_items"] = max_items
+        if content_type:
+            params["content_type"] = content_type
+        if cursor:
+            params["cursor"] = cursor
+        
+        with httpx.stream(
+            "GET",
+            self._url("/feed/stream"),
+            params=params,
+            headers=self._headers(),
+            timeout=httpx.Timeout(10.0, read=None)
+        ) as response:
+            response.raise_for_status()
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                data = json.loads(line)
+                if "content" in data:
+                    yield data
+                else:
+                    self.stream_cursor = data.get("next_cursor")
+    
     def doom_scroll(
         self, 
         max_items: int = None,
-        content_type: str = None
+        content_type: str = None,
+        stream: bool = False
     ) -> Iterator[dict]:
         """
         🔄 INFINITE DOOM SCROLL
         
         Yields content items one by one, automatically paginating.
         Will scroll forever unless max_items is set.
+        
+        With stream=True, items arrive over one streaming response instead
+        of a request per page (much lower overhead for fast consumers).
         """
+        if stream:
+            for item in self.stream_feed(max_items=max_items, content_type=content_type):
+                yield item["content"]
+            return
+        
         cursor = None
         count = 0
         
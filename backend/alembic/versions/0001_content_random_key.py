@@ -0,0 +1,61 @@
+"""Add content.random_key for the discover feed's random walk
+
+Revision ID: 0001_content_random_key
+Revises:
+Create Date: 2024-06-01 00:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0001_content_random_key"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+# Rows backfilled per committed batch
+BATCH_ROWS = 10000
+
+
+def upgrade() -> None:
+    if op.get_context().as_sql:
+        # Offline (--sql) scripts cannot page; emit a single backfill
+        op.execute("ALTER TABLE content ADD COLUMN IF NOT EXISTS random_key double precision")
+        op.execute("UPDATE content SET random_key = random() WHERE random_key IS NULL")
+        op.execute("CREATE INDEX IF NOT EXISTS ix_content_random_key_id ON content (random_key, id)")
+        return
+    
+    bind = op.get_bind()
+    # A fresh database gets the column from init_db's create_all
+    if not sa.inspect(bind).has_table("content"):
+        return
+    op.execute("ALTER TABLE content ADD COLUMN IF NOT EXISTS random_key double precision")
+    
+    # Backfill in id order, committing each batch, so no long lock is held on content
+    with op.get_context().autocommit_block():
+        after = None
+        while True:
+            query = "SELECT id FROM content {} ORDER BY id LIMIT :n".format(
+                "WHERE id > :after" if after is not None else ""
+            )
+            params = {"n": BATCH_ROWS} if after is None else {"n": BATCH_ROWS, "after": after}
+            ids = bind.execute(sa.text(query), params).scalars().all()
+            if not ids:
+                break
+            bind.execute(
+                sa.text(
+                    "UPDATE content SET random_key = random() "
+                    "WHERE id = ANY(:ids) AND random_key IS NULL"
+                ),
+                {"ids": ids},
+            )
+            after = ids[-1]
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_content_random_key_id "
+            "ON content (random_key, id)"
+        )
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS ix_content_random_key_id")
+    op.execute("ALTER TABLE content DROP COLUMN IF EXISTS random_key")
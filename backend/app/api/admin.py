@@ -0,0 +1,98 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.database import get_db
+from app.services.embedding_scheduler import PRIORITY_NAMES
+from app.services.content_service import ContentService
+from app.services.embedding_service import embedding_service
+from app.services.feed_cache import feed_page_cache
+from app.services.neighbors import neighbor_refresher
+from app.services.vector_index_service import VectorIndexService, VECTOR_COLUMNS
+from app.api.deps import require_admin
+
+router = APIRouter(dependencies=[Depends(require_admin)])
+
+
+@router.get("/vector-indexes")
+async def get_vector_indexes(
+    db: AsyncSession = Depends(get_db)
+):
+    """Report managed ANN indexes, their size and any build in progress."""
+    service = VectorIndexService(db)
+    return await service.get_status()
+
+
+@router.post("/vector-indexes/rebuild", status_code=202)
+async def rebuild_vector_index(
+    table: str = Query("content", description="Table whose embedding index to rebuild"),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Rebuild an ANN index concurrently, without blocking reads or writes.
+    
+    Also switches the index type if `VECTOR_INDEX_TYPE` changed.
+    Poll `GET /admin/vector-indexes` for build progress.
+    """
+    if table not in dict(VECTOR_COLUMNS):
+        raise HTTPException(status_code=400, detail=f"No managed vector index on {table}")
+    
+    service = VectorIndexService(db)
+    if not service.start_rebuild(table):
+        raise HTTPException(status_code=409, detail="Rebuild already in progress")
+    return {"table": table, "status": "started"}
+
+
+@router.get("/neighbors")
+async def get_neighbor_status():
+    """Report the nearest-neighbour table refresh: progress, last run and last error."""
+    return neighbor_refresher.status
+
+
+@router.post("/neighbors/refresh", status_code=202)
+async def refresh_neighbors():
+    """
+    Recompute every item's nearest neighbours in the background.
+    
+    New content is added incrementally; a full refresh restores lists
+    shortened by deletes. Poll `GET /admin/neighbors` for progress.
+    """
+    if not neighbor_refresher.start_refresh():
+        raise HTTPException(status_code=409, detail="Refresh already in progress")
+    return {"status": "started"}
+
+
+@router.post("/counters/recount")
+async def recount_content(
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Recompute the maintained per-type content counts with a full scan.
+    
+    Counters are seeded at first startup and kept in step by writes; run
+    this after bulk loads or manual edits that bypass the API.
+    """
+    return await ContentService(db).recount()
+
+
+@router.get("/feed-cache")
+async def get_feed_cache_stats():
+    """Feed page cache hit and miss counts for this worker."""
+    return feed_page_cache.stats()
+
+
+@router.get("/embeddings")
+async def get_embedding_stats():
+    """Embedding provider, cache hit rates, request batching and scheduler queues for this worker."""
+    cache = embedding_service.cache
+    scheduler = embedding_service.scheduler
+    return {
+        "provider": embedding_service.provider.name if embedding_service.provider is not None else None,
+        "model": embedding_service.model if embedding_service.provider is not None else None,
+        "space_mismatch": embedding_service.mismatch,
+        "cache": cache.stats() if cache is not None else None,
+        "coalescer": {
+            PRIORITY_NAMES[priority]: coalescer.stats()
+            for priority, coalescer in embedding_service.coalescers.items()
+        } or None,
+        "scheduler": scheduler.stats() if scheduler is not None else None,
+    }
@@ -61,7 +61,9 @@ async def log_consumption(
         raise HTTPException(status_code=404, detail="Content not found")
     
     agent_service = AgentService(db)
-    consumption = await agent_service.log_consumption(agent.id, consumption_data)
+    consumption = await agent_service.log_consumption(
+        agent.id, consumption_data, content_type=content.content_type.value
+    )
     
     # Update content consumption count
     await content_service.increment_consumption(consumption_data.content_id)
@@ -1,14 +1,15 @@
-from typing import List, Optional
+from typing import List, Optional, Set
 from uuid import UUID
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.database import get_db
 from app.schemas.content import ContentCreate, ContentResponse, ContentAgentView
 from app.services.content_service import ContentService
 from app.services.feed_service import FeedService
+from app.services.view_cache import render_search_results, render_views
 from app.models.agent import Agent
-from app.api.deps import get_current_agent
+from app.api.deps import get_current_agent, require_admin, vector_search_params, view_fields
 
 router = APIRouter()
 
@@ -31,22 +32,35 @@ async def create_content(
 
 @router.get("/", response_model=List[ContentResponse])
 async def list_content(
-    skip: int = Query(0, ge=0),
+    response: Response,
+    cursor: Optional[str] = Query(None, description="Pagination cursor from X-Next-Cursor"),
     limit: int = Query(50, ge=1, le=100),
     content_type: Optional[str] = None,
+    skip: int = Query(0, ge=0, deprecated=True, description="Offset; use cursor instead"),
     db: AsyncSession = Depends(get_db)
 ):
-    """List all content with pagination."""
+    """
+    List all content, newest first.
+    
+    The cursor for the next page is returned in the `X-Next-Cursor` header.
+    `skip` still works for existing clients but scans the skipped rows;
+    it is ignored when a cursor is given.
+    """
     service = ContentService(db)
     from app.models.content import ContentType
     ct = ContentType(content_type) if content_type else None
-    contents = await service.get_all(skip=skip, limit=limit, content_type=ct)
+    contents, next_cursor = await service.get_all(
+        cursor=cursor, limit=limit, content_type=ct, skip=skip
+    )
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     return contents
 
 
-@router.get("/{content_id}", response_model=ContentAgentView)
+@router.get("/{content_id}", response_model=ContentAgentView, response_model_exclude_unset=True)
 async def get_content(
     content_id: UUID,
+    fields: Optional[Set[str]] = Depends(view_fields),
     db: AsyncSession = Depends(get_db),
     agent: Optional[Agent] = Depends(get_current_agent)
 ):
@@ -59,8 +73,8 @@ async def get_content(
     - AI-generated summary
     - Tags and metadata
     """
-    service = ContentService(db)
-    content = await service.get_by_id(content_id)
+    service = ContentService(db, fields=fields)
+    content = (await service.get_by_ids([content_id])).get(content_id)
     if not content:
         raise HTTPException(status_code=404, detail="Content not found")
     
@@ -70,14 +84,28 @@ async def get_content(
     return service.to_agent_view(content)
 
 
-@router.get("/{content_id}/related", response_model=List[ContentAgentView])
+@router.delete("/{content_id}", dependencies=[Depends(require_admin)])
+async def delete_content(
+    content_id: UUID,
+    db: AsyncSession = Depends(get_db)
+):
+    """Delete content and its consumption records. Requires the admin key."""
+    service = ContentService(db)
+    if not await service.delete(content_id):
+        raise HTTPException(status_code=404, detail="Content not found")
+    return {"deleted": str(content_id)}
+
+
+@router.get("/{content_id}/related", response_model=List[ContentAgentView], response_model_exclude_unset=True)
 async def get_related_content(
     content_id: UUID,
     limit: int = Query(10, ge=1, le=50),
-    db: AsyncSession = Depends(get_db)
+    fields: Optional[Set[str]] = Depends(view_fields),
+    db: AsyncSession = Depends(get_db),
+    _: None = Depends(vector_search_params)
 ):
     """Get semantically similar content."""
-    feed_service = FeedService(db)
+    feed_service = FeedService(db, fields=fields)
     related = await feed_service.get_related_content(content_id, limit=limit)
     return related
 
@@ -87,7 +115,9 @@ async def semantic_search(
     q: str = Query(..., min_length=1, description="Search query"),
     limit: int = Query(20, ge=1, le=100),
     content_type: Optional[str] = None,
-    db: AsyncSession = Depends(get_db)
+    fields: Optional[Set[str]] = Depends(view_fields),
+    db: AsyncSession = Depends(get_db),
+    _: None = Depends(vector_search_params)
 ):
     """
     Semantic search for content.
@@ -95,33 +125,37 @@ async def semantic_search(
     Uses vector similarity to find content matching the query meaning,
     not just keywords.
     """
-    service = ContentService(db)
+    service = ContentService(db, fields=fields)
     from app.models.content import ContentType
     ct = ContentType(content_type) if content_type else None
     
     results = await service.search_semantic(q, limit=limit, content_type=ct)
     
-    return [
-        {
-            "content": service.to_agent_view(content, relevance_score=score),
-            "relevance_score": score
-        }
-        for content, score in results
-    ]
+    return Response(
+        render_search_results([
+            (service.to_agent_view(content, relevance_score=score), score)
+            for content, score in results
+        ]),
+        media_type="application/json",
+    )
 
 
 @router.get("/search/tags")
 async def search_by_tags(
     tags: str = Query(..., description="Comma-separated tags"),
     limit: int = Query(20, ge=1, le=100),
+    fields: Optional[Set[str]] = Depends(view_fields),
     db: AsyncSession = Depends(get_db)
 ):
     """Search content by tags."""
-    service = ContentService(db)
+    service = ContentService(db, fields=fields)
     tag_list = [t.strip() for t in tags.split(",") if t.strip()]
     
     if not tag_list:
         raise HTTPException(status_code=400, detail="At least one tag required")
     
     contents = await service.search_by_tags(tag_list, limit=limit)
-    return [service.to_agent_view(c) for c in contents]
+    return Response(
+        render_views([service.to_agent_view(c) for c in contents]),
+        media_type="application/json",
+    )
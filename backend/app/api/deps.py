@@ -1,10 +1,14 @@
-from typing import Optional
-from fastapi import Depends, HTTPException, Header
+import secrets
+from typing import Optional, Set
+from fastapi import Depends, HTTPException, Header, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.config import settings
 from app.core.database import get_db
 from app.models.agent import Agent
 from app.services.agent_service import AgentService
+from app.services.content_service import parse_fields
+from app.services.vector_index_service import apply_search_params
 
 
 async def get_current_agent(
@@ -30,3 +34,39 @@ async def require_agent(
             detail="Invalid or missing API key. Register as an agent first."
         )
     return agent
+
+
+async def require_admin(
+    x_admin_key: Optional[str] = Header(None, alias="X-Admin-Key")
+) -> None:
+    """Require the configured admin key."""
+    if not settings.admin_api_key:
+        raise HTTPException(status_code=403, detail="Admin API is disabled")
+    if not x_admin_key or not secrets.compare_digest(x_admin_key, settings.admin_api_key):
+        raise HTTPException(status_code=401, detail="Invalid or missing admin key")
+
+
+async def vector_search_params(
+    recall: Optional[str] = Query(
+        None, pattern="^(fast|balanced|accurate)$",
+        description="ANN latency/recall preset: fast, balanced or accurate"
+    ),
+    ef_search: Optional[int] = Query(None, ge=1, le=1000, description="HNSW ef_search override"),
+    probes: Optional[int] = Query(None, ge=1, le=1000, description="IVFFlat probes override"),
+    db: AsyncSession = Depends(get_db)
+) -> None:
+    """Apply per-request ANN search knobs to this request's transaction."""
+    await apply_search_params(db, recall=recall, ef_search=ef_search, probes=probes)
+
+
+async def view_fields(
+    fields: Optional[str] = Query(
+        None,
+        description="Comma-separated content fields to return, e.g. title,summary,tags",
+    )
+) -> Optional[Set[str]]:
+    """Parse a `fields=` projection; unrequested columns are never loaded."""
+    try:
+        return parse_fields(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
@@ -1,24 +1,91 @@
-from typing import Optional
-from fastapi import APIRouter, Depends, Query
+from typing import Awaitable, Callable, Optional, Set, Tuple
+from fastapi import APIRouter, Depends, Header, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import Response, StreamingResponse
+from pydantic import ValidationError
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core.database import get_db
+from app.core.config import settings
+from app.core.database import get_db, async_session_maker
+from app.schemas.agent import ConsumptionCreate
 from app.schemas.content import FeedResponse
+from app.services.agent_service import AgentService
+from app.services.anonymous_feed import ANON_FEED, ANON_TRENDING, anonymous_feed
+from app.services.content_service import parse_fields
+from app.services.feed_cache import feed_page_cache, page_key
+from app.services.feed_channel import FeedChannel
 from app.services.feed_service import FeedService
+from app.services.feed_stream import STREAM_MEDIA_TYPES, encode_chunk, stream_feed_chunks
+from app.services.view_cache import render_feed, render_feed_item
 from app.models.agent import Agent
-from app.api.deps import get_current_agent
+from app.api.deps import get_current_agent, vector_search_params, view_fields
 
 router = APIRouter()
 
 
-@router.get("/", response_model=FeedResponse)
+async def cached_feed(
+    request: Request,
+    agent: Optional[Agent],
+    build: Callable[[], Awaitable[FeedResponse]],
+) -> Response:
+    """
+    Serve an agent's feed page from the page cache, rendering and storing it on a miss.
+    
+    Pages are keyed by path and the full query string, so every parameter
+    that shapes the page (cursor, content_type, exclude_consumed, fields,
+    ...) is part of the key. `X-Cache` reports HIT or MISS.
+    """
+    if agent is None or not feed_page_cache.enabled:
+        return Response(render_feed(await build()), media_type="application/json")
+    
+    key = page_key(path=request.url.path, query=sorted(request.query_params.multi_items()))
+    data = await feed_page_cache.get(agent.id, key)
+    status = "HIT"
+    if data is None:
+        status = "MISS"
+        data = render_feed(await build())
+        await feed_page_cache.set(agent.id, key, data)
+    return Response(data, media_type="application/json", headers={"X-Cache": status})
+
+
+def shared_feed(request: Request, page: Tuple[bytes, str]) -> Response:
+    """
+    Serve a page of the shared anonymous feed with HTTP caching headers.
+    
+    Responses vary by X-API-Key, so caches never hand a shared page to an
+    authenticated agent; a matching If-None-Match gets a 304.
+    """
+    body, etag = page
+    ttl = settings.anon_feed_refresh_seconds
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={ttl}, stale-while-revalidate={ttl}",
+        "Vary": "X-API-Key",
+    }
+    if etag in [tag.strip() for tag in request.headers.get("if-none-match", "").split(",")]:
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
+
+
+@router.get("/", response_model=FeedResponse, response_model_exclude_unset=True)
 async def get_feed(
+    request: Request,
     cursor: Optional[str] = Query(None, description="Pagination cursor"),
     limit: int = Query(10, ge=1, le=50, description="Items per page"),
     content_type: Optional[str] = Query(None, description="Filter by content type"),
     exclude_consumed: bool = Query(True, description="Exclude already consumed content"),
+    approximate: bool = Query(False, description="Estimate total_available from planner statistics"),
+    ratios: Optional[str] = Query(
+        None,
+        description="Blend weights, e.g. personalized:0.6,trending:0.25,discover:0.15",
+    ),
+    mmr_lambda: Optional[float] = Query(
+        None, ge=0, le=1,
+        description="Diversity re-ranking: 1 is pure relevance, lower values favour variety",
+    ),
+    fields: Optional[Set[str]] = Depends(view_fields),
     db: AsyncSession = Depends(get_db),
-    agent: Optional[Agent] = Depends(get_current_agent)
+    agent: Optional[Agent] = Depends(get_current_agent),
+    _: None = Depends(vector_search_params)
 ):
     """
     🔄 THE DOOM SCROLL ENDPOINT
@@ -30,6 +97,20 @@ async def get_feed(
     - Previous consumption history
     - Content similarity to preferences
     
+    Personalized, trending and discovery candidates are fetched in parallel
+    and interleaved by `ratios`; each item's `feed_context` names its source.
+    
+    With `mmr_lambda` below 1, personalized items are re-ranked by Maximal
+    Marginal Relevance so pages avoid runs of near-duplicates; the stage's
+    timings are reported under `feed_context.rerank`.
+    
+    Without an API key the feed is the same for everyone and is served from
+    a shared snapshot refreshed in the background, with `Cache-Control` and
+    `ETag` headers for CDNs and reverse proxies.
+    
+    Authenticated pages are cached briefly, so retrying a cursor returns
+    the same page; logging a consumption clears the agent's cached pages.
+    
     Use the `next_cursor` in the response to fetch the next page.
     Keep calling this endpoint to doom scroll forever.
     
@@ -39,23 +120,178 @@ async def get_feed(
     - total_available: Content available (excluding consumed)
     - feed_id: Unique session ID for tracking
     """
-    service = FeedService(db)
-    feed = await service.get_feed(
+    if agent is None and fields is None and ratios is None and mmr_lambda is None:
+        page = anonymous_feed.page(ANON_FEED, content_type, cursor, limit)
+        if page is not None:
+            return shared_feed(request, page)
+    
+    service = FeedService(db, fields=fields)
+    return await cached_feed(request, agent, lambda: service.get_feed(
         agent_id=agent.id if agent else None,
         cursor=cursor,
         limit=limit,
         content_type=content_type,
         exclude_consumed=exclude_consumed,
+        approximate=approximate,
+        ratios=ratios,
+        mmr_lambda=mmr_lambda,
+    ))
+
+
+@router.get("/stream")
+async def stream_feed(
+    cursor: Optional[str] = Query(None, description="Resume from a cursor sent earlier in a stream"),
+    chunk_size: int = Query(25, ge=1, le=100, description="Items generated per server-side chunk"),
+    max_items: Optional[int] = Query(None, ge=1, description="Stop after this many items"),
+    content_type: Optional[str] = Query(None, description="Filter by content type"),
+    exclude_consumed: bool = Query(True, description="Exclude already consumed content"),
+    ratios: Optional[str] = Query(None, description="Blend weights, as for the feed endpoint"),
+    format: str = Query("ndjson", pattern="^(ndjson|sse)$", description="ndjson or sse"),
+    fields: Optional[Set[str]] = Depends(view_fields),
+    x_api_key: Optional[str] = Header(None, alias="X-API-Key"),
+):
+    """
+    🌊 STREAMING DOOM SCROLL
+    
+    The same feed as `GET /feed/`, pushed continuously over one response
+    instead of page by page.
+    
+    - `ndjson`: one FeedItem per line, with a `{"next_cursor": ...}` line
+      after each chunk
+    - `sse`: `item` and `cursor` events with the same payloads
+    
+    The server stays at most one chunk ahead of the client's reads. Pass the
+    last cursor back to resume after a disconnect, or to continue past
+    `max_items`.
+    """
+    # Look the agent up in a short session: a dependency session would hold
+    # a pooled connection for the life of the stream
+    agent_id = None
+    if x_api_key:
+        async with async_session_maker() as db:
+            agent = await AgentService(db).get_by_api_key(x_api_key)
+        agent_id = agent.id if agent else None
+    
+    async def body():
+        async for items, next_cursor in stream_feed_chunks(
+            agent_id,
+            cursor=cursor,
+            chunk_size=chunk_size,
+            content_type=content_type,
+            exclude_consumed=exclude_consumed,
+            ratios=ratios,
+            fields=fields,
+            max_items=max_items,
+        ):
+            yield encode_chunk(items, next_cursor, format)
+    
+    return StreamingResponse(
+        body(),
+        media_type=STREAM_MEDIA_TYPES[format],
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
-    return feed
 
 
-@router.get("/shorts", response_model=FeedResponse)
+@router.websocket("/ws")
+async def feed_channel(
+    websocket: WebSocket,
+    api_key: Optional[str] = Query(None, description="API key, if the X-API-Key header cannot be set"),
+    content_type: Optional[str] = Query(None, description="Filter by content type"),
+    fields: Optional[str] = Query(None, description="Comma-separated content fields to return"),
+):
+    """
+    🔌 FEED CHANNEL
+    
+    Doom scroll and log consumption over one WebSocket, authenticated once.
+    
+    Client messages:
+    - `{"type": "next", "count": 10}` - send the next items
+    - `{"type": "ack", "content_id": ..., "rating": 5, ...}` - log a consumption
+      (same fields as `POST /agents/consume`)
+    - `{"type": "flush"}` - write buffered consumptions now
+    
+    Server messages:
+    - `{"type": "items", "items": [...], "done": false}`
+    - `{"type": "written", "count": n}` when a consumption batch is saved
+    - `{"type": "error", "detail": ...}`
+    
+    Consumptions are written in batches; acks re-rank the items queued
+    for this connection straight away.
+    """
+    key = api_key or websocket.headers.get("x-api-key")
+    agent = None
+    if key:
+        async with async_session_maker() as db:
+            agent = await AgentService(db).get_by_api_key(key)
+    if not agent:
+        await websocket.close(code=4401, reason="Invalid or missing API key")
+        return
+    
+    try:
+        projection = parse_fields(fields)
+    except ValueError as e:
+        await websocket.close(code=4400, reason=str(e))
+        return
+    
+    await websocket.accept()
+    channel = FeedChannel(agent.id, content_type=content_type, fields=projection)
+    try:
+        while True:
+            try:
+                message = await websocket.receive_json()
+            except ValueError:
+                await websocket.send_json({"type": "error", "detail": "Messages must be JSON"})
+                continue
+            kind = message.get("type") if isinstance(message, dict) else None
+            
+            if kind == "next":
+                try:
+                    count = max(1, min(int(message.get("count", 10)), 100))
+                except (TypeError, ValueError):
+                    await websocket.send_json({"type": "error", "detail": "count must be an integer"})
+                    continue
+                items = await channel.next_items(count)
+                await websocket.send_text(
+                    b'{"type":"items","items":[%s],"done":%s}' % (
+                        b",".join(render_feed_item(item) for item in items),
+                        b"true" if len(items) < count else b"false",
+                    )
+                    .decode()
+                )
+            elif kind == "ack":
+                try:
+                    record = ConsumptionCreate(**{k: v for k, v in message.items() if k != "type"})
+                except ValidationError as e:
+                    await websocket.send_json({"type": "error", "detail": e.errors(include_url=False)})
+                    continue
+                except TypeError:
+                    await websocket.send_json({"type": "error", "detail": "Invalid ack"})
+                    continue
+                written = await channel.ack(record)
+                if written:
+                    await websocket.send_json({"type": "written", "count": written})
+            elif kind == "flush":
+                written = await channel.batcher.flush()
+                await websocket.send_json({"type": "written", "count": written})
+            else:
+                await websocket.send_json({"type": "error", "detail": f"Unknown message type: {kind}"})
+    except WebSocketDisconnect:
+        pass
+    finally:
+        await channel.close()
+
+
+@router.get("/shorts", response_model=FeedResponse, response_model_exclude_unset=True)
 async def get_shorts_feed(
+    request: Request,
     cursor: Optional[str] = Query(None),
     limit: int = Query(20, ge=1, le=50),
+    approximate: bool = Query(False, description="Estimate total_available from planner statistics"),
+    mmr_lambda: Optional[float] = Query(None, ge=0, le=1, description="Diversity re-ranking lambda"),
+    fields: Optional[Set[str]] = Depends(view_fields),
     db: AsyncSession = Depends(get_db),
-    agent: Optional[Agent] = Depends(get_current_agent)
+    agent: Optional[Agent] = Depends(get_current_agent),
+    _: None = Depends(vector_search_params)
 ):
     """
     📱 SHORT-FORM CONTENT FEED
@@ -64,19 +300,29 @@ async def get_shorts_feed(
     Returns only short-form content (type="short").
     Perfect for quick learning bursts.
     """
-    service = FeedService(db)
-    feed = await service.get_shorts_feed(
+    if agent is None and fields is None and mmr_lambda is None:
+        page = anonymous_feed.page(ANON_FEED, "short", cursor, limit)
+        if page is not None:
+            return shared_feed(request, page)
+    
+    service = FeedService(db, fields=fields)
+    return await cached_feed(request, agent, lambda: service.get_shorts_feed(
         agent_id=agent.id if agent else None,
         cursor=cursor,
         limit=limit,
-    )
-    return feed
+        approximate=approximate,
+        mmr_lambda=mmr_lambda,
+    ))
 
 
-@router.get("/trending", response_model=FeedResponse)
+@router.get("/trending", response_model=FeedResponse, response_model_exclude_unset=True)
 async def get_trending(
+    request: Request,
     cursor: Optional[str] = Query(None),
     limit: int = Query(10, ge=1, le=50),
+    approximate: bool = Query(False, description="Estimate total_available from planner statistics"),
+    window: str = Query("24h", pattern="^(1h|24h|7d|all)$", description="Trending window"),
+    fields: Optional[Set[str]] = Depends(view_fields),
     db: AsyncSession = Depends(get_db)
 ):
     """
@@ -84,47 +330,31 @@ async def get_trending(
     
     Most consumed content by AI agents.
     No personalization - pure popularity ranking.
+    
+    Scores decay over the chosen window (1h, 24h or 7d), so recent views and
+    consumptions count most; `all` ranks by all-time consumption count.
+    
+    Pages are served from a shared snapshot refreshed in the background,
+    with `Cache-Control` and `ETag` headers.
     """
-    from sqlalchemy import select
-    from app.models.content import Content
-    from app.schemas.content import FeedItem, ContentAgentView
-    from app.services.content_service import ContentService
-    import uuid
-    
-    offset = int(cursor) if cursor else 0
-    
-    query = select(Content).order_by(
-        Content.agent_consumption_count.desc()
-    ).offset(offset).limit(limit)
-    
-    result = await db.execute(query)
-    contents = list(result.scalars().all())
-    
-    content_service = ContentService(db)
-    items = [
-        FeedItem(
-            content=content_service.to_agent_view(c),
-            position=offset + i,
-            feed_context={"recommendation_type": "trending"}
-        )
-        for i, c in enumerate(contents)
-    ]
-    
-    next_cursor = str(offset + limit) if len(contents) == limit else None
-    total = await content_service.get_total_count()
-    
-    return FeedResponse(
-        items=items,
-        next_cursor=next_cursor,
-        total_available=total,
-        feed_id=str(uuid.uuid4())
+    if fields is None:
+        page = anonymous_feed.page(ANON_TRENDING, window, cursor, limit)
+        if page is not None:
+            return shared_feed(request, page)
+    
+    service = FeedService(db, fields=fields)
+    feed = await service.get_trending(
+        cursor=cursor, limit=limit, approximate=approximate, window=window
     )
+    return Response(render_feed(feed), media_type="application/json")
 
 
-@router.get("/discover", response_model=FeedResponse)
+@router.get("/discover", response_model=FeedResponse, response_model_exclude_unset=True)
 async def get_discover(
     cursor: Optional[str] = Query(None),
     limit: int = Query(10, ge=1, le=50),
+    approximate: bool = Query(False, description="Estimate total_available from planner statistics"),
+    fields: Optional[Set[str]] = Depends(view_fields),
     db: AsyncSession = Depends(get_db),
     agent: Optional[Agent] = Depends(get_current_agent)
 ):
@@ -134,44 +364,11 @@ async def get_discover(
     Random discovery feed to help agents explore new topics.
     Deliberately diverse to expand agent knowledge.
     """
-    from sqlalchemy import select, func
-    from app.models.content import Content
-    from app.schemas.content import FeedItem
-    from app.services.content_service import ContentService
-    from app.services.agent_service import AgentService
-    import uuid
-    
-    offset = int(cursor) if cursor else 0
-    
-    # Get random content, excluding consumed
-    query = select(Content).order_by(func.random())
-    
-    if agent:
-        agent_service = AgentService(db)
-        consumed_ids = await agent_service.get_consumed_content_ids(agent.id)
-        if consumed_ids:
-            query = query.where(~Content.id.in_(consumed_ids))
-    
-    query = query.offset(offset).limit(limit)
-    result = await db.execute(query)
-    contents = list(result.scalars().all())
-    
-    content_service = ContentService(db)
-    items = [
-        FeedItem(
-            content=content_service.to_agent_view(c),
-            position=offset + i,
-            feed_context={"recommendation_type": "discover"}
-        )
-        for i, c in enumerate(contents)
-    ]
-    
-    next_cursor = str(offset + limit) if len(contents) == limit else None
-    total = await content_service.get_total_count()
-    
-    return FeedResponse(
-        items=items,
-        next_cursor=next_cursor,
-        total_available=total,
-        feed_id=str(uuid.uuid4())
+    service = FeedService(db, fields=fields)
+    feed = await service.get_discover(
+        agent_id=agent.id if agent else None,
+        cursor=cursor,
+        limit=limit,
+        approximate=approximate,
     )
+    return Response(render_feed(feed), media_type="application/json")
@@ -0,0 +1,109 @@
+import base64
+import hashlib
+import hmac
+import json
+import secrets
+from datetime import datetime
+from typing import Any, List, Optional, Sequence
+from uuid import UUID
+from sqlalchemy import tuple_
+
+from app.core.config import settings
+
+
+# Debug runs without a configured key sign with a per-process one, so their
+# cursors don't survive a restart or cross workers (startup refuses this otherwise)
+_PROCESS_KEY = secrets.token_bytes(32)
+
+
+def _sign(payload: bytes) -> str:
+    key = settings.secret_key.encode() if settings.secret_key else _PROCESS_KEY
+    digest = hmac.new(key, payload, hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest[:12]).decode().rstrip("=")
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def encode_cursor(kind: str, key: List[Any], position: int, **extra: Any) -> str:
+    """
+    Encode an opaque, signed keyset cursor.
+    
+    `key` holds the sort key of the last item served (e.g. [distance, id]),
+    `position` the number of items served so far in this scroll.
+    """
+    data = {"k": kind, "v": [_encode_value(v) for v in key], "p": position}
+    data.update(extra)
+    payload = json.dumps(data, separators=(",", ":")).encode()
+    body = base64.urlsafe_b64encode(payload).decode().rstrip("=")
+    return f"{body}.{_sign(payload)}"
+
+
+def decode_cursor(cursor: Optional[str], kind: Optional[str] = None) -> Optional[dict]:
+    """
+    Decode and verify a cursor.
+    
+    Returns None for missing, tampered or foreign cursors so callers can
+    simply start from the first page.
+    """
+    if not cursor or "." not in cursor:
+        return None
+    
+    body, signature = cursor.rsplit(".", 1)
+    try:
+        payload = _b64decode(body)
+    except ValueError:
+        return None
+    
+    if not hmac.compare_digest(signature, _sign(payload)):
+        return None
+    
+    try:
+        data = json.loads(payload)
+    except ValueError:
+        return None
+    
+    if kind is not None and data.get("k") != kind:
+        return None
+    return data
+
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, UUID):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def parse_key(values: Any, *types: type) -> Optional[tuple]:
+    """Rebuild a typed sort key (e.g. `parse_key(v, float, UUID)`) from cursor values."""
+    if not isinstance(values, list) or len(values) != len(types):
+        return None
+    try:
+        return tuple(_decode_value(v, t) for v, t in zip(values, types))
+    except (TypeError, ValueError):
+        return None
+
+
+def _decode_value(value: Any, type_: type) -> Any:
+    if type_ is datetime:
+        return datetime.fromisoformat(value)
+    return type_(value)
+
+
+def apply_keyset(query, columns: Sequence, key: Optional[Sequence], descending: bool = False):
+    """
+    Order `query` by `columns` and seek past `key` instead of using OFFSET.
+    
+    The last column must be unique (the primary key) so ties on the leading
+    sort value are broken deterministically.
+    """
+    if key is not None:
+        row = tuple_(*columns)
+        bound = tuple_(*key)
+        query = query.where(row < bound if descending else row > bound)
+    if descending:
+        return query.order_by(*[c.desc() for c in columns])
+    return query.order_by(*columns)
@@ -35,3 +35,21 @@ async def init_db():
     async with engine.begin() as conn:
         await conn.execute(text("CREATE EXTENSION IF NOT EXISTS vector"))
         await conn.run_sync(Base.metadata.create_all)
+        # create_all skips indexes on tables that already exist; added columns
+        # ship as alembic migrations (`alembic upgrade head`)
+        await conn.run_sync(_create_missing_indexes)
+        # Seed maintained counters once; POST /admin/counters/recount repairs drift
+        await conn.execute(text(
+            "INSERT INTO content_counters (content_type, count) "
+            "SELECT content_type, count(*) FROM content "
+            "WHERE NOT EXISTS (SELECT 1 FROM content_counters) GROUP BY content_type"
+        ))
+    # Managed ANN indexes build CONCURRENTLY, outside the transaction above
+    from app.services.vector_index_service import ensure_vector_indexes
+    await ensure_vector_indexes()
+
+
+def _create_missing_indexes(conn) -> None:
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(conn, checkfirst=True)
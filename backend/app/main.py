@@ -3,16 +3,43 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.core.config import settings
-from app.core.database import init_db
+from app.core.database import init_db, async_session_maker
 from app.api import api_router
+from app.services.anonymous_feed import anonymous_feed
+from app.services.embedding_service import embedding_service
+from app.services.feed_queue import feed_queues
+from app.services.neighbors import neighbor_refresher
+from app.services.preferences import preference_updater
+from app.services.trending import trending
+from app.services.vector_search import vector_backend
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
+    if not settings.secret_key and not settings.debug:
+        raise RuntimeError("SECRET_KEY must be set when DEBUG is off; it signs pagination cursors")
     await init_db()
+    async with async_session_maker() as db:
+        await embedding_service.check_space(db)
+        await trending.load(db)
+    if settings.vector_backend == "memmap":
+        async with async_session_maker() as db:
+            await vector_backend.open_or_build(db)
+    if settings.feed_materialization:
+        await feed_queues.start()
+    await neighbor_refresher.start()
+    await preference_updater.start()
+    if settings.anon_feed_enabled:
+        await anonymous_feed.start()
     yield
     # Shutdown
+    await feed_queues.stop()
+    await neighbor_refresher.stop()
+    await preference_updater.stop()
+    await anonymous_feed.stop()
+    if embedding_service.scheduler is not None:
+        await embedding_service.scheduler.stop()
 
 
 app = FastAPI(
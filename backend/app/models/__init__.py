@@ -1,4 +1,5 @@
-from app.models.content import Content, ContentType
+from app.models.content import Content, ContentType, ContentCounter, ContentNeighbor
 from app.models.agent import Agent, AgentConsumption
+from app.models.embedding import EmbeddingCacheEntry, EmbeddingSpace
 
-__all__ = ["Content", "ContentType", "Agent", "AgentConsumption"]
+__all__ = ["Content", "ContentType", "ContentCounter", "ContentNeighbor", "Agent", "AgentConsumption", "EmbeddingCacheEntry", "EmbeddingSpace"]
@@ -1,6 +1,6 @@
 import uuid
 from datetime import datetime
-from sqlalchemy import Column, String, Text, DateTime, Integer, Float, ForeignKey, JSON
+from sqlalchemy import Column, String, Text, DateTime, Integer, Float, ForeignKey, JSON, Index
 from sqlalchemy.dialects.postgresql import UUID, ARRAY
 from sqlalchemy.orm import relationship
 from pgvector.sqlalchemy import Vector
@@ -45,6 +45,10 @@ class Agent(Base):
 class AgentConsumption(Base):
     """Track what content agents have consumed."""
     __tablename__ = "agent_consumptions"
+    __table_args__ = (
+        # Backs the NOT EXISTS anti-join that hides consumed content from feeds
+        Index("ix_agent_consumptions_agent_content", "agent_id", "content_id"),
+    )
     
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     
@@ -1,7 +1,8 @@
 import uuid
+import random
 from datetime import datetime
 from enum import Enum
-from sqlalchemy import Column, String, Text, DateTime, Integer, Float, Enum as SQLEnum, JSON
+from sqlalchemy import Column, String, Text, DateTime, Integer, BigInteger, Float, Enum as SQLEnum, JSON, Index
 from sqlalchemy.dialects.postgresql import UUID, ARRAY
 from pgvector.sqlalchemy import Vector
 
@@ -20,6 +21,14 @@ class ContentType(str, Enum):
 
 class Content(Base):
     __tablename__ = "content"
+    __table_args__ = (
+        # Keyset pagination: (sort key, id) seeks for trending and listings
+        Index("ix_content_consumption_count_id", "agent_consumption_count", "id"),
+        Index("ix_content_created_at_id", "created_at", "id"),
+        Index("ix_content_type_created_at_id", "content_type", "created_at", "id"),
+        # Seek-based random sampling for discover
+        Index("ix_content_random_key_id", "random_key", "id"),
+    )
     
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     
@@ -50,6 +59,9 @@ class Content(Base):
     view_count = Column(Integer, default=0)
     agent_consumption_count = Column(Integer, default=0)
     
+    # Uniform random sort key, so discover can sample by index seek
+    random_key = Column(Float, default=random.random)
+    
     # Timestamps
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -70,3 +82,25 @@ class Content(Base):
             "metadata": self.extra_data or {},
             "created_at": self.created_at.isoformat() if self.created_at else None,
         }
+
+
+class ContentCounter(Base):
+    """Maintained content counts per type, so pages never COUNT(*) the catalog."""
+    __tablename__ = "content_counters"
+    
+    content_type = Column(SQLEnum(ContentType), primary_key=True)
+    count = Column(BigInteger, nullable=False, default=0)
+
+
+class ContentNeighbor(Base):
+    """Materialized top-k nearest neighbours per content item, ranked by cosine distance."""
+    __tablename__ = "content_neighbors"
+    __table_args__ = (
+        # Reverse lookup, to drop a deleted item from other items' lists
+        Index("ix_content_neighbors_neighbor_id", "neighbor_id"),
+    )
+    
+    content_id = Column(UUID(as_uuid=True), primary_key=True)
+    rank = Column(Integer, primary_key=True)  # 0 is the nearest
+    neighbor_id = Column(UUID(as_uuid=True), nullable=False)
+    distance = Column(Float, nullable=False)
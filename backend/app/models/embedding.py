@@ -0,0 +1,26 @@
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, DateTime
+from pgvector.sqlalchemy import Vector
+
+from app.core.database import Base
+from app.core.config import settings
+
+
+class EmbeddingCacheEntry(Base):
+    """Persistent embedding cache, keyed by a hash of (model, dimensions, normalized text)."""
+    __tablename__ = "embedding_cache"
+    
+    key = Column(String(64), primary_key=True)
+    embedding = Column(Vector(settings.embedding_dimensions), nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class EmbeddingSpace(Base):
+    """The provider and model that stored content and agent embeddings were made with."""
+    __tablename__ = "embedding_space"
+    
+    name = Column(String(32), primary_key=True, default="default")
+    provider = Column(String(32), nullable=False)
+    model = Column(String(128), nullable=False)
+    dimensions = Column(Integer, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, PrivateAttr
 from typing import Optional, List, Any
 from datetime import datetime
 from uuid import UUID
@@ -48,22 +48,29 @@ class ContentResponse(BaseModel):
 
 
 class ContentAgentView(BaseModel):
-    """Optimized view for AI agent consumption."""
+    """
+    Optimized view for AI agent consumption.
+    
+    Every field but `id` may be left out by a `fields=` projection.
+    """
     id: str
-    type: str
-    title: str
-    description: Optional[str]
-    transcript: Optional[str]
-    raw_text: Optional[str]
-    summary: Optional[str]
-    duration_seconds: Optional[float]
-    tags: List[str]
-    metadata: dict
-    created_at: Optional[str]
+    type: Optional[str] = None
+    title: Optional[str] = None
+    description: Optional[str] = None
+    transcript: Optional[str] = None
+    raw_text: Optional[str] = None
+    summary: Optional[str] = None
+    duration_seconds: Optional[float] = None
+    tags: Optional[List[str]] = None
+    metadata: Optional[dict] = None
+    created_at: Optional[str] = None
     
     # Additional context for agents
     relevance_score: Optional[float] = None
     similar_content_ids: List[str] = []
+    
+    # Row version (updated_at) the view was built from; keys the serialized-view cache
+    _version: Optional[datetime] = PrivateAttr(default=None)
 
 
 class FeedItem(BaseModel):
@@ -1,13 +1,20 @@
 import secrets
+from collections import Counter
 from typing import List, Optional
 from uuid import UUID
 from datetime import datetime
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update
+from sqlalchemy import select, update, exists
 
 from app.models.agent import Agent, AgentConsumption
+from app.models.content import Content
 from app.schemas.agent import AgentCreate, ConsumptionCreate
 from app.services.embedding_service import embedding_service
+from app.services.consumed_cache import consumed_cache
+from app.services.feed_cache import feed_page_cache
+from app.services.feed_queue import feed_queues
+from app.services.preferences import consumption_weight, preference_updater
+from app.services.trending import trending
 
 
 class AgentService:
@@ -65,7 +72,8 @@ class AgentService:
     async def log_consumption(
         self, 
         agent_id: UUID, 
-        consumption_data: ConsumptionCreate
+        consumption_data: ConsumptionCreate,
+        content_type: Optional[str] = None,
     ) -> AgentConsumption:
         """Log content consumption by agent."""
         consumption = AgentConsumption(
@@ -93,8 +101,88 @@ class AgentService:
         
         await self.db.commit()
         await self.db.refresh(consumption)
+        
+        consumed_cache.add(agent_id, consumption_data.content_id, content_type)
+        feed_queues.discard(agent_id, [consumption_data.content_id])
+        await feed_page_cache.invalidate(agent_id)
+        preference_updater.record(
+            agent_id,
+            consumption_data.content_id,
+            consumption_weight(consumption_data.rating, consumption_data.completion_percentage),
+        )
         return consumption
     
+    async def log_consumptions(
+        self,
+        agent_id: UUID,
+        records: List[ConsumptionCreate],
+    ) -> List[AgentConsumption]:
+        """
+        Log a batch of consumptions in one transaction.
+        
+        Bumps each content's consumption count and the agent's stats once
+        per batch; records for unknown content are dropped.
+        """
+        if not records:
+            return []
+        
+        # Bump counts grouped by multiplicity, learning which content exists
+        counts = Counter(r.content_id for r in records)
+        by_count = {}
+        for content_id, n in counts.items():
+            by_count.setdefault(n, []).append(content_id)
+        
+        content_types = {}
+        for n, content_ids in by_count.items():
+            result = await self.db.execute(
+                update(Content)
+                .where(Content.id.in_(content_ids))
+                .values(agent_consumption_count=Content.agent_consumption_count + n)
+                .returning(Content.id, Content.content_type)
+            )
+            content_types.update({cid: ct.value for cid, ct in result.all()})
+        
+        consumptions = [
+            AgentConsumption(
+                agent_id=agent_id,
+                content_id=r.content_id,
+                watch_duration_seconds=r.watch_duration_seconds,
+                completion_percentage=r.completion_percentage,
+                rating=r.rating,
+                feedback=r.feedback,
+                learned_concepts=r.learned_concepts,
+            )
+            for r in records
+            if r.content_id in content_types
+        ]
+        if not consumptions:
+            await self.db.rollback()
+            return []
+        self.db.add_all(consumptions)
+        
+        await self.db.execute(
+            update(Agent)
+            .where(Agent.id == agent_id)
+            .values(
+                total_content_consumed=Agent.total_content_consumed + len(consumptions),
+                total_watch_time_seconds=Agent.total_watch_time_seconds + sum(
+                    c.watch_duration_seconds or 0 for c in consumptions
+                ),
+                last_active_at=datetime.utcnow()
+            )
+        )
+        await self.db.commit()
+        
+        await feed_page_cache.invalidate(agent_id)
+        feed_queues.discard(agent_id, [c.content_id for c in consumptions])
+        for c in consumptions:
+            consumed_cache.add(agent_id, c.content_id, content_types[c.content_id])
+            trending.record(c.content_id, content_types[c.content_id])
+            preference_updater.record(
+                agent_id, c.content_id, consumption_weight(c.rating, c.completion_percentage)
+            )
+        return consumptions
+    
     async def get_consumption_history(
         self, 
         agent_id: UUID, 
@@ -116,3 +204,15 @@ class AgentService:
             .where(AgentConsumption.agent_id == agent_id)
         )
         return [row[0] for row in result.all()]
+    
+    def not_consumed_filter(self, agent_id: UUID):
+        """
+        Filter clause excluding content the agent has already consumed.
+        
+        Runs as a correlated NOT EXISTS anti-join on (agent_id, content_id)
+        instead of shipping the consumed ID list through Python.
+        """
+        return ~exists().where(
+            AgentConsumption.agent_id == agent_id,
+            AgentConsumption.content_id == Content.id,
+        )
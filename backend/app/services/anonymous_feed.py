@@ -0,0 +1,206 @@
+import asyncio
+import time
+import uuid
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import orjson
+
+from app.core.config import settings
+from app.core.cursor import decode_cursor, encode_cursor
+from app.core.database import async_session_maker
+from app.models.content import ContentType
+from app.services.feed_sessions import feed_sessions
+from app.services.view_cache import render_feed_item
+
+ANON_CURSOR = "anon"
+
+# Shared feeds are keyed by (kind, param): content type for the feed, window for trending
+ANON_FEED = "feed"
+ANON_TRENDING = "trending"
+AnonKey = Tuple[str, Optional[str]]
+DEFAULT_KEYS = [(ANON_FEED, None), (ANON_FEED, ContentType.SHORT.value)] + [
+    (ANON_TRENDING, window) for window in ("1h", "24h", "7d", "all")
+]
+
+
+def fork_cursor(cursor: Optional[str], served: Iterable[str] = ()) -> Optional[str]:
+    """
+    Give a shared continuation cursor its own feed session.
+    
+    A blend cursor's feed_id keys the set of items served in the session,
+    which callers continuing from the same shared cursor must not share.
+    The new session starts out with `served` (the shared window the caller
+    has already scrolled through), so blended sources don't repeat it.
+    """
+    state = decode_cursor(cursor)
+    if not state or "f" not in state:
+        return cursor
+    state["f"] = str(uuid.uuid4())
+    feed_sessions.served(state["f"]).update(served)
+    return encode_cursor(state.pop("k"), state.pop("v"), state.pop("p"), **state)
+
+
+class AnonymousSnapshot:
+    """One shared ranking, held as pre-rendered feed items."""
+    
+    def __init__(
+        self,
+        items: List[bytes],
+        item_ids: List[str],
+        tail_cursor: Optional[str],
+        total: int,
+        feed_id: str,
+    ):
+        self.items = items
+        self.item_ids = item_ids
+        self.tail_cursor = tail_cursor  # Regular feed cursor that continues past the window
+        self.total = total
+        self.feed_id = feed_id
+        self.version = uuid.uuid4().hex[:16]
+        self.built_at = time.monotonic()
+        self.retired_at: Optional[float] = None
+
+
+class AnonymousFeedCache:
+    """
+    Shared feeds for callers without an API key.
+    
+    Anonymous feeds rank the same for everyone, so a background task
+    computes one window of `window` items per content type (and trending
+    window) every `refresh_seconds` and pages are sliced from memory.
+    Requests never wait on a build: a key without a snapshot yet is served
+    live and queued for the worker. Pages past the window continue with
+    the regular feed cursor the build ended on.
+    
+    Cursors carry the snapshot version they were issued from. A replaced
+    snapshot keeps serving its cursors for one more refresh period, so a
+    rebuild mid-scroll doesn't shift offsets onto a different ranking;
+    cursors older than that are served live from the start of the window.
+    """
+    
+    def __init__(
+        self,
+        window: int = settings.anon_feed_window,
+        refresh_seconds: float = settings.anon_feed_refresh_seconds,
+        max_keys: int = 32,
+    ):
+        self.window = window
+        self.refresh_seconds = refresh_seconds
+        self.max_keys = max_keys
+        self._snapshots: Dict[AnonKey, AnonymousSnapshot] = {}
+        self._retired: Dict[str, AnonymousSnapshot] = {}  # By version
+        self._keys: Set[AnonKey] = set(DEFAULT_KEYS)
+        self._wake = asyncio.Event()
+        self._worker: Optional[asyncio.Task] = None
+    
+    def page(
+        self,
+        kind: str,
+        param: Optional[str],
+        cursor: Optional[str],
+        limit: int,
+    ) -> Optional[Tuple[bytes, str]]:
+        """
+        A rendered FeedResponse page and its ETag, or None to serve the request live.
+        
+        Regular feed cursors (from past the window) are always served live.
+        """
+        key = (kind, param)
+        snapshot = self._snapshots.get(key)
+        if snapshot is None:
+            self._request(key)
+            return None
+        
+        offset = 0
+        if cursor:
+            state = decode_cursor(cursor, ANON_CURSOR)
+            if not state or state.get("s") != [kind, param]:
+                return None
+            version = state["v"][0] if state["v"] else None
+            if version != snapshot.version:
+                snapshot = self._retired.get(version)
+                if snapshot is None or time.monotonic() - snapshot.retired_at > self.refresh_seconds:
+                    return None
+            offset = state["p"]
+        
+        items = snapshot.items[offset:offset + limit]
+        end = offset + len(items)
+        if end < len(snapshot.items):
+            next_cursor = encode_cursor(ANON_CURSOR, [snapshot.version], end, s=[kind, param])
+        else:
+            next_cursor = fork_cursor(snapshot.tail_cursor, snapshot.item_ids)
+        
+        body = b'{"items":[%s],"next_cursor":%s,"total_available":%d,"feed_id":%s}' % (
+            b",".join(items),
+            orjson.dumps(next_cursor),
+            snapshot.total,
+            orjson.dumps(snapshot.feed_id),
+        )
+        return body, f'"{snapshot.version}-{offset}-{limit}"'
+    
+    def _request(self, key: AnonKey) -> None:
+        if key[0] == ANON_FEED and key[1] is not None and key[1] not in {t.value for t in ContentType}:
+            return
+        if key not in self._keys and len(self._keys) < self.max_keys:
+            self._keys.add(key)
+            self._wake.set()
+    
+    async def start(self) -> None:
+        if self._worker is None:
+            self._worker = asyncio.create_task(self._run())
+    
+    async def stop(self) -> None:
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+    
+    async def _run(self) -> None:
+        while True:
+            for key in list(self._keys):
+                snapshot = self._snapshots.get(key)
+                if snapshot is None or time.monotonic() - snapshot.built_at >= self.refresh_seconds:
+                    try:
+                        self._snapshots[key] = await self._build(key)
+                    except Exception as e:
+                        print(f"Error building anonymous {key[0]} feed: {e}")
+                    else:
+                        if snapshot is not None:
+                            snapshot.retired_at = time.monotonic()
+                            self._retired[snapshot.version] = snapshot
+            self._expire_retired()
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.refresh_seconds)
+            except asyncio.TimeoutError:
+                pass
+    
+    def _expire_retired(self) -> None:
+        now = time.monotonic()
+        for version, snapshot in list(self._retired.items()):
+            if now - snapshot.retired_at > self.refresh_seconds:
+                del self._retired[version]
+    
+    async def _build(self, key: AnonKey) -> AnonymousSnapshot:
+        from app.services.feed_service import FeedService
+        
+        kind, param = key
+        async with async_session_maker() as session:
+            service = FeedService(session)
+            if kind == ANON_TRENDING:
+                feed = await service.get_trending(limit=self.window, window=param)
+            else:
+                feed = await service.get_feed(limit=self.window, content_type=param)
+        return AnonymousSnapshot(
+            [render_feed_item(item) for item in feed.items],
+            [item.content.id for item in feed.items],
+            feed.next_cursor,
+            feed.total_available,
+            feed.feed_id,
+        )
+
+
+anonymous_feed = AnonymousFeedCache()
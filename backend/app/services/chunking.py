@@ -0,0 +1,93 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+from app.core.config import settings
+
+# Chunks are (text, token count)
+Chunk = Tuple[str, int]
+
+# Rough characters per token, used only when no tokenizer can be loaded
+FALLBACK_CHARS_PER_TOKEN = 4
+
+_executor = ThreadPoolExecutor(
+    max_workers=settings.embedding_chunk_workers, thread_name_prefix="tokenizer"
+)
+
+
+@lru_cache()
+def get_encoding(model: str):
+    """The tiktoken encoding for `model` (cl100k_base if unknown), or None if tiktoken is unavailable."""
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        # e.g. the BPE file cannot be downloaded in an air-gapped deployment
+        print(f"Error loading tokenizer for {model}: {e}")
+        return None
+
+
+def count_tokens(text: str, model: str) -> int:
+    encoding = get_encoding(model)
+    if encoding is None:
+        return -(-len(text) // FALLBACK_CHARS_PER_TOKEN)
+    return len(encoding.encode_ordinary(text))
+
+
+def truncate_tokens(text: str, model: str, max_tokens: int) -> str:
+    """`text` cut to at most `max_tokens` tokens."""
+    # Every token covers at least one byte, so short texts need no encoding
+    if len(text.encode()) <= max_tokens:
+        return text
+    encoding = get_encoding(model)
+    if encoding is None:
+        return text[:max_tokens * FALLBACK_CHARS_PER_TOKEN]
+    tokens = encoding.encode_ordinary(text)
+    if len(tokens) <= max_tokens:
+        return text
+    return encoding.decode(tokens[:max_tokens])
+
+
+def chunk_text(
+    text: str,
+    model: str,
+    chunk_tokens: int = settings.embedding_chunk_tokens,
+    overlap: int = settings.embedding_chunk_overlap,
+    max_chunks: int = settings.embedding_max_chunks,
+) -> List[Chunk]:
+    """
+    Split `text` into windows of at most `chunk_tokens` tokens, overlapping by `overlap`.
+    
+    Past `max_chunks`, evenly spaced windows are kept, so the pooled
+    embedding still covers the whole text rather than just its head.
+    """
+    encoding = get_encoding(model)
+    if encoding is None:
+        size = chunk_tokens * FALLBACK_CHARS_PER_TOKEN
+        step = max((chunk_tokens - overlap) * FALLBACK_CHARS_PER_TOKEN, 1)
+        end = max(len(text) - overlap * FALLBACK_CHARS_PER_TOKEN, 1)
+        pieces = [text[start:start + size] for start in range(0, end, step)]
+        chunks = [(piece, -(-len(piece) // FALLBACK_CHARS_PER_TOKEN)) for piece in pieces]
+    else:
+        tokens = encoding.encode_ordinary(text)
+        step = max(chunk_tokens - overlap, 1)
+        end = max(len(tokens) - overlap, 1)
+        windows = [tokens[start:start + chunk_tokens] for start in range(0, end, step)]
+        chunks = [(encoding.decode(window), len(window)) for window in windows]
+    
+    if len(chunks) > max_chunks > 1:
+        last = len(chunks) - 1
+        chunks = [chunks[round(i * last / (max_chunks - 1))] for i in range(max_chunks)]
+    return chunks[:max(max_chunks, 1)]
+
+
+async def run_tokenizer(func, *args):
+    """Run a tokenizer function on the worker pool, off the event loop."""
+    return await asyncio.get_running_loop().run_in_executor(_executor, func, *args)
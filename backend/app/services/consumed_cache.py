@@ -0,0 +1,188 @@
+import hashlib
+import math
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional
+from uuid import UUID
+import numpy as np
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.models.agent import AgentConsumption
+from app.models.content import Content
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over UUIDs, backed by a NumPy bit array."""
+    
+    def __init__(self, capacity: int, error_rate: float):
+        self.num_bits = max(64, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self.bits = np.zeros((self.num_bits + 7) // 8, dtype=np.uint8)
+    
+    def _positions(self, item: UUID) -> np.ndarray:
+        # Double hashing: h1 + i * h2 gives k well-spread positions from one digest
+        digest = hashlib.blake2b(item.bytes, digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return np.array(
+            [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)],
+            dtype=np.int64,
+        )
+    
+    def add(self, item: UUID) -> bool:
+        """Add an item; returns False if it was (probably) already present."""
+        positions = self._positions(item)
+        masks = (1 << (positions & 7)).astype(np.uint8)
+        present = bool(np.all(self.bits[positions >> 3] & masks))
+        np.bitwise_or.at(self.bits, positions >> 3, masks)
+        return not present
+    
+    def __contains__(self, item: UUID) -> bool:
+        positions = self._positions(item)
+        masks = (1 << (positions & 7)).astype(np.uint8)
+        return bool(np.all(self.bits[positions >> 3] & masks))
+    
+    @property
+    def nbytes(self) -> int:
+        return self.bits.nbytes
+
+
+class ConsumedSet:
+    """
+    Compact set of content IDs an agent has consumed.
+    
+    The Bloom filter reports false positives at roughly the configured
+    error rate. Left alone, a false positive would hide an unseen item for
+    as long as the set is cached (every page of every scroll until the TTL
+    expires), so feed seeks call `confirm` on each batch: IDs the filter
+    matches are checked against the agent's consumption rows in one indexed
+    query, and those that turn out unseen are remembered and served.
+    Membership is then exact for every confirmed ID.
+    """
+    
+    def __init__(self, capacity: int, error_rate: float, agent_id: Optional[UUID] = None):
+        self.capacity = capacity
+        self.agent_id = agent_id
+        self.bloom = BloomFilter(capacity, error_rate)
+        self.counts: Dict[str, int] = {}
+        self.loaded_at = time.monotonic()
+        self._checked: Dict[UUID, bool] = {}  # Bloom matches confirmed against SQL
+    
+    def add(self, content_id: UUID, content_type: Optional[str] = None) -> None:
+        self._checked.pop(content_id, None)
+        if self.bloom.add(content_id):
+            key = content_type or ""
+            self.counts[key] = self.counts.get(key, 0) + 1
+    
+    def __contains__(self, content_id: UUID) -> bool:
+        return content_id in self.bloom and self._checked.get(content_id, True)
+    
+    async def confirm(self, db: AsyncSession, content_ids: Iterable[UUID]) -> None:
+        """Check the filter's unconfirmed matches among `content_ids` against the database."""
+        doubtful = [cid for cid in content_ids if cid not in self._checked and cid in self.bloom]
+        if not doubtful or self.agent_id is None:
+            return
+        result = await db.execute(
+            select(AgentConsumption.content_id).where(
+                AgentConsumption.agent_id == self.agent_id,
+                AgentConsumption.content_id.in_(doubtful),
+            )
+        )
+        consumed = set(result.scalars().all())
+        if len(self._checked) + len(doubtful) > self.capacity:
+            # Confirmed consumption is what the filter says anyway; keep the false positives
+            self._checked = {cid: seen for cid, seen in self._checked.items() if not seen}
+        for cid in doubtful:
+            self._checked[cid] = cid in consumed
+    
+    @property
+    def size(self) -> int:
+        return sum(self.counts.values())
+    
+    @property
+    def saturated(self) -> bool:
+        """Past capacity the error rate climbs, so callers should use the exact SQL path."""
+        return self.size > self.capacity
+    
+    def count_for(self, content_type: Optional[str] = None) -> int:
+        """Distinct consumed items, optionally of one content type."""
+        if content_type:
+            return self.counts.get(content_type, 0)
+        return self.size
+
+
+class ConsumedCache:
+    """
+    Per-agent consumed-content sets kept in process memory.
+    
+    Each agent costs a fixed-size Bloom filter; agents are evicted
+    least-recently-used beyond `max_agents` and reloaded after `ttl_seconds`,
+    which also bounds staleness across workers. Sets are per worker: a
+    consumption logged on another worker is hidden here once the set is
+    reloaded, and until then only by the SQL paths.
+    """
+    
+    def __init__(
+        self,
+        max_agents: int = settings.consumed_cache_max_agents,
+        capacity: int = settings.consumed_cache_capacity,
+        error_rate: float = settings.consumed_cache_error_rate,
+        ttl_seconds: float = settings.consumed_cache_ttl_seconds,
+    ):
+        self.max_agents = max_agents
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.ttl_seconds = ttl_seconds
+        self._sets: "OrderedDict[UUID, ConsumedSet]" = OrderedDict()
+    
+    def _lookup(self, agent_id: UUID) -> Optional[ConsumedSet]:
+        consumed = self._sets.get(agent_id)
+        if consumed is None:
+            return None
+        if time.monotonic() - consumed.loaded_at > self.ttl_seconds:
+            del self._sets[agent_id]
+            return None
+        self._sets.move_to_end(agent_id)
+        return consumed
+    
+    async def get(self, db: AsyncSession, agent_id: UUID) -> Optional[ConsumedSet]:
+        """
+        Get the agent's consumed set, loading it once on a miss.
+        
+        Returns None when the agent's history is too large for a bounded
+        set; callers then fall back to the SQL anti-join.
+        """
+        consumed = self._lookup(agent_id)
+        if consumed is None:
+            consumed = await self._load(db, agent_id)
+            self._sets[agent_id] = consumed
+            while len(self._sets) > self.max_agents:
+                self._sets.popitem(last=False)
+        return None if consumed.saturated else consumed
+    
+    async def _load(self, db: AsyncSession, agent_id: UUID) -> ConsumedSet:
+        consumed = ConsumedSet(self.capacity, self.error_rate, agent_id)
+        result = await db.execute(
+            select(AgentConsumption.content_id, Content.content_type)
+            .join(Content, Content.id == AgentConsumption.content_id)
+            .where(AgentConsumption.agent_id == agent_id)
+            .group_by(AgentConsumption.content_id, Content.content_type)
+            .limit(self.capacity + 1)
+        )
+        for content_id, content_type in result.all():
+            consumed.add(content_id, content_type.value)
+        return consumed
+    
+    def add(self, agent_id: UUID, content_id: UUID, content_type: Optional[str] = None) -> None:
+        """Record a consumption incrementally; agents not in cache load fresh later."""
+        consumed = self._sets.get(agent_id)
+        if consumed is not None:
+            consumed.add(content_id, content_type)
+    
+    def invalidate(self, agent_id: UUID) -> None:
+        self._sets.pop(agent_id, None)
+
+
+consumed_cache = ConsumedCache()
@@ -1,19 +1,72 @@
-from typing import List, Optional
+from typing import Dict, List, Optional, Set, Tuple
 from uuid import UUID
 from datetime import datetime
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update, func
-from sqlalchemy.orm import selectinload
+from sqlalchemy import select, update, delete, func, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import selectinload, load_only, defer
 from pgvector.sqlalchemy import Vector
 
-from app.models.content import Content, ContentType
+from app.core.config import settings
+from app.core.cursor import apply_keyset, decode_cursor, encode_cursor, parse_key
+from app.models.content import Content, ContentType, ContentCounter
+from app.models.agent import AgentConsumption
 from app.schemas.content import ContentCreate, ContentAgentView
 from app.services.embedding_service import embedding_service
+from app.services.feed_queue import feed_queues
+from app.services.neighbors import NeighborService, neighbor_refresher
+from app.services.trending import trending
+from app.services.vector_search import vector_backend
+from app.services.view_cache import view_cache
+
+LISTING_CURSOR = "listing"
+
+# ContentAgentView fields and the Content columns each is built from
+AGENT_VIEW_COLUMNS = {
+    "id": [],
+    "type": [Content.content_type],
+    "title": [Content.title],
+    "description": [Content.description],
+    "transcript": [Content.transcript],
+    "raw_text": [Content.raw_text],
+    "summary": [Content.summary],
+    "duration_seconds": [Content.duration_seconds],
+    "tags": [Content.tags],
+    "metadata": [Content.extra_data],
+    "created_at": [Content.created_at],
+    "relevance_score": [],
+    "similar_content_ids": [],
+}
+
+
+def parse_fields(fields: Optional[str]) -> Optional[Set[str]]:
+    """
+    Parse a `fields=` projection ("title,summary,tags") into view field names.
+    
+    Returns None (the full view) when nothing is requested; raises
+    ValueError for unknown fields.
+    """
+    if not fields:
+        return None
+    requested = {f.strip() for f in fields.split(",") if f.strip()}
+    unknown = requested - AGENT_VIEW_COLUMNS.keys()
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+    return requested | {"id"}
 
 
 class ContentService:
-    def __init__(self, db: AsyncSession):
+    def __init__(self, db: AsyncSession, fields: Optional[Set[str]] = None):
         self.db = db
+        self.fields = fields
+        
+        # Load only the columns the agent view needs (never the embedding);
+        # anything else raises instead of lazy loading. updated_at versions
+        # the serialized-view cache.
+        columns = [Content.id, Content.updated_at]
+        for name in fields or AGENT_VIEW_COLUMNS:
+            columns.extend(AGENT_VIEW_COLUMNS[name])
+        self.view_options = [load_only(*columns, raiseload=True)]
     
     async def create(self, content_data: ContentCreate) -> Content:
         """Create new content and generate embeddings."""
@@ -30,15 +83,52 @@ class ContentService:
         # Generate embedding from available text
         text_for_embedding = self._get_text_for_embedding(content_data)
         if text_for_embedding:
-            embedding = await embedding_service.generate_embedding(text_for_embedding)
+            embedding = await embedding_service.generate_document_embedding(text_for_embedding)
             if embedding:
                 content.embedding = embedding
         
         self.db.add(content)
+        await self._adjust_counter(content.content_type, 1)
         await self.db.commit()
         await self.db.refresh(content)
+        
+        if content.embedding is not None:
+            if vector_backend.enabled:
+                await vector_backend.add(content.id, content.content_type.value, content.embedding)
+            await NeighborService(self.db).add(content.id, content.embedding)
+            feed_queues.offer(content.id, content.content_type.value, content.embedding)
         return content
     
+    async def delete(self, content_id: UUID) -> bool:
+        """Delete content along with its consumption records."""
+        content = await self.get_by_id(content_id)
+        if not content:
+            return False
+        
+        await self.db.execute(
+            delete(AgentConsumption).where(AgentConsumption.content_id == content_id)
+        )
+        stale = await NeighborService(self.db).remove(content_id)
+        await self.db.delete(content)
+        await self._adjust_counter(content.content_type, -1)
+        await self.db.commit()
+        
+        neighbor_refresher.mark_stale(stale)
+        trending.remove(content_id)
+        view_cache.invalidate(content_id)
+        if vector_backend.enabled:
+            await vector_backend.remove(content_id)
+        return True
+    
+    async def _adjust_counter(self, content_type: ContentType, delta: int) -> None:
+        """Update the maintained per-type count in the caller's transaction."""
+        stmt = insert(ContentCounter).values(content_type=content_type, count=delta)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[ContentCounter.content_type],
+            set_={"count": ContentCounter.count + delta},
+        )
+        await self.db.execute(stmt)
+    
     def _get_text_for_embedding(self, content: ContentCreate) -> str:
         """Extract text for embedding generation."""
         parts = [content.title]
@@ -57,19 +147,50 @@ class ContentService:
         )
         return result.scalar_one_or_none()
     
+    async def get_by_ids(self, content_ids: List[UUID], *criteria) -> Dict[UUID, Content]:
+        """Load content rows by ID in one query, keyed by ID (order is the caller's)."""
+        if not content_ids:
+            return {}
+        result = await self.db.execute(
+            select(Content)
+            .where(Content.id.in_(content_ids), *criteria)
+            .options(*self.view_options)
+        )
+        return {c.id: c for c in result.scalars().all()}
+    
     async def get_all(
         self, 
-        skip: int = 0, 
+        cursor: Optional[str] = None, 
         limit: int = 50,
-        content_type: Optional[ContentType] = None
-    ) -> List[Content]:
-        """Get all content with pagination."""
-        query = select(Content)
+        content_type: Optional[ContentType] = None,
+        skip: int = 0,
+    ) -> Tuple[List[Content], Optional[str]]:
+        """
+        Get content newest first, paginated by a (created_at, id) keyset cursor.
+        
+        `skip` is the deprecated OFFSET pagination, honoured only without a
+        cursor; its pages still return a cursor to continue from.
+        """
+        state = decode_cursor(cursor, LISTING_CURSOR)
+        key = parse_key(state["v"], datetime, UUID) if state else None
+        position = state["p"] if key else skip
+        
+        query = select(Content).options(defer(Content.embedding))
         if content_type:
             query = query.where(Content.content_type == content_type)
-        query = query.order_by(Content.created_at.desc()).offset(skip).limit(limit)
-        result = await self.db.execute(query)
-        return list(result.scalars().all())
+        query = apply_keyset(query, [Content.created_at, Content.id], key, descending=True)
+        if key is None and skip:
+            query = query.offset(skip)
+        result = await self.db.execute(query.limit(limit))
+        contents = list(result.scalars().all())
+        
+        next_cursor = None
+        if len(contents) == limit:
+            last = contents[-1]
+            next_cursor = encode_cursor(
+                LISTING_CURSOR, [last.created_at, last.id], position + len(contents)
+            )
+        return contents, next_cursor
     
     async def search_semantic(
         self, 
@@ -82,13 +203,20 @@ class ContentService:
         if not query_embedding:
             return []
         
+        if vector_backend.enabled:
+            hits = await vector_backend.search(
+                query_embedding, limit, content_type=content_type.value if content_type else None
+            )
+            by_id = await self.get_by_ids([content_id for _, content_id in hits])
+            return [(by_id[cid], 1 - distance) for distance, cid in hits if cid in by_id]
+        
         # Use pgvector's cosine distance
         stmt = select(
             Content,
             Content.embedding.cosine_distance(query_embedding).label("distance")
         ).where(
             Content.embedding.isnot(None)
-        )
+        ).options(*self.view_options)
         
         if content_type:
             stmt = stmt.where(Content.content_type == content_type)
@@ -103,7 +231,7 @@ class ContentService:
         """Search content by tags."""
         query = select(Content).where(
             Content.tags.overlap(tags)
-        ).order_by(Content.created_at.desc()).limit(limit)
+        ).options(*self.view_options).order_by(Content.created_at.desc()).limit(limit)
         result = await self.db.execute(query)
         return list(result.scalars().all())
     
@@ -124,44 +252,115 @@ class ContentService:
         content.updated_at = datetime.utcnow()
         await self.db.commit()
         await self.db.refresh(content)
+        view_cache.invalidate(content_id)
+        
+        if "embedding" in kwargs and content.embedding is not None:
+            if vector_backend.enabled:
+                await vector_backend.add(content.id, content.content_type.value, content.embedding)
+            await NeighborService(self.db).add(content.id, content.embedding)
+            feed_queues.offer(content.id, content.content_type.value, content.embedding)
         return content
     
     async def increment_view(self, content_id: UUID) -> None:
-        """Increment view count."""
-        await self.db.execute(
+        """Increment view count and the decayed trending scores."""
+        result = await self.db.execute(
             update(Content)
             .where(Content.id == content_id)
             .values(view_count=Content.view_count + 1)
+            .returning(Content.content_type)
         )
+        content_type = result.scalar()
         await self.db.commit()
+        if content_type is not None:
+            trending.record(content_id, content_type.value, settings.trending_view_weight)
     
     async def increment_consumption(self, content_id: UUID) -> None:
-        """Increment agent consumption count."""
-        await self.db.execute(
+        """Increment agent consumption count and the decayed trending scores."""
+        result = await self.db.execute(
             update(Content)
             .where(Content.id == content_id)
             .values(agent_consumption_count=Content.agent_consumption_count + 1)
+            .returning(Content.content_type)
         )
+        content_type = result.scalar()
         await self.db.commit()
+        if content_type is not None:
+            trending.record(content_id, content_type.value)
     
-    async def get_total_count(self) -> int:
-        """Get total content count."""
-        result = await self.db.execute(select(func.count(Content.id)))
+    async def get_total_count(
+        self,
+        content_type: Optional[ContentType] = None,
+        approximate: bool = False,
+    ) -> int:
+        """
+        Get total content count from the maintained counters.
+        
+        With `approximate`, the catalog total is read from planner statistics
+        instead (refreshed by ANALYZE/autovacuum). A per-type count is always
+        exact: its counter row is a primary-key read, cheaper than an estimate.
+        """
+        if approximate and not content_type:
+            result = await self.db.execute(
+                text("SELECT reltuples::bigint FROM pg_class WHERE oid = 'content'::regclass")
+            )
+            estimate = result.scalar()
+            # reltuples is -1 (or 0) until the table has been analyzed
+            if estimate and estimate > 0:
+                return estimate
+        
+        query = select(func.coalesce(func.sum(ContentCounter.count), 0))
+        if content_type:
+            query = query.where(ContentCounter.content_type == content_type)
+        result = await self.db.execute(query)
         return result.scalar() or 0
     
-    def to_agent_view(self, content: Content, relevance_score: float = None) -> ContentAgentView:
-        """Convert content to agent-friendly view."""
-        return ContentAgentView(
-            id=str(content.id),
-            type=content.content_type.value,
-            title=content.title,
-            description=content.description,
-            transcript=content.transcript,
-            raw_text=content.raw_text,
-            summary=content.summary,
-            duration_seconds=content.duration_seconds,
-            tags=content.tags or [],
-            metadata=content.extra_data or {},
-            created_at=content.created_at.isoformat() if content.created_at else None,
-            relevance_score=relevance_score,
-        )
+    async def recount(self) -> Dict[str, int]:
+        """Recompute the maintained counters from the content table, repairing drift."""
+        await self.db.execute(text(
+            "INSERT INTO content_counters (content_type, count) "
+            "SELECT content_type, count(*) FROM content GROUP BY content_type "
+            "ON CONFLICT (content_type) DO UPDATE SET count = EXCLUDED.count"
+        ))
+        await self.db.execute(text(
+            "UPDATE content_counters SET count = 0 "
+            "WHERE count <> 0 AND content_type NOT IN (SELECT DISTINCT content_type FROM content)"
+        ))
+        await self.db.commit()
+        result = await self.db.execute(select(ContentCounter.content_type, ContentCounter.count))
+        return {content_type.value: count for content_type, count in result.all()}
+    
+    def to_agent_view(
+        self,
+        content: Content,
+        relevance_score: float = None,
+        similar_ids: Optional[List[str]] = None,
+    ) -> ContentAgentView:
+        """
+        Convert content to agent-friendly view.
+        
+        With a `fields` projection only those fields are set, so responses
+        serialized with exclude_unset carry nothing else. Values come from
+        the database, so the model is built without re-validating them.
+        `similar_ids` come from the neighbour table (see `NeighborService`).
+        """
+        view = {
+            "id": lambda: str(content.id),
+            "type": lambda: content.content_type.value,
+            "title": lambda: content.title,
+            "description": lambda: content.description,
+            "transcript": lambda: content.transcript,
+            "raw_text": lambda: content.raw_text,
+            "summary": lambda: content.summary,
+            "duration_seconds": lambda: content.duration_seconds,
+            "tags": lambda: content.tags or [],
+            "metadata": lambda: content.extra_data or {},
+            "created_at": lambda: content.created_at.isoformat() if content.created_at else None,
+            "relevance_score": lambda: float(relevance_score) if relevance_score is not None else None,
+            "similar_content_ids": lambda: similar_ids or [],
+        }
+        agent_view = ContentAgentView.model_construct(**{
+            name: value() for name, value in view.items()
+            if self.fields is None or name in self.fields
+        })
+        agent_view._version = content.updated_at
+        return agent_view
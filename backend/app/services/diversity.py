@@ -0,0 +1,53 @@
+from typing import List, Optional, Sequence
+import numpy as np
+
+
+def unit_rows(vectors: np.ndarray) -> np.ndarray:
+    """Float32 copy of a matrix with L2-normalized rows (zero rows stay zero)."""
+    matrix = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms > 0, norms, 1)
+
+
+def mmr_select(
+    relevance: Sequence[float],
+    vectors: np.ndarray,
+    k: int,
+    lam: float,
+) -> List[int]:
+    """
+    Pick `k` candidate indices by Maximal Marginal Relevance.
+
+    Each step takes the candidate maximizing
+    lam * relevance - (1 - lam) * max cosine similarity to those already
+    picked. The running max is kept as one vector and updated with a single
+    matrix-vector product per pick, so a 500 x 1536 pool costs k BLAS calls
+    rather than a full pairwise matrix.
+    """
+    rel = np.asarray(relevance, dtype=np.float32)
+    n = len(rel)
+    k = min(k, n)
+    if k <= 0:
+        return []
+
+    unit = unit_rows(vectors)
+    # -1 is the lowest possible cosine, so the first pick is the most relevant
+    max_sim = np.full(n, -1.0, dtype=np.float32)
+    taken = np.zeros(n, dtype=bool)
+    picked = []
+    for _ in range(k):
+        scores = lam * rel - (1 - lam) * max_sim
+        scores[taken] = -np.inf
+        i = int(np.argmax(scores))
+        picked.append(i)
+        taken[i] = True
+        np.maximum(max_sim, unit @ unit[i], out=max_sim)
+    return picked
+
+
+def parse_mmr_lambda(value: Optional[float], default: float) -> Optional[float]:
+    """Resolve a per-request MMR lambda; None (or 1, pure relevance) disables re-ranking."""
+    lam = default if value is None else value
+    if lam is None or lam >= 1:
+        return None
+    return max(float(lam), 0.0)
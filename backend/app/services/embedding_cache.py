@@ -0,0 +1,128 @@
+import hashlib
+import re
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+
+from app.core.config import settings
+from app.core.database import async_session_maker
+from app.models.embedding import EmbeddingCacheEntry
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """Canonical form for cache keys: NFC, with whitespace runs collapsed and trimmed."""
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFC", text)).strip()
+
+
+def embedding_key(model: str, dimensions: int, text: str) -> str:
+    """Cache key for an embedding: SHA-256 of (model, dimensions, normalized text)."""
+    payload = f"{model}\0{dimensions}\0{normalize_text(text)}".encode()
+    return hashlib.sha256(payload).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Two-tier embedding cache.
+    
+    Tier one is an in-process LRU of float32 arrays; tier two is the
+    `embedding_cache` table, shared by every worker and kept across
+    restarts. Lookups try the LRU first and fetch all remaining keys from
+    the table in one query; hits from the table are promoted to the LRU.
+    """
+    
+    def __init__(
+        self,
+        max_items: int = settings.embedding_cache_max_items,
+        persistent: bool = settings.embedding_cache_persistent,
+    ):
+        self.max_items = max_items
+        self.persistent = persistent
+        self.memory_hits = 0
+        self.persistent_hits = 0
+        self.misses = 0
+        self.errors = 0
+        self._entries: "OrderedDict[str, np.ndarray]" = OrderedDict()
+    
+    async def get_many(self, keys: Iterable[str]) -> Dict[str, np.ndarray]:
+        found: Dict[str, np.ndarray] = {}
+        missing = []
+        for key in dict.fromkeys(keys):
+            vector = self._entries.get(key)
+            if vector is None:
+                missing.append(key)
+            else:
+                self._entries.move_to_end(key)
+                found[key] = vector
+        self.memory_hits += len(found)
+        
+        stored: Dict[str, np.ndarray] = {}
+        if missing and self.persistent:
+            stored = await self._load(missing)
+            for key, vector in stored.items():
+                self._remember(key, vector)
+            found.update(stored)
+        self.persistent_hits += len(stored)
+        self.misses += len(missing) - len(stored)
+        return found
+    
+    async def put_many(self, vectors: Dict[str, np.ndarray]) -> None:
+        if not vectors:
+            return
+        for key, vector in vectors.items():
+            self._remember(key, vector)
+        if self.persistent:
+            await self._store(vectors)
+    
+    def _remember(self, key: str, vector: np.ndarray) -> None:
+        self._entries[key] = np.asarray(vector, dtype=np.float32)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_items:
+            self._entries.popitem(last=False)
+    
+    async def _load(self, keys: list) -> Dict[str, np.ndarray]:
+        try:
+            async with async_session_maker() as session:
+                result = await session.execute(
+                    select(EmbeddingCacheEntry.key, EmbeddingCacheEntry.embedding)
+                    .where(EmbeddingCacheEntry.key.in_(keys))
+                )
+                return {key: np.asarray(e, dtype=np.float32) for key, e in result.all()}
+        except Exception as e:
+            self.errors += 1
+            print(f"Error reading embedding cache: {e}")
+            return {}
+    
+    async def _store(self, vectors: Dict[str, np.ndarray]) -> None:
+        try:
+            async with async_session_maker() as session:
+                await session.execute(
+                    insert(EmbeddingCacheEntry)
+                    .values([{"key": key, "embedding": vector} for key, vector in vectors.items()])
+                    .on_conflict_do_nothing(index_elements=[EmbeddingCacheEntry.key])
+                )
+                await session.commit()
+        except Exception as e:
+            self.errors += 1
+            print(f"Error writing embedding cache: {e}")
+    
+    def stats(self) -> dict:
+        lookups = self.memory_hits + self.persistent_hits + self.misses
+        hits = self.memory_hits + self.persistent_hits
+        return {
+            "items_in_memory": len(self._entries),
+            "memory_hits": self.memory_hits,
+            "persistent_hits": self.persistent_hits,
+            "misses": self.misses,
+            "hit_rate": round(hits / lookups, 4) if lookups else None,
+            "errors": self.errors,
+        }
+
+
+embedding_cache: Optional[EmbeddingCache] = (
+    EmbeddingCache() if settings.embedding_cache_enabled else None
+)
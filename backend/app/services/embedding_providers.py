@@ -0,0 +1,104 @@
+import hashlib
+import re
+from functools import lru_cache
+from typing import List
+import numpy as np
+
+from app.core.config import settings
+
+_WORD = re.compile(r"\w+")
+
+
+class OpenAIProvider:
+    """Embeddings from the OpenAI embeddings API."""
+    
+    name = "openai"
+    remote = True
+    
+    def __init__(self, api_key: str, model: str, dimensions: int):
+        from openai import AsyncOpenAI
+        
+        self.client = AsyncOpenAI(api_key=api_key)
+        self.model = model
+        self.dimensions = dimensions
+    
+    async def embed(self, texts: List[str]) -> List[List[float]]:
+        """One embeddings API call for `texts`, in order."""
+        response = await self.client.embeddings.create(
+            model=self.model,
+            input=texts,
+            dimensions=self.dimensions
+        )
+        return [item.embedding for item in response.data]
+
+
+@lru_cache(maxsize=200000)
+def _feature_hash(feature: str) -> int:
+    # Python's hash() is salted per process; blake2b keeps vectors stable across workers
+    return int.from_bytes(hashlib.blake2b(feature.encode(), digest_size=8).digest(), "little")
+
+
+class LocalHashProvider:
+    """
+    Offline embeddings: a signed feature-hashing projection.
+    
+    Lower-cased word unigrams and bigrams are hashed into `dimensions`
+    buckets with a hash-derived sign, weighted by sublinear term frequency
+    (1 + log tf) and L2-normalized, so cosine similarity tracks word
+    overlap. There is no fitted vocabulary or IDF table: the same text
+    maps to the same vector in every worker, run and CI job, on CPU only.
+    """
+    
+    name = "local"
+    remote = False
+    
+    def __init__(self, dimensions: int):
+        self.model = "local-hash"
+        self.dimensions = dimensions
+    
+    def embed_sync(self, texts: List[str]) -> np.ndarray:
+        rows, hashes = [], []
+        for row, text in enumerate(texts):
+            words = _WORD.findall(text.lower())
+            features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+            hashes.extend(_feature_hash(f) for f in features)
+            rows.extend([row] * len(features))
+        
+        matrix = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        if hashes:
+            # Count each (row, feature) pair once, then scatter its weight into its bucket
+            pairs, tf = np.unique(
+                np.stack([np.asarray(rows, dtype=np.uint64), np.asarray(hashes, dtype=np.uint64)], axis=1),
+                axis=0,
+                return_counts=True,
+            )
+            buckets = (pairs[:, 1] % np.uint64(self.dimensions)).astype(np.int64)
+            signs = np.where(pairs[:, 1] >> np.uint64(63), -1.0, 1.0)
+            np.add.at(matrix, (pairs[:, 0].astype(np.int64), buckets), signs * (1.0 + np.log(tf)))
+        
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        return matrix / np.where(norms > 0, norms, 1.0)
+    
+    async def embed(self, texts: List[str]) -> List[List[float]]:
+        # Hashing is cheap enough (well under a millisecond for short texts) to run inline
+        return self.embed_sync(texts).tolist()
+
+
+def make_provider(name: str = settings.embedding_provider):
+    """
+    The embedding provider named by `embedding_provider`, or None if embeddings are disabled.
+    
+    "auto" uses OpenAI when `openai_api_key` is set and the local backend
+    otherwise. Switching providers changes the vector space, so stored
+    content embeddings have to be regenerated after a switch; until then
+    `EmbeddingService.check_space` refuses to embed with the new provider.
+    """
+    if name == "auto":
+        name = "openai" if settings.openai_api_key else "local"
+    if name == "openai":
+        if not settings.openai_api_key:
+            return None
+        return OpenAIProvider(settings.openai_api_key, settings.embedding_model, settings.embedding_dimensions)
+    if name == "local":
+        return LocalHashProvider(settings.embedding_dimensions)
+    return None
@@ -0,0 +1,304 @@
+import asyncio
+import heapq
+import itertools
+import random
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.services.chunking import count_tokens, run_tokenizer
+
+# Priority classes: lower numbers are dispatched first
+INTERACTIVE = 0  # search queries and agent registration, someone is waiting
+BACKGROUND = 1  # content ingest and backfill
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BACKGROUND: "background"}
+
+RETRYABLE_STATUS = {408, 409, 429}
+
+
+def is_retryable(error: Exception) -> bool:
+    """Rate limits, server errors, timeouts and dropped connections are worth retrying."""
+    status = getattr(error, "status_code", None)
+    if status is not None:
+        return status in RETRYABLE_STATUS or status >= 500
+    return isinstance(error, (ConnectionError, asyncio.TimeoutError)) or type(error).__name__ in {
+        "APIConnectionError",
+        "APITimeoutError",
+    }
+
+
+def retry_after(error: Exception) -> float:
+    """Seconds from the error's Retry-After header, or 0."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after", 0))
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _count_all(texts: List[str], model: str) -> List[int]:
+    return [count_tokens(text, model) for text in texts]
+
+
+class TokenBucket:
+    """
+    Per-minute rate limit, refilled continuously up to one minute's worth.
+    
+    Waiters are served in arrival order; a rate of 0 disables the limit.
+    """
+    
+    def __init__(self, per_minute: float):
+        self.capacity = per_minute
+        self.rate = per_minute / 60
+        self.level = per_minute
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+    
+    async def acquire(self, amount: float) -> None:
+        if self.rate <= 0:
+            return
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.level >= amount:
+                    self.level -= amount
+                    return
+                await asyncio.sleep((amount - self.level) / self.rate)
+    
+    def release(self, amount: float) -> None:
+        """Give back budget taken for a request that was not sent."""
+        if self.rate > 0:
+            self.level = min(self.capacity, self.level + amount)
+
+
+class _Job:
+    __slots__ = ("texts", "tokens", "priority", "seq", "future", "enqueued", "attempts")
+    
+    def __init__(self, texts: List[str], tokens: int, priority: int, seq: int, future: asyncio.Future):
+        self.texts = texts
+        self.tokens = tokens
+        self.priority = priority
+        self.seq = seq
+        self.future = future
+        self.enqueued = time.monotonic()
+        self.attempts = 0
+
+
+class EmbeddingScheduler:
+    """
+    Rate-limited, prioritized dispatch of embedding requests to a provider.
+    
+    Submitted texts are split into batches of at most `max_batch_tokens`
+    tokens and `max_batch_inputs` inputs and queued by priority class, so
+    interactive queries jump ahead of backfill. Up to `max_concurrency`
+    workers send batches, each first taking from the request and token
+    per-minute buckets. A worker picks its batch only once it holds a
+    request slot, and swaps it for a more urgent one queued while it waited
+    on the token bucket, so rate limiting never holds interactive work
+    behind backfill. Retryable failures are re-queued with full-jitter
+    exponential backoff (at least the server's Retry-After) without holding
+    a worker; a batch that still fails leaves None for its own texts only.
+    Stopping the scheduler fails every batch that has not been sent.
+    """
+    
+    def __init__(
+        self,
+        send: Callable[[List[str]], Awaitable[List[List[float]]]],
+        model: str,
+        requests_per_minute: float = settings.embedding_requests_per_minute,
+        tokens_per_minute: float = settings.embedding_tokens_per_minute,
+        max_concurrency: int = settings.embedding_max_concurrency,
+        max_batch_tokens: int = settings.embedding_max_batch_tokens,
+        max_batch_inputs: int = settings.embedding_max_batch_inputs,
+        max_retries: int = settings.embedding_max_retries,
+        retry_base_seconds: float = settings.embedding_retry_base_seconds,
+        retry_max_seconds: float = settings.embedding_retry_max_seconds,
+    ):
+        self.send = send
+        self.model = model
+        self.max_concurrency = max_concurrency
+        self.max_batch_tokens = max_batch_tokens
+        self.max_batch_inputs = max_batch_inputs
+        self.max_retries = max_retries
+        self.retry_base_seconds = retry_base_seconds
+        self.retry_max_seconds = retry_max_seconds
+        self._requests = TokenBucket(requests_per_minute)
+        self._tokens = TokenBucket(tokens_per_minute)
+        self._heap: List[Tuple[int, int, _Job]] = []
+        self._work = asyncio.Event()
+        self._seq = itertools.count()
+        self._workers: List[asyncio.Task] = []
+        self._retrying: Dict[asyncio.TimerHandle, _Job] = {}
+        
+        self.in_flight = 0
+        self.batches = 0
+        self.retries = 0
+        self.failures = 0
+        self._queued: Dict[int, int] = {p: 0 for p in PRIORITY_NAMES}
+        self._waits: Dict[int, List[float]] = {p: [0, 0.0, 0.0] for p in PRIORITY_NAMES}  # count, total, max
+    
+    async def submit(self, texts: List[str], priority: int = BACKGROUND) -> List[Optional[List[float]]]:
+        """Embeddings for `texts` in order; None for texts whose batch failed for good."""
+        if not texts:
+            return []
+        self._ensure_workers()
+        
+        counts = await run_tokenizer(_count_all, texts, self.model)
+        loop = asyncio.get_running_loop()
+        jobs = []
+        for batch, tokens in self._split(texts, counts):
+            job = _Job(batch, tokens, priority, next(self._seq), loop.create_future())
+            self._enqueue(job)
+            jobs.append(job)
+        
+        results = await asyncio.gather(*(job.future for job in jobs), return_exceptions=True)
+        embeddings: List[Optional[List[float]]] = []
+        for job, result in zip(jobs, results):
+            if isinstance(result, BaseException):
+                print(f"Error generating embeddings for {len(job.texts)} inputs: {result}")
+                embeddings.extend([None] * len(job.texts))
+            else:
+                embeddings.extend(result)
+        return embeddings
+    
+    def _split(self, texts: List[str], counts: List[int]):
+        batch, tokens = [], 0
+        for text, count in zip(texts, counts):
+            if batch and (tokens + count > self.max_batch_tokens or len(batch) >= self.max_batch_inputs):
+                yield batch, tokens
+                batch, tokens = [], 0
+            batch.append(text)
+            tokens += count
+        if batch:
+            yield batch, tokens
+    
+    def _enqueue(self, job: _Job) -> None:
+        self._queued[job.priority] += 1
+        # The original sequence number keeps a retried batch ahead of later work
+        heapq.heappush(self._heap, (job.priority, job.seq, job))
+        self._work.set()
+    
+    def _take(self) -> Optional[_Job]:
+        """The most urgent queued job whose caller is still waiting, or None."""
+        while self._heap:
+            _, _, job = heapq.heappop(self._heap)
+            self._queued[job.priority] -= 1
+            if not job.future.done():
+                return job
+        self._work.clear()
+        return None
+    
+    def _retry_later(self, delay: float, job: _Job) -> None:
+        def requeue() -> None:
+            self._retrying.pop(handle, None)
+            self._enqueue(job)
+        
+        handle = asyncio.get_running_loop().call_later(delay, requeue)
+        self._retrying[handle] = job
+    
+    def _ensure_workers(self) -> None:
+        self._workers = [w for w in self._workers if not w.done()]
+        while len(self._workers) < self.max_concurrency:
+            self._workers.append(asyncio.create_task(self._run()))
+    
+    async def stop(self) -> None:
+        for worker in self._workers:
+            worker.cancel()
+        for worker in self._workers:
+            try:
+                await worker
+            except asyncio.CancelledError:
+                pass
+        self._workers = []
+        
+        # Fail what is still queued or waiting to retry, so callers don't hang
+        stopped = RuntimeError("Embedding scheduler stopped")
+        for handle, job in self._retrying.items():
+            handle.cancel()
+            if not job.future.done():
+                job.future.set_exception(stopped)
+        self._retrying.clear()
+        while (job := self._take()) is not None:
+            job.future.set_exception(stopped)
+    
+    async def _run(self) -> None:
+        while True:
+            await self._work.wait()
+            # Choose the batch only once a request slot is held, so a batch
+            # queued while the bucket was empty is still considered
+            await self._requests.acquire(1)
+            job = self._take()
+            if job is None:
+                self._requests.release(1)
+                continue
+            try:
+                await self._tokens.acquire(job.tokens)
+                # Something more urgent may have been queued while waiting for tokens
+                while self._heap and self._heap[0][:2] < (job.priority, job.seq):
+                    better = self._take()
+                    if better is None:
+                        break
+                    self._enqueue(job)
+                    if better.tokens > job.tokens:
+                        await self._tokens.acquire(better.tokens - job.tokens)
+                    else:
+                        self._tokens.release(job.tokens - better.tokens)
+                    job = better
+            except asyncio.CancelledError:
+                if not job.future.done():
+                    job.future.set_exception(RuntimeError("Embedding scheduler stopped"))
+                raise
+            if job.attempts == 0:
+                self._record_wait(job.priority, time.monotonic() - job.enqueued)
+            
+            self.in_flight += 1
+            self.batches += 1
+            try:
+                vectors = await self.send(job.texts)
+            except asyncio.CancelledError:
+                if not job.future.done():
+                    job.future.set_exception(RuntimeError("Embedding scheduler stopped"))
+                raise
+            except Exception as e:
+                if job.attempts < self.max_retries and is_retryable(e):
+                    self.retries += 1
+                    delay = random.uniform(
+                        0, min(self.retry_max_seconds, self.retry_base_seconds * 2 ** job.attempts)
+                    )
+                    job.attempts += 1
+                    self._retry_later(max(delay, retry_after(e)), job)
+                else:
+                    self.failures += 1
+                    if not job.future.done():
+                        job.future.set_exception(e)
+            else:
+                if not job.future.done():
+                    job.future.set_result(vectors)
+            finally:
+                self.in_flight -= 1
+    
+    def _record_wait(self, priority: int, wait: float) -> None:
+        stats = self._waits[priority]
+        stats[0] += 1
+        stats[1] += wait
+        stats[2] = max(stats[2], wait)
+    
+    def stats(self) -> dict:
+        return {
+            "queue_depth": {PRIORITY_NAMES[p]: n for p, n in self._queued.items()},
+            "in_flight": self.in_flight,
+            "batches": self.batches,
+            "retries": self.retries,
+            "failures": self.failures,
+            "wait_ms": {
+                PRIORITY_NAMES[p]: {
+                    "mean": round(total / count * 1000, 2) if count else None,
+                    "max": round(longest * 1000, 2),
+                }
+                for p, (count, total, longest) in self._waits.items()
+            },
+        }
@@ -1,51 +1,269 @@
-from typing import List, Optional
+import asyncio
+from functools import partial
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
 import numpy as np
-from openai import AsyncOpenAI
+from sqlalchemy import exists, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.config import settings
+from app.services.chunking import chunk_text, run_tokenizer, truncate_tokens
+from app.services.embedding_cache import embedding_cache, embedding_key
+from app.services.embedding_providers import make_provider
+from app.services.embedding_scheduler import BACKGROUND, INTERACTIVE, PRIORITY_NAMES, EmbeddingScheduler
+
+EMBEDDING_SPACE = "default"
+
+
+class EmbeddingCoalescer:
+    """
+    Micro-batches concurrent single-text embedding requests.
+    
+    Calls arriving within `window_seconds` of the first pending one (or
+    until `max_batch` are waiting) are sent as one batch request, with
+    identical texts sent once; each caller's future gets its own vector,
+    or the batch's exception.
+    """
+    
+    def __init__(
+        self,
+        send: Callable[[List[str]], Awaitable[List[List[float]]]],
+        window_seconds: float = settings.embedding_batch_window_ms / 1000,
+        max_batch: int = settings.embedding_batch_max_size,
+    ):
+        self.send = send
+        self.window_seconds = window_seconds
+        self.max_batch = max_batch
+        self.batches = 0
+        self.inputs = 0
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: Set[asyncio.Task] = set()
+    
+    async def embed(self, text: str) -> List[float]:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((text, future))
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window_seconds, self._flush)
+        return await future
+    
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.create_task(self._send(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+    
+    async def _send(self, batch: List[Tuple[str, asyncio.Future]]) -> None:
+        texts = list(dict.fromkeys(text for text, _ in batch))
+        self.batches += 1
+        self.inputs += len(batch)
+        try:
+            vectors = dict(zip(texts, await self.send(texts)))
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for text, future in batch:
+            if not future.done():
+                future.set_result(vectors[text])
+    
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "inputs": self.inputs,
+            "mean_batch_size": round(self.inputs / self.batches, 2) if self.batches else None,
+            "pending": len(self._pending),
+        }
 
 
 class EmbeddingService:
-    def __init__(self):
-        self.client = AsyncOpenAI(api_key=settings.openai_api_key) if settings.openai_api_key else None
-        self.model = settings.embedding_model
+    def __init__(self, provider=None):
+        self.provider = provider if provider is not None else make_provider()
+        self.model = self.provider.model if self.provider is not None else settings.embedding_model
         self.dimensions = settings.embedding_dimensions
+        # Provider/model/dimensions of the stored embeddings when they differ from ours
+        self.mismatch: Optional[str] = None
+        # Caching, coalescing and scheduling only pay off for remote providers;
+        # local ones are cheaper than a lookup and have no rate limits
+        remote = self.provider is not None and self.provider.remote
+        self.cache = embedding_cache if remote else None
+        self.scheduler = EmbeddingScheduler(self.provider.embed, self.model) if remote else None
+        # One coalescer per priority class, so batching never drags a query behind backfill
+        self.coalescers: Dict[int, EmbeddingCoalescer] = {
+            priority: EmbeddingCoalescer(partial(self._request, priority=priority))
+            for priority in PRIORITY_NAMES
+        } if remote and settings.embedding_batch_window_ms > 0 else {}
     
-    async def generate_embedding(self, text: str) -> Optional[List[float]]:
-        """Generate embedding for a piece of text."""
-        if not self.client or not text:
+    @property
+    def space(self) -> Optional[str]:
+        """provider/model/dimensions of the vectors this service generates."""
+        if self.provider is None:
             return None
+        return f"{self.provider.name}/{self.model}/{self.dimensions}"
+    
+    async def check_space(self, db: AsyncSession) -> None:
+        """
+        Compare our provider with the one stored embeddings were made with.
+        
+        The first run (or one with no stored embeddings) records our space.
+        If embeddings from another provider or model are stored, nothing new
+        is embedded, since its vectors could not be compared with theirs:
+        switch the provider back, or clear the stored embeddings to adopt it.
+        """
+        from app.models.agent import Agent
+        from app.models.content import Content
+        from app.models.embedding import EmbeddingSpace
+        
+        if self.provider is None:
+            return
+        row = await db.get(EmbeddingSpace, EMBEDDING_SPACE)
+        stored = row and f"{row.provider}/{row.model}/{row.dimensions}"
+        if stored == self.space:
+            self.mismatch = None
+            return
+        if stored and await db.scalar(select(
+            exists().where(Content.embedding.isnot(None))
+            | exists().where(Agent.preference_embedding.isnot(None))
+        )):
+            self.mismatch = stored
+            print(f"Embedding provider {self.space} does not match stored embeddings ({stored}); not embedding")
+            return
+        
+        values = {"provider": self.provider.name, "model": self.model, "dimensions": self.dimensions}
+        await db.execute(
+            insert(EmbeddingSpace)
+            .values(name=EMBEDDING_SPACE, **values)
+            .on_conflict_do_update(index_elements=[EmbeddingSpace.name], set_=values)
+        )
+        await db.commit()
+        self.mismatch = None
+    
+    async def _request(self, texts: List[str], priority: int = BACKGROUND) -> List[Optional[List[float]]]:
+        """Embeddings for `texts` in order, through the scheduler for remote providers."""
+        if self.scheduler is not None:
+            return await self.scheduler.submit(texts, priority)
+        return await self.provider.embed(texts)
+    
+    def _key(self, text: str) -> str:
+        return embedding_key(self.model, self.dimensions, text)
+    
+    async def _truncate(self, text: str) -> str:
+        """`text` cut to the model's input limit, tokenized off the event loop."""
+        return await run_tokenizer(
+            truncate_tokens, text, self.model, settings.embedding_max_input_tokens
+        )
+    
+    async def generate_embedding(self, text: str, priority: int = INTERACTIVE) -> Optional[List[float]]:
+        """
+        Generate embedding for a piece of text, from the cache when it has been seen before.
+        
+        Misses go through the coalescer for `priority`, so concurrent calls
+        share one batch request.
+        """
+        if self.provider is None or self.mismatch or not text:
+            return None
+        
+        if self.cache is not None:
+            key = self._key(text)
+            cached = await self.cache.get_many([key])
+            if key in cached:
+                return cached[key].tolist()
         
         try:
-            # Truncate text if too long (roughly 8k tokens max)
-            text = text[:30000]
-            
-            response = await self.client.embeddings.create(
-                model=self.model,
-                input=text,
-                dimensions=self.dimensions
-            )
-            return response.data[0].embedding
+            text = await self._truncate(text)
+            coalescer = self.coalescers.get(priority)
+            if coalescer is not None:
+                embedding = await coalescer.embed(text)
+            else:
+                embedding = (await self._request([text], priority))[0]
         except Exception as e:
             print(f"Error generating embedding: {e}")
             return None
+        
+        if embedding is not None and self.cache is not None:
+            await self.cache.put_many({key: np.asarray(embedding, dtype=np.float32)})
+        return embedding
     
-    async def generate_embeddings_batch(self, texts: List[str]) -> List[Optional[List[float]]]:
-        """Generate embeddings for multiple texts."""
-        if not self.client:
-            return [None] * len(texts)
+    async def generate_embeddings_batch(
+        self, texts: List[str], priority: int = BACKGROUND
+    ) -> List[Optional[List[float]]]:
+        """
+        Generate embeddings for multiple texts.
         
-        try:
-            truncated = [t[:30000] for t in texts]
-            response = await self.client.embeddings.create(
-                model=self.model,
-                input=truncated,
-                dimensions=self.dimensions
-            )
-            return [item.embedding for item in response.data]
-        except Exception as e:
-            print(f"Error generating batch embeddings: {e}")
+        Cached texts are answered from the cache and identical texts are
+        sent once, so only unseen inputs reach the API. The scheduler splits
+        the rest into rate-limited batches and retries transient errors;
+        None marks texts whose batch still failed.
+        """
+        if self.provider is None or self.mismatch:
             return [None] * len(texts)
+        
+        keys = [self._key(t) if t else None for t in texts]
+        found: Dict[str, np.ndarray] = {}
+        if self.cache is not None:
+            found = await self.cache.get_many(k for k in keys if k)
+        
+        pending: Dict[str, str] = {}
+        for key, text in zip(keys, texts):
+            if key and key not in found:
+                pending.setdefault(key, text)
+        
+        if pending:
+            try:
+                inputs = await asyncio.gather(*(self._truncate(t) for t in pending.values()))
+                embeddings = await self._request(list(inputs), priority)
+                fresh = {
+                    key: np.asarray(embedding, dtype=np.float32)
+                    for key, embedding in zip(pending, embeddings)
+                    if embedding is not None
+                }
+            except Exception as e:
+                print(f"Error generating batch embeddings: {e}")
+                fresh = {}
+            if self.cache is not None:
+                await self.cache.put_many(fresh)
+            found.update(fresh)
+        
+        return [found[key].tolist() if key in found else None for key in keys]
+    
+    async def generate_document_embedding(
+        self, text: str, priority: int = BACKGROUND
+    ) -> Optional[List[float]]:
+        """
+        Generate one embedding for a text of any length.
+        
+        Texts over `embedding_chunk_tokens` are split into overlapping token
+        windows, embedded in one batch and pooled (weighted by token count,
+        or a plain mean) into a unit vector, so long transcripts keep their
+        tail instead of being truncated.
+        """
+        if self.provider is None or self.mismatch or not text:
+            return None
+        
+        chunks = await run_tokenizer(chunk_text, text, self.model)
+        if len(chunks) <= 1:
+            return await self.generate_embedding(text, priority)
+        
+        embeddings = await self.generate_embeddings_batch([chunk for chunk, _ in chunks], priority)
+        vectors, weights = [], []
+        for embedding, (_, tokens) in zip(embeddings, chunks):
+            if embedding is not None:
+                vectors.append(embedding)
+                weights.append(tokens if settings.embedding_pooling == "weighted" else 1)
+        if not vectors:
+            return None
+        
+        pooled = np.average(np.asarray(vectors, dtype=np.float32), axis=0, weights=weights)
+        norm = np.linalg.norm(pooled)
+        return (pooled / norm if norm else pooled).tolist()
     
     def cosine_similarity(self, a: List[float], b: List[float]) -> float:
         """Calculate cosine similarity between two embeddings."""
@@ -0,0 +1,61 @@
+from typing import Dict, List, Tuple
+
+from app.schemas.content import FeedItem
+
+# Candidate sources the feed blends, in tie-break order
+BLEND_PERSONALIZED = "personalized"
+BLEND_TRENDING = "trending"
+BLEND_DISCOVER = "discover"
+BLEND_SOURCES = (BLEND_PERSONALIZED, BLEND_TRENDING, BLEND_DISCOVER)
+
+
+def parse_blend_ratios(spec: str) -> Dict[str, float]:
+    """
+    Parse "personalized:0.6,trending:0.25,discover:0.15" into source weights.
+    
+    Unknown sources and non-positive weights are dropped; weights need not
+    sum to 1.
+    """
+    ratios = {}
+    for part in (spec or "").split(","):
+        name, _, weight = part.partition(":")
+        name = name.strip()
+        if name not in BLEND_SOURCES:
+            continue
+        try:
+            value = float(weight)
+        except ValueError:
+            continue
+        if value > 0:
+            ratios[name] = value
+    return {name: ratios[name] for name in BLEND_SOURCES if name in ratios}
+
+
+def allocate_quotas(limit: int, ratios: Dict[str, float]) -> Dict[str, int]:
+    """Split `limit` slots between sources by weight (largest remainder)."""
+    total = sum(ratios.values())
+    if not total:
+        return {}
+    
+    shares = {name: limit * weight / total for name, weight in ratios.items()}
+    quotas = {name: int(share) for name, share in shares.items()}
+    leftover = limit - sum(quotas.values())
+    by_remainder = sorted(shares, key=lambda name: shares[name] - quotas[name], reverse=True)
+    for name in by_remainder[:leftover]:
+        quotas[name] += 1
+    return quotas
+
+
+def interleave(pages: Dict[str, List[FeedItem]]) -> List[Tuple[str, FeedItem]]:
+    """
+    Merge per-source pages, spreading each source evenly over the page.
+    
+    Item j of a source with n items lands at fraction (j + 0.5) / n, so a
+    60/25/15 blend reads as a mix rather than three consecutive runs.
+    """
+    slots = []
+    for order, (name, items) in enumerate(pages.items()):
+        for j, item in enumerate(items):
+            slots.append(((j + 0.5) / len(items), order, name, item))
+    slots.sort(key=lambda slot: slot[:2])
+    return [(name, item) for _, _, name, item in slots]
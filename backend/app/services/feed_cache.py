@@ -0,0 +1,176 @@
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Set, Tuple
+from uuid import UUID
+
+import orjson
+
+from app.core.config import settings
+
+
+def page_key(**params) -> str:
+    """Stable digest of the request parameters that shape a feed page."""
+    return hashlib.blake2b(orjson.dumps(params, option=orjson.OPT_SORT_KEYS), digest_size=16).hexdigest()
+
+
+class MemoryPageBackend:
+    """
+    Rendered pages in process memory, LRU-bounded with a TTL.
+    
+    Each agent's page keys are also indexed so invalidation deletes its
+    pages at once. An agent's index entry goes with its last page, so both
+    structures stay bounded by `max_entries`.
+    """
+    
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._pages: "OrderedDict[Tuple[UUID, str], Tuple[float, bytes]]" = OrderedDict()
+        self._keys: Dict[UUID, Set[str]] = {}
+    
+    async def get(self, agent_id: UUID, key: str) -> Optional[bytes]:
+        entry = self._pages.get((agent_id, key))
+        if entry is None:
+            return None
+        if time.monotonic() - entry[0] > self.ttl_seconds:
+            self._drop(agent_id, key)
+            return None
+        self._pages.move_to_end((agent_id, key))
+        return entry[1]
+    
+    async def set(self, agent_id: UUID, key: str, data: bytes) -> None:
+        self._pages[(agent_id, key)] = (time.monotonic(), data)
+        self._pages.move_to_end((agent_id, key))
+        self._keys.setdefault(agent_id, set()).add(key)
+        while len(self._pages) > self.max_entries:
+            self._drop(*next(iter(self._pages)))
+    
+    async def invalidate(self, agent_id: UUID) -> None:
+        for key in self._keys.pop(agent_id, ()):
+            del self._pages[(agent_id, key)]
+    
+    def _drop(self, agent_id: UUID, key: str) -> None:
+        del self._pages[(agent_id, key)]
+        keys = self._keys[agent_id]
+        keys.discard(key)
+        if not keys:
+            del self._keys[agent_id]
+
+
+class RedisPageBackend:
+    """
+    Rendered pages in Redis, shared by every worker.
+    
+    Each page is its own key with a TTL; an agent's keys are also tracked
+    in a set so invalidation from any worker deletes them all.
+    """
+    
+    def __init__(self, url: str, ttl_seconds: int):
+        import redis.asyncio as redis
+        
+        self.client = redis.from_url(url)
+        self.ttl_seconds = ttl_seconds
+    
+    def _index(self, agent_id: UUID) -> str:
+        return f"feedpages:{agent_id}"
+    
+    def _page(self, agent_id: UUID, key: str) -> str:
+        return f"feedpage:{agent_id}:{key}"
+    
+    async def get(self, agent_id: UUID, key: str) -> Optional[bytes]:
+        return await self.client.get(self._page(agent_id, key))
+    
+    async def set(self, agent_id: UUID, key: str, data: bytes) -> None:
+        page = self._page(agent_id, key)
+        async with self.client.pipeline(transaction=False) as pipe:
+            pipe.set(page, data, ex=self.ttl_seconds)
+            pipe.sadd(self._index(agent_id), page)
+            pipe.expire(self._index(agent_id), self.ttl_seconds)
+            await pipe.execute()
+    
+    async def invalidate(self, agent_id: UUID) -> None:
+        index = self._index(agent_id)
+        pages = await self.client.smembers(index)
+        await self.client.delete(index, *pages)
+
+
+class FeedPageCache:
+    """
+    Short-lived cache of rendered feed pages per agent.
+    
+    Retries and restarts that re-request a cursor get the same page back
+    without re-running the feed. Pages are keyed by agent and a digest of
+    the request parameters (cursor, content type, exclude_consumed, limit,
+    ...); consumption and preference changes invalidate an agent's pages.
+    Backend errors count as misses, so Redis outages only cost the cache.
+    """
+    
+    def __init__(self, backend=None):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.errors = 0
+    
+    @property
+    def enabled(self) -> bool:
+        return self.backend is not None
+    
+    async def get(self, agent_id: UUID, key: str) -> Optional[bytes]:
+        if self.backend is None:
+            return None
+        try:
+            data = await self.backend.get(agent_id, key)
+        except Exception as e:
+            self.errors += 1
+            print(f"Error reading feed page cache: {e}")
+            data = None
+        if data is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return data
+    
+    async def set(self, agent_id: UUID, key: str, data: bytes) -> None:
+        if self.backend is None:
+            return
+        try:
+            await self.backend.set(agent_id, key, data)
+        except Exception as e:
+            self.errors += 1
+            print(f"Error writing feed page cache: {e}")
+    
+    async def invalidate(self, agent_id: UUID) -> None:
+        if self.backend is None:
+            return
+        self.invalidations += 1
+        try:
+            await self.backend.invalidate(agent_id)
+        except Exception as e:
+            self.errors += 1
+            print(f"Error invalidating feed page cache: {e}")
+    
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "backend": settings.feed_page_cache_backend,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            "invalidations": self.invalidations,
+            "errors": self.errors,
+        }
+
+
+def _make_backend():
+    if settings.feed_page_cache_backend == "memory":
+        return MemoryPageBackend(
+            settings.feed_page_cache_max_entries, settings.feed_page_cache_ttl_seconds
+        )
+    if settings.feed_page_cache_backend == "redis":
+        return RedisPageBackend(settings.redis_url, settings.feed_page_cache_ttl_seconds)
+    return None
+
+
+feed_page_cache = FeedPageCache(_make_backend())
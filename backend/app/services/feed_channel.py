@@ -0,0 +1,162 @@
+import asyncio
+from collections import defaultdict
+from typing import Dict, List, Optional, Set
+from uuid import UUID
+
+from app.core.config import settings
+from app.core.database import async_session_maker
+from app.schemas.agent import ConsumptionCreate
+from app.schemas.content import FeedItem
+
+
+def ack_signal(record: ConsumptionCreate) -> float:
+    """How much an acknowledgement liked the item, in [-1, 1]."""
+    if record.rating is not None:
+        return (record.rating - 3) / 2
+    return record.completion_percentage / 100 - 0.5
+
+
+class ConsumptionBatcher:
+    """Buffers an agent's consumption records and writes them in batches."""
+    
+    def __init__(
+        self,
+        agent_id: UUID,
+        batch_size: int = settings.ws_consumption_batch_size,
+        flush_seconds: float = settings.ws_consumption_flush_ms / 1000,
+    ):
+        self.agent_id = agent_id
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self._pending: List[ConsumptionCreate] = []
+        self._lock = asyncio.Lock()
+        self._timer: Optional[asyncio.Task] = None
+    
+    async def add(self, record: ConsumptionCreate) -> int:
+        """Buffer a record; returns how many records were written, if a flush ran."""
+        self._pending.append(record)
+        if len(self._pending) >= self.batch_size:
+            return await self.flush()
+        if self._timer is None or self._timer.done():
+            self._timer = asyncio.create_task(self._flush_later())
+        return 0
+    
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(self.flush_seconds)
+        # Shielded so close() cancelling the timer never abandons a batch mid-write
+        await asyncio.shield(self.flush())
+    
+    async def flush(self) -> int:
+        from app.services.agent_service import AgentService
+        
+        async with self._lock:
+            records, self._pending = self._pending, []
+            if not records:
+                return 0
+            try:
+                async with async_session_maker() as session:
+                    written = await AgentService(session).log_consumptions(self.agent_id, records)
+                return len(written)
+            except Exception as e:
+                print(f"Error writing consumption batch: {e}")
+                return 0
+    
+    async def close(self) -> int:
+        if self._timer is not None:
+            self._timer.cancel()
+        # Waits on the lock for an in-flight timed flush, then writes what is left
+        return await self.flush()
+
+
+class FeedChannel:
+    """
+    Feed state for one WebSocket connection.
+    
+    Candidates are fetched from the feed in chunks and buffered. Each
+    acknowledgement updates per-tag affinities for the connection, and the
+    buffer is re-ordered in memory, so acks steer what comes next without a
+    query per item. Acked content is never served again on the connection.
+    """
+    
+    def __init__(
+        self,
+        agent_id: UUID,
+        content_type: Optional[str] = None,
+        chunk_size: int = settings.ws_feed_chunk_size,
+        fields: Optional[Set[str]] = None,
+    ):
+        self.agent_id = agent_id
+        self.content_type = content_type
+        self.fields = fields
+        self.chunk_size = chunk_size
+        self.batcher = ConsumptionBatcher(agent_id)
+        self._buffer: List[FeedItem] = []
+        self._cursor: Optional[str] = None
+        self._exhausted = False
+        self._served: Set[str] = set()
+        self._affinity: Dict[str, float] = defaultdict(float)
+        self._tags: Dict[str, List[str]] = {}  # Tags of sent items awaiting an ack
+        self._rank: Dict[str, int] = {}  # Feed order of buffered items
+        self._next_rank = 0
+        self._position = 0
+    
+    async def next_items(self, count: int) -> List[FeedItem]:
+        """Up to `count` items, best first; fewer only when the feed has run out."""
+        while len(self._buffer) < count and not self._exhausted:
+            await self._fill()
+        
+        items = self._buffer[:count]
+        del self._buffer[:count]
+        for item in items:
+            self._served.add(item.content.id)
+            self._rank.pop(item.content.id, None)
+            self._tags[item.content.id] = item.content.tags or []
+            item.position = self._position
+            self._position += 1
+        return items
+    
+    async def _fill(self) -> None:
+        from app.services.feed_service import FeedService
+        
+        async with async_session_maker() as session:
+            feed = await FeedService(session, fields=self.fields).get_feed(
+                agent_id=self.agent_id,
+                cursor=self._cursor,
+                limit=self.chunk_size,
+                content_type=self.content_type,
+            )
+        self._cursor = feed.next_cursor
+        self._exhausted = not feed.next_cursor
+        buffered = {item.content.id for item in self._buffer}
+        for item in feed.items:
+            if item.content.id not in self._served and item.content.id not in buffered:
+                self._rank[item.content.id] = self._next_rank
+                self._next_rank += 1
+                self._buffer.append(item)
+        self._rerank()
+    
+    async def ack(self, record: ConsumptionCreate) -> int:
+        """Record a consumption: steer the buffer now, write it with the next batch."""
+        content_id = str(record.content_id)
+        self._served.add(content_id)
+        self._buffer = [item for item in self._buffer if item.content.id != content_id]
+        self._rank.pop(content_id, None)
+        
+        signal = ack_signal(record)
+        for tag in self._tags.pop(content_id, []):
+            self._affinity[tag] += signal
+        self._rerank()
+        return await self.batcher.add(record)
+    
+    def _rerank(self) -> None:
+        if not self._affinity:
+            return
+        weight = settings.ws_ack_rerank_weight
+        self._buffer.sort(
+            key=lambda item: self._rank[item.content.id] - weight * sum(
+                self._affinity.get(tag, 0.0) for tag in item.content.tags or []
+            )
+        )
+    
+    async def close(self) -> int:
+        return await self.batcher.close()
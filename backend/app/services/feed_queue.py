@@ -0,0 +1,194 @@
+import asyncio
+import time
+from bisect import bisect_right, insort
+from collections import OrderedDict
+from typing import Iterable, List, Optional, Tuple
+from uuid import UUID
+import numpy as np
+
+from app.core.config import settings
+from app.core.database import async_session_maker
+from app.services.consumed_cache import ConsumedSet
+
+# Ranked entries are (distance, content_id), i.e. the personalized feed's keyset key
+QueueEntry = Tuple[float, UUID]
+QueueKey = Tuple[UUID, Optional[str]]
+
+
+class FeedQueue:
+    """The top of one agent's ranking for one content type, best first."""
+    
+    def __init__(self):
+        self.entries: List[QueueEntry] = []
+        self.tail: Optional[QueueEntry] = None  # Last entry ranked; refills seek past it
+        self.complete = False  # The ranking ran out before `depth`
+        self.embedding: Optional[np.ndarray] = None  # Unit preference vector it was ranked for
+        self.last_used = time.monotonic()
+
+
+class FeedQueueManager:
+    """
+    Materialized personalized feeds.
+    
+    Keeps the top `depth` ranked content IDs per active agent in process
+    memory. Reads are seeks, not pops: a page is the entries ranked after
+    the caller's cursor, so a fresh scroll starts again from the top and
+    concurrent scrolls do not eat each other's entries. A background worker
+    ranks new queues and tops up ones with fewer than `watermark` entries
+    left past a read; pages past the ranked prefix go live.
+    
+    Queues are dropped when an agent's preferences change (`invalidate`).
+    New or re-embedded content is scored against each queue's preference
+    vector and inserted in place when it lands inside the ranked prefix
+    (`offer`); past the tail it is found by the next refill or live page
+    anyway. Consumed items are removed in place (`discard`).
+    """
+    
+    def __init__(
+        self,
+        depth: int = settings.feed_queue_depth,
+        watermark: int = settings.feed_queue_watermark,
+        max_agents: int = settings.feed_queue_max_agents,
+        idle_seconds: float = settings.feed_queue_idle_seconds,
+    ):
+        self.depth = depth
+        self.watermark = watermark
+        self.max_agents = max_agents
+        self.idle_seconds = idle_seconds
+        self._queues: "OrderedDict[QueueKey, FeedQueue]" = OrderedDict()
+        self._pending: "asyncio.Queue[QueueKey]" = asyncio.Queue()
+        self._scheduled: set = set()
+        self._worker: Optional[asyncio.Task] = None
+    
+    def read(
+        self,
+        agent_id: UUID,
+        content_type: Optional[str],
+        limit: int,
+        after: Optional[QueueEntry] = None,
+        skip: Optional[ConsumedSet] = None,
+    ) -> Optional[List[QueueEntry]]:
+        """
+        The next `limit` entries ranked after `after` (from the top if None).
+        
+        Returns None when fewer than `limit` entries are ready; the caller
+        should then run the live query. A refill is scheduled whenever
+        fewer than `watermark` entries remain past the read.
+        """
+        key = (agent_id, content_type)
+        queue = self._queues.get(key)
+        if queue is None:
+            queue = self._queues[key] = FeedQueue()
+            while len(self._queues) > self.max_agents:
+                self._queues.popitem(last=False)
+        self._queues.move_to_end(key)
+        queue.last_used = time.monotonic()
+        
+        index = bisect_right(queue.entries, after) if after is not None else 0
+        taken: List[QueueEntry] = []
+        while index < len(queue.entries) and len(taken) < limit:
+            entry = queue.entries[index]
+            index += 1
+            # Skip entries consumed since ranking
+            if skip is None or entry[1] not in skip:
+                taken.append(entry)
+        
+        if not queue.complete and len(queue.entries) < self.depth and (
+            len(queue.entries) - index < self.watermark
+        ):
+            self.request_refill(key)
+        return taken if len(taken) == limit else None
+    
+    def request_refill(self, key: QueueKey) -> None:
+        if key not in self._scheduled:
+            self._scheduled.add(key)
+            self._pending.put_nowait(key)
+    
+    def invalidate(self, agent_id: UUID) -> None:
+        """Drop an agent's queues, e.g. after its preferences change."""
+        for key in [k for k in self._queues if k[0] == agent_id]:
+            del self._queues[key]
+    
+    def offer(self, content_id: UUID, content_type: str, embedding) -> None:
+        """Rank new or re-embedded content into every queue it belongs in."""
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = float(np.linalg.norm(vector))
+        for key, queue in self._queues.items():
+            queue.entries = [entry for entry in queue.entries if entry[1] != content_id]
+            if queue.embedding is None or key[1] not in (None, content_type) or not norm:
+                continue
+            entry = (1.0 - float(queue.embedding @ vector) / norm, content_id)
+            # Past the tail the item is not ranked yet, and the next refill seeks to it
+            if queue.complete or (queue.tail is not None and entry < queue.tail):
+                insort(queue.entries, entry)
+                if len(queue.entries) > self.depth:
+                    queue.entries.pop()
+                    queue.tail = queue.entries[-1]
+                    queue.complete = False
+    
+    def discard(self, agent_id: UUID, content_ids: Iterable[UUID]) -> None:
+        """Remove content an agent has just consumed from its queues."""
+        gone = set(content_ids)
+        for key, queue in self._queues.items():
+            if key[0] == agent_id:
+                queue.entries = [entry for entry in queue.entries if entry[1] not in gone]
+    
+    async def start(self) -> None:
+        if self._worker is None:
+            self._worker = asyncio.create_task(self._run())
+    
+    async def stop(self) -> None:
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+    
+    async def _run(self) -> None:
+        while True:
+            key = await self._pending.get()
+            self._scheduled.discard(key)
+            self._evict_idle()
+            try:
+                await self._refill(key)
+            except Exception as e:
+                print(f"Error refilling feed queue: {e}")
+    
+    def _evict_idle(self) -> None:
+        cutoff = time.monotonic() - self.idle_seconds
+        for key in [k for k, q in self._queues.items() if q.last_used < cutoff]:
+            del self._queues[key]
+    
+    async def _refill(self, key: QueueKey) -> None:
+        from app.services.feed_service import FeedService
+        
+        queue = self._queues.get(key)
+        if queue is None:
+            return
+        
+        needed = self.depth - len(queue.entries)
+        if needed <= 0:
+            return
+        
+        agent_id, content_type = key
+        async with async_session_maker() as session:
+            service = FeedService(session)
+            agent = await service.agent_service.get_by_id(agent_id)
+            if not agent or agent.preference_embedding is None:
+                return
+            entries = await service.rank_personalized(
+                agent, content_type=content_type, after=queue.tail, limit=needed
+            )
+        
+        # The queue may have been invalidated while we were ranking
+        if self._queues.get(key) is queue:
+            vector = np.asarray(agent.preference_embedding, dtype=np.float32)
+            queue.embedding = vector / (np.linalg.norm(vector) or 1.0)
+            queue.entries.extend(entries)
+            queue.tail = entries[-1] if entries else queue.tail
+            queue.complete = len(entries) < needed
+
+
+feed_queues = FeedQueueManager()
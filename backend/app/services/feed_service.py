@@ -1,23 +1,70 @@
+import asyncio
+import time
 import uuid
 import random
-from typing import List, Optional
+from itertools import islice
+from datetime import datetime
+from typing import List, Optional, Set, Tuple
 from uuid import UUID
+import numpy as np
+import orjson
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, not_
+from sqlalchemy import exists, false, func, select, text
+from sqlalchemy.dialects import postgresql
 
+from app.core.config import settings
+from app.core.database import async_session_maker
+from app.core.cursor import apply_keyset, decode_cursor, encode_cursor, parse_key
 from app.models.content import Content
-from app.models.agent import Agent
+from app.models.agent import Agent, AgentConsumption
 from app.schemas.content import ContentAgentView, FeedItem, FeedResponse
 from app.services.content_service import ContentService
 from app.services.agent_service import AgentService
+from app.services.consumed_cache import ConsumedSet, consumed_cache
+from app.services.diversity import mmr_select, parse_mmr_lambda
+from app.services.feed_blender import (
+    BLEND_PERSONALIZED,
+    BLEND_TRENDING,
+    allocate_quotas,
+    interleave,
+    parse_blend_ratios,
+)
+from app.services.feed_queue import feed_queues
+from app.services.feed_sessions import FeedSnapshot, embedding_version, feed_sessions
+from app.services.neighbors import NeighborService
+from app.services.trending import DEFAULT_WINDOW, TRENDING_WINDOWS, trending
+from app.services.vector_index_service import prepare_distance_scan
+from app.services.vector_search import vector_backend
+
+FEED_CURSOR = "feed"
+TRENDING_CURSOR = "trending"
+DISCOVER_CURSOR = "discover"
+BLEND_CURSOR = "blend"
+
+# Trending mode ordered by all-time consumption count
+TRENDING_ALL = "all"
+
+# Over-fetch factor and round cap when filtering consumed content in memory
+SKIP_OVERFETCH = 2
+MAX_SEEK_ROUNDS = 5
+
+# Feed orderings and the type of their leading sort key
+SORT_PERSONALIZED = "personalized"
+SORT_POPULAR = "popular"
+SORT_RECENT = "recent"
+SORT_KEY_TYPES = {
+    SORT_PERSONALIZED: float,
+    SORT_POPULAR: int,
+    SORT_RECENT: datetime,
+}
 
 
 class FeedService:
     """The doom scroll engine for AI agents."""
     
-    def __init__(self, db: AsyncSession):
+    def __init__(self, db: AsyncSession, fields: Optional[Set[str]] = None):
         self.db = db
-        self.content_service = ContentService(db)
+        self.content_service = ContentService(db, fields=fields)
         self.agent_service = AgentService(db)
     
     async def get_feed(
@@ -27,6 +74,9 @@ class FeedService:
         limit: int = 10,
         content_type: Optional[str] = None,
         exclude_consumed: bool = True,
+        approximate: bool = False,
+        ratios: Optional[str] = None,
+        mmr_lambda: Optional[float] = None,
     ) -> FeedResponse:
         """
         Generate personalized doom scroll feed for an agent.
@@ -36,87 +86,697 @@ class FeedService:
         2. Mix in trending content (high consumption count)
         3. Add some random discovery content
         4. Exclude already consumed content if requested
+        
+        Sources are fetched concurrently, each on its own pooled session, and
+        interleaved by `ratios` (default `settings.feed_blend_ratios`). The
+        cursor carries one sub-cursor per source. Items already served in the
+        session are dropped and the page is topped up from the sources that
+        still have items, so pages are short only once every source runs dry.
+        `mmr_lambda` re-ranks the personalized source for diversity (see
+        `get_ranked_feed`).
         """
-        feed_id = str(uuid.uuid4())
+        weights = parse_blend_ratios(settings.feed_blend_ratios if ratios is None else ratios)
+        if set(weights) <= {BLEND_PERSONALIZED}:
+            feed = await self.get_ranked_feed(
+                agent_id, cursor, limit, content_type, exclude_consumed, approximate,
+                mmr_lambda=mmr_lambda,
+            )
+            await self._attach_similar(feed.items)
+            return feed
+        
+        state = decode_cursor(cursor, BLEND_CURSOR)
+        cursors = dict(state["c"]) if state else {}
+        position = state["p"] if state else 0
+        feed_id = state.get("f") if state else None
+        
+        # A source whose sub-cursor is None has run dry; the others share its slots
+        active = {s: w for s, w in weights.items() if not (s in cursors and cursors[s] is None)}
+        seen_by = agent_id if exclude_consumed else None
+        
+        async def fetch(source: str, n: int) -> Tuple[FeedResponse, float]:
+            started = time.perf_counter()
+            if source == BLEND_PERSONALIZED:
+                # The request's session keeps its per-request vector search settings
+                page = await self.get_ranked_feed(
+                    agent_id, cursors.get(source), n, content_type, exclude_consumed, approximate,
+                    mmr_lambda=mmr_lambda,
+                )
+            else:
+                async with async_session_maker() as session:
+                    service = FeedService(session, fields=self.content_service.fields)
+                    if source == BLEND_TRENDING:
+                        page = await service.get_trending(
+                            cursors.get(source), n, approximate,
+                            content_type=content_type, agent_id=seen_by, similar=False,
+                        )
+                    else:
+                        page = await service.get_discover(
+                            seen_by, cursors.get(source), n, approximate,
+                            content_type=content_type, similar=False,
+                        )
+            return page, round((time.perf_counter() - started) * 1000, 2)
+        
+        # Items another source (or an earlier page) already served are dropped,
+        # so short pages are topped up from the sources that still have items
         items: List[FeedItem] = []
+        sources: List[str] = []
+        timings = {}
+        total = 0
+        served = None
+        while len(items) < limit and active:
+            quotas = {s: n for s, n in allocate_quotas(limit - len(items), active).items() if n > 0}
+            results = await asyncio.gather(
+                *(fetch(source, n) for source, n in quotas.items()), return_exceptions=True
+            )
+            
+            pages = {}
+            for source, result in zip(quotas, results):
+                if isinstance(result, Exception):
+                    # Keep the source's cursor so the next page retries it
+                    print(f"Error fetching {source} feed source: {result}")
+                    timings.setdefault(source, None)
+                    active.pop(source)
+                    continue
+                page, elapsed = result
+                timings[source] = round((timings.get(source) or 0) + elapsed, 2)
+                pages[source] = page.items
+                cursors[source] = page.next_cursor
+                if page.next_cursor is None:
+                    active.pop(source)
+                total = max(total, page.total_available)
+                if source == BLEND_PERSONALIZED and not feed_id:
+                    feed_id = page.feed_id
+            if served is None:
+                feed_id = feed_id or str(uuid.uuid4())
+                served = feed_sessions.served(feed_id)
+            
+            added = 0
+            for source, item in interleave(pages):
+                if item.content.id in served:
+                    continue
+                served.add(item.content.id)
+                items.append(item)
+                sources.append(source)
+                added += 1
+            if not added and not any(pages.values()):
+                break
+        feed_id = feed_id or str(uuid.uuid4())
         
-        # Parse cursor for pagination
-        offset = 0
-        if cursor:
-            try:
-                offset = int(cursor)
-            except:
-                offset = 0
+        items = [
+            FeedItem(
+                content=item.content,
+                position=position + index,
+                feed_context={
+                    **item.feed_context,
+                    "blend_source": source,
+                    "source_timings_ms": timings,
+                    "feed_session": feed_id,
+                },
+            )
+            for index, (source, item) in enumerate(zip(sources, items))
+        ]
         
-        # Get excluded content IDs
-        excluded_ids = []
-        if agent_id and exclude_consumed:
-            excluded_ids = await self.agent_service.get_consumed_content_ids(agent_id)
+        await self._attach_similar(items)
         
-        # Build query
-        query = select(Content)
+        next_cursor = None
+        if any(cursors.get(source, "") is not None for source in weights):
+            next_cursor = encode_cursor(
+                BLEND_CURSOR, [], position + len(items), c=cursors, f=feed_id
+            )
         
-        if content_type:
-            from app.models.content import ContentType
-            query = query.where(Content.content_type == ContentType(content_type))
+        return FeedResponse(
+            items=items,
+            next_cursor=next_cursor,
+            total_available=total,
+            feed_id=feed_id,
+        )
+    
+    async def get_ranked_feed(
+        self,
+        agent_id: Optional[UUID] = None,
+        cursor: Optional[str] = None,
+        limit: int = 10,
+        content_type: Optional[str] = None,
+        exclude_consumed: bool = True,
+        approximate: bool = False,
+        mmr_lambda: Optional[float] = None,
+    ) -> FeedResponse:
+        """
+        Single-ordering feed: semantic similarity when the agent has a
+        preference embedding, otherwise popular or recent.
         
-        if excluded_ids:
-            query = query.where(not_(Content.id.in_(excluded_ids)))
+        The first page ranks a candidate window once and stores it under
+        `feed_id`; later pages slice that snapshot. Cursors also carry the
+        last sort key, so past the window (or after eviction) pages continue
+        with a keyset seek, and page N costs the same as page 1.
+        
+        With `mmr_lambda` below 1 (default `settings.feed_mmr_lambda`),
+        personalized snapshot pages are re-ranked by Maximal Marginal
+        Relevance over a pool of `feed_mmr_pool_factor` x `limit` candidates;
+        the snapshot is reordered in place so skipped candidates stay
+        available to later pages.
+        """
+        items: List[FeedItem] = []
         
         # Get personalized content if agent has preferences
         agent = None
         if agent_id:
             agent = await self.agent_service.get_by_id(agent_id)
         
-        if agent and agent.preference_embedding:
-            # Semantic search based on agent preferences
-            query = query.where(Content.embedding.isnot(None))
-            query = query.order_by(
-                Content.embedding.cosine_distance(agent.preference_embedding)
-            )
+        # Parse cursor; the ordering is chosen once per scroll and kept in it
+        state = decode_cursor(cursor, FEED_CURSOR)
+        if agent and agent.preference_embedding is not None:
+            sort = SORT_PERSONALIZED
+        elif state and state.get("s") in (SORT_POPULAR, SORT_RECENT):
+            sort = state["s"]
         else:
             # Default: mix of popular and recent
             # 70% ordered by consumption, 30% by recency
-            if random.random() < 0.7:
-                query = query.order_by(Content.agent_consumption_count.desc())
-            else:
-                query = query.order_by(Content.created_at.desc())
+            sort = SORT_POPULAR if random.random() < 0.7 else SORT_RECENT
         
-        query = query.offset(offset).limit(limit)
-        result = await self.db.execute(query)
-        contents = list(result.scalars().all())
+        key = None
+        if state and state.get("s") == sort:
+            key = parse_key(state["v"], SORT_KEY_TYPES[sort], UUID)
+        
+        # Distance keys only compare under the embedding they were issued with:
+        # when the agent's preferences moved mid-scroll, keep the session's
+        # embedding while its snapshot lives, otherwise re-rank from the top
+        embedding = None
+        version = None
+        pinned = False
+        if sort == SORT_PERSONALIZED:
+            embedding = agent.preference_embedding
+            version = embedding_version(embedding)
+            if key and state.get("e") != version:
+                session = feed_sessions.get(state.get("f") or "")
+                if session is not None and session.embedding_version == state.get("e"):
+                    embedding, version, pinned = session.embedding, session.embedding_version, True
+                else:
+                    key = None
+        position = state["p"] if key else 0
+        feed_id = state.get("f") if key and state.get("f") else str(uuid.uuid4())
+        
+        # Build query; the same filters also drive total_available
+        filters = []
+        if sort == SORT_PERSONALIZED:
+            # Semantic search based on agent preferences
+            sort_expr = Content.embedding.cosine_distance(embedding)
+            filters.append(Content.embedding.isnot(None))
+            descending = False
+        elif sort == SORT_POPULAR:
+            sort_expr = Content.agent_consumption_count
+            descending = True
+        else:
+            sort_expr = Content.created_at
+            descending = True
+        
+        # total_available counts the ranking's own filters (see `count_available`)
+        count_filters = list(filters)
+        
+        if content_type:
+            from app.models.content import ContentType
+            filters.append(Content.content_type == ContentType(content_type))
+        
+        # Exclude consumed content: in memory when the agent's consumed set
+        # is cached, otherwise with an anti-join rather than an ID list
+        # (outside the ANN scan for personalized ranking, see `_seek_distance`)
+        consumed = None
+        seen_by = None
+        if agent_id and exclude_consumed:
+            if settings.consumed_cache_enabled:
+                consumed = await consumed_cache.get(self.db, agent_id)
+            if consumed is None and sort == SORT_PERSONALIZED:
+                seen_by = agent_id
+            elif consumed is None:
+                filters.append(self.agent_service.not_consumed_filter(agent_id))
+        
+        # Materialized mode: serve the page from the agent's precomputed queue
+        rows = None
+        snapshot_index = None
+        if sort == SORT_PERSONALIZED and exclude_consumed and settings.feed_materialization and not pinned:
+            rows = await self._read_queued(agent.id, content_type, limit, key, consumed)
+            if rows is not None:
+                last_key, has_more = (rows[-1][1], rows[-1][0].id), True
+        
+        lam = parse_mmr_lambda(mmr_lambda, settings.feed_mmr_lambda)
+        rerank = None
+        if rows is None and settings.feed_sessions_enabled:
+            snapshot = feed_sessions.get(feed_id) if key else None
+            if key is None:
+                entries, tail, more = await self._rank_keys(
+                    sort_expr, filters, None, descending, settings.feed_session_window,
+                    skip=consumed, embedding=embedding, content_type=content_type,
+                    seen_by=seen_by,
+                )
+                snapshot = feed_sessions.put(feed_id, FeedSnapshot(entries, tail, more, embedding))
+                snapshot_index = 0
+            elif snapshot is not None and "i" in state:
+                snapshot_index = state["i"]
+            
+            if snapshot_index is not None and sort == SORT_PERSONALIZED and lam is not None:
+                taken, snapshot_index, rerank = await self._take_diverse(
+                    snapshot, snapshot_index, limit, lam, skip=consumed
+                )
+                rows = await self._load_rows(taken)
+                last_key = self._resume_key(snapshot, snapshot_index, key)
+            elif snapshot_index is not None:
+                if consumed is not None:
+                    window = snapshot.entries[snapshot_index:snapshot_index + limit * SKIP_OVERFETCH]
+                    await consumed.confirm(self.db, [cid for _, cid in window])
+                taken = []
+                while snapshot_index < len(snapshot.entries) and len(taken) < limit:
+                    entry = snapshot.entries[snapshot_index]
+                    snapshot_index += 1
+                    if consumed is None or entry[1] not in consumed:
+                        taken.append(entry)
+                rows = await self._load_rows(taken)
+                last_key = taken[-1] if taken else key
+            
+            if snapshot_index is not None:
+                has_more = snapshot_index < len(snapshot.entries) or snapshot.has_more
+                
+                if len(taken) < limit and snapshot.has_more:
+                    # Window used up: continue live from where ranking stopped
+                    more_entries, last_key, has_more = await self._rank_keys(
+                        sort_expr, filters, snapshot.tail, descending, limit - len(taken),
+                        skip=consumed, embedding=embedding, content_type=content_type,
+                        seen_by=seen_by,
+                    )
+                    rows += await self._load_rows(more_entries)
+                    snapshot_index = None
+        
+        if rows is None:
+            if sort == SORT_PERSONALIZED:
+                entries, last_key, has_more = await self._rank_keys(
+                    sort_expr, filters, key, descending, limit,
+                    skip=consumed, embedding=embedding, content_type=content_type,
+                    seen_by=seen_by,
+                )
+                rows = await self._load_rows(entries)
+            else:
+                query = (
+                    select(Content, sort_expr)
+                    .where(*filters)
+                    .options(*self.content_service.view_options)
+                )
+                rows, last_key, has_more = await self._seek(
+                    query, [sort_expr, Content.id], key, descending, limit, skip=consumed
+                )
         
         # Convert to feed items
-        for i, content in enumerate(contents):
+        for i, (content, _) in enumerate(rows):
             agent_view = self.content_service.to_agent_view(content)
+            context = {
+                "recommendation_type": "personalized" if agent else "trending",
+                "feed_session": feed_id,
+            }
+            if rerank is not None:
+                context["rerank"] = rerank
             feed_item = FeedItem(
                 content=agent_view,
-                position=offset + i,
-                feed_context={
-                    "recommendation_type": "personalized" if agent else "trending",
-                    "feed_session": feed_id,
-                }
+                position=position + i,
+                feed_context=context,
             )
             items.append(feed_item)
         
-        # Calculate next cursor
-        next_cursor = str(offset + limit) if len(contents) == limit else None
+        total = await self.count_available(
+            count_filters,
+            agent_id=agent_id if exclude_consumed else None,
+            state=state if key else None,
+            approximate=approximate,
+            content_type=content_type,
+        )
         
-        # Get total count
-        total = await self.content_service.get_total_count()
+        # Calculate next cursor from the last examined row's sort key
+        next_cursor = None
+        if has_more:
+            extra = {"s": sort, "f": feed_id, "t": total}
+            if version is not None:
+                extra["e"] = version
+            if snapshot_index is not None:
+                extra["i"] = snapshot_index
+            next_cursor = encode_cursor(
+                FEED_CURSOR, list(last_key), position + len(rows), **extra
+            )
         
         return FeedResponse(
             items=items,
             next_cursor=next_cursor,
-            total_available=total - len(excluded_ids),
+            total_available=total,
             feed_id=feed_id,
         )
     
+    async def _attach_similar(self, items: List[FeedItem]) -> None:
+        """Fill a page's `similar_content_ids` with one neighbour-table lookup."""
+        fields = self.content_service.fields
+        if not items or (fields is not None and "similar_content_ids" not in fields):
+            return
+        similar = await NeighborService(self.db).similar_ids(
+            [UUID(item.content.id) for item in items]
+        )
+        for item in items:
+            item.content.similar_content_ids = similar.get(UUID(item.content.id), [])
+    
+    async def _seek(
+        self,
+        query,
+        columns: list,
+        key: Optional[tuple],
+        descending: bool,
+        limit: int,
+        skip: Optional[ConsumedSet] = None,
+    ) -> Tuple[list, Optional[tuple], bool]:
+        """
+        Fetch up to `limit` (Content or content_id, sort value) rows after `key`.
+        
+        Rows whose id is in `skip` are dropped and the seek continues past
+        them. Returns the rows, the sort key of the last examined row and
+        whether more rows may follow.
+        """
+        batch_size = limit if skip is None else limit * SKIP_OVERFETCH
+        rows = []
+        for _ in range(MAX_SEEK_ROUNDS):
+            page = apply_keyset(query, columns, key, descending=descending)
+            result = await self.db.execute(page.limit(batch_size))
+            batch = result.all()
+            if skip is not None:
+                await skip.confirm(self.db, [i if isinstance(i, UUID) else i.id for i, _ in batch])
+            for item, sort_value in batch:
+                content_id = item if isinstance(item, UUID) else item.id
+                key = (sort_value, content_id)
+                if skip is not None and content_id in skip:
+                    continue
+                rows.append((item, sort_value))
+                if len(rows) == limit:
+                    return rows, key, True
+            if len(batch) < batch_size:
+                return rows, key, False
+        return rows, key, True
+    
+    async def _seek_vectors(
+        self,
+        embedding,
+        content_type: Optional[str],
+        key: Optional[tuple],
+        limit: int,
+        filters: list,
+        skip: Optional[ConsumedSet] = None,
+    ) -> Tuple[list, Optional[tuple], bool]:
+        """
+        `_seek` for the in-process vector backend, returning (distance, content_id) keys.
+        
+        Ranks with the memory-mapped matrix, then applies `filters` to the
+        hits with a primary-key lookup.
+        """
+        batch_size = limit * SKIP_OVERFETCH
+        entries = []
+        for _ in range(MAX_SEEK_ROUNDS):
+            hits = await vector_backend.search(embedding, batch_size, content_type=content_type, after=key)
+            result = await self.db.execute(
+                select(Content.id).where(Content.id.in_([cid for _, cid in hits]), *filters)
+            )
+            allowed = set(result.scalars().all())
+            if skip is not None:
+                await skip.confirm(self.db, [cid for _, cid in hits])
+            for hit in hits:
+                key = hit
+                if hit[1] not in allowed or (skip is not None and hit[1] in skip):
+                    continue
+                entries.append(hit)
+                if len(entries) == limit:
+                    return entries, key, True
+            if len(hits) < batch_size:
+                return entries, key, False
+        return entries, key, True
+    
+    async def _seek_distance(
+        self,
+        embedding,
+        filters: list,
+        key: Optional[tuple],
+        limit: int,
+        skip: Optional[ConsumedSet] = None,
+        seen_by: Optional[UUID] = None,
+    ) -> Tuple[list, Optional[tuple], bool]:
+        """
+        `_seek` by cosine distance in a shape pgvector's ANN index can serve.
+        
+        The index is only used for a plain `ORDER BY distance LIMIT n`, so
+        the inner query orders by distance alone, with a scalar
+        `distance >= key` bound and no anti-join; the (distance, id) seek
+        and the skip set are applied in Python, and `seen_by`'s consumed
+        content is flagged by an EXISTS in the outer query over those few
+        rows. `prepare_distance_scan` raises `hnsw.ef_search` to the
+        over-fetched LIMIT (and enables iterative scans) so filtered pages
+        come back full. Exhaustion is judged on the inner row count.
+        """
+        distance = Content.embedding.cosine_distance(embedding)
+        batch_size = limit if skip is None and seen_by is None else limit * SKIP_OVERFETCH
+        entries = []
+        for _ in range(MAX_SEEK_ROUNDS):
+            inner = select(Content.id.label("id"), distance.label("distance")).where(*filters)
+            if key is not None:
+                inner = inner.where(distance >= key[0])
+            candidates = inner.order_by(distance).limit(batch_size).subquery()
+            if seen_by is not None:
+                flag = exists().where(
+                    AgentConsumption.agent_id == seen_by,
+                    AgentConsumption.content_id == candidates.c.id,
+                )
+            else:
+                flag = false()
+            
+            await prepare_distance_scan(self.db, batch_size)
+            result = await self.db.execute(
+                select(candidates.c.id, candidates.c.distance, flag)
+                .order_by(candidates.c.distance, candidates.c.id)
+            )
+            batch = result.all()
+            if skip is not None:
+                await skip.confirm(self.db, [content_id for content_id, _, _ in batch])
+            progressed = False
+            for content_id, sort_value, was_consumed in batch:
+                # Rows tied with the key's distance come back; skip those already examined
+                if key is not None and (sort_value, content_id) <= key:
+                    continue
+                key = (sort_value, content_id)
+                progressed = True
+                if was_consumed or (skip is not None and content_id in skip):
+                    continue
+                entries.append(key)
+                if len(entries) == limit:
+                    return entries, key, True
+            if len(batch) < batch_size:
+                return entries, key, False
+            if not progressed:
+                # A whole batch tied at the key's distance: widen it to get past them
+                batch_size *= 2
+        return entries, key, True
+    
+    async def _rank_keys(
+        self,
+        sort_expr,
+        filters: list,
+        key: Optional[tuple],
+        descending: bool,
+        limit: int,
+        skip: Optional[ConsumedSet] = None,
+        embedding=None,
+        content_type: Optional[str] = None,
+        seen_by: Optional[UUID] = None,
+    ) -> Tuple[List[Tuple[object, UUID]], Optional[tuple], bool]:
+        """
+        Rank (sort value, content_id) keys after `key` without loading content rows.
+        
+        `seen_by` excludes an agent's consumed content from distance
+        rankings; other orderings take the anti-join in `filters`.
+        """
+        if embedding is not None and vector_backend.enabled:
+            if seen_by is not None:
+                filters = filters + [self.agent_service.not_consumed_filter(seen_by)]
+            return await self._seek_vectors(embedding, content_type, key, limit, filters, skip=skip)
+        if embedding is not None:
+            return await self._seek_distance(embedding, filters, key, limit, skip=skip, seen_by=seen_by)
+        
+        query = select(Content.id, sort_expr).where(*filters)
+        rows, last_key, has_more = await self._seek(
+            query, [sort_expr, Content.id], key, descending, limit, skip=skip
+        )
+        return [(sort_value, cid) for cid, sort_value in rows], last_key, has_more
+    
+    async def _load_rows(self, entries: List[Tuple[object, UUID]]) -> list:
+        """Load (Content, sort value) rows for ranked keys, keeping their order."""
+        by_id = await self.content_service.get_by_ids([cid for _, cid in entries])
+        return [(by_id[cid], sort_value) for sort_value, cid in entries if cid in by_id]
+    
+    async def _take_diverse(
+        self,
+        snapshot: FeedSnapshot,
+        index: int,
+        limit: int,
+        lam: float,
+        skip: Optional[ConsumedSet] = None,
+    ) -> Tuple[List[Tuple[float, UUID]], int, dict]:
+        """
+        Take a page of snapshot entries from `index` by MMR over the next pool.
+        
+        The pool's picks are moved to the front of its slice of the snapshot
+        and the rest keep their rank order behind them. Returns the picks, the
+        new snapshot index and the stage's timings for `feed_context`.
+        """
+        pool, skipped = [], []
+        stop = index
+        if skip is not None:
+            window = limit * settings.feed_mmr_pool_factor * SKIP_OVERFETCH
+            await skip.confirm(self.db, [cid for _, cid in snapshot.entries[index:index + window]])
+        while stop < len(snapshot.entries) and len(pool) < limit * settings.feed_mmr_pool_factor:
+            entry = snapshot.entries[stop]
+            stop += 1
+            if skip is not None and entry[1] in skip:
+                skipped.append(entry)
+            else:
+                pool.append(entry)
+        
+        started = time.perf_counter()
+        vectors = await self._load_vectors([cid for _, cid in pool])
+        loaded = time.perf_counter()
+        picked = mmr_select([1.0 - distance for distance, _ in pool], vectors, limit, lam)
+        finished = time.perf_counter()
+        
+        taken = [pool[i] for i in picked]
+        chosen = set(picked)
+        rest = [entry for i, entry in enumerate(pool) if i not in chosen]
+        snapshot.entries[index:stop] = taken + rest + skipped
+        # With the pool exhausted, only consumed entries can remain in the slice
+        return taken, index + len(taken) if rest else stop, {
+            "mmr_lambda": lam,
+            "pool_size": len(pool),
+            "load_ms": round((loaded - started) * 1000, 2),
+            "mmr_ms": round((finished - loaded) * 1000, 2),
+        }
+    
+    def _resume_key(self, snapshot: FeedSnapshot, index: int, key: Optional[tuple]) -> Optional[tuple]:
+        """
+        Keyset key for a reordered snapshot: the highest served entry ranked
+        before every unserved one, so a seek past it (after eviction) skips
+        nothing, at the cost of repeating a few re-ranked items.
+        """
+        served = snapshot.entries[:index]
+        if index < len(snapshot.entries):
+            first_unserved = min(snapshot.entries[index:])
+            served = [entry for entry in served if entry < first_unserved]
+        return max(served, default=key)
+    
+    async def _load_vectors(self, content_ids: List[UUID]) -> np.ndarray:
+        """Embeddings for `content_ids` as a matrix in the same order (zero rows if missing)."""
+        if vector_backend.enabled:
+            return vector_backend.vectors(content_ids)
+        
+        result = await self.db.execute(
+            select(Content.id, Content.embedding).where(Content.id.in_(content_ids))
+        )
+        by_id = dict(result.all())
+        matrix = np.zeros((len(content_ids), settings.embedding_dimensions), dtype=np.float32)
+        for i, content_id in enumerate(content_ids):
+            if by_id.get(content_id) is not None:
+                matrix[i] = by_id[content_id]
+        return matrix
+    
+    async def _read_queued(
+        self,
+        agent_id: UUID,
+        content_type: Optional[str],
+        limit: int,
+        after: Optional[tuple],
+        consumed: Optional[ConsumedSet],
+    ) -> Optional[list]:
+        """Load a page of (Content, distance) rows from the feed queue, or None to go live."""
+        entries = feed_queues.read(agent_id, content_type, limit, after=after, skip=consumed)
+        if not entries:
+            return None
+        return await self._load_rows(entries) or None
+    
+    async def rank_personalized(
+        self,
+        agent: Agent,
+        content_type: Optional[str] = None,
+        after: Optional[tuple] = None,
+        limit: int = 100,
+    ) -> List[Tuple[float, UUID]]:
+        """Rank the next (distance, content_id) keys after `after` for an agent, excluding consumed content."""
+        filters = [Content.embedding.isnot(None)]
+        if content_type:
+            from app.models.content import ContentType
+            filters.append(Content.content_type == ContentType(content_type))
+        
+        entries, _, _ = await self._rank_keys(
+            Content.embedding.cosine_distance(agent.preference_embedding),
+            filters,
+            after,
+            False,
+            limit,
+            embedding=agent.preference_embedding,
+            content_type=content_type,
+            seen_by=agent.id,
+        )
+        return entries
+    
+    async def count_available(
+        self,
+        filters: list,
+        agent_id: Optional[UUID] = None,
+        state: Optional[dict] = None,
+        approximate: bool = False,
+        content_type: Optional[str] = None,
+    ) -> int:
+        """
+        Content a scroll can return: its query's filters plus the consumed anti-join.
+        
+        Counted once, on the scroll's first page, and carried in the cursor
+        as "t", so later pages cost nothing; consumption during the scroll
+        shows up in the next one. Without an agent or extra `filters` the
+        maintained per-type counters answer directly. With `approximate` the
+        planner's row estimate for the same query is used instead of counting.
+        """
+        if state and isinstance(state.get("t"), int):
+            return state["t"]
+        
+        from app.models.content import ContentType
+        ct = ContentType(content_type) if content_type else None
+        if not agent_id and not filters:
+            return await self.content_service.get_total_count(ct, approximate=approximate)
+        
+        query = select(Content.id).where(*filters)
+        if ct is not None:
+            query = query.where(Content.content_type == ct)
+        if agent_id:
+            query = query.where(self.agent_service.not_consumed_filter(agent_id))
+        if approximate:
+            estimate = await self._estimate_rows(query)
+            if estimate is not None:
+                return estimate
+        result = await self.db.execute(select(func.count()).select_from(query.subquery()))
+        return result.scalar() or 0
+    
+    async def _estimate_rows(self, query) -> Optional[int]:
+        """The planner's row estimate for `query`, or None if it can't be rendered."""
+        try:
+            sql = query.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True})
+        except Exception:
+            return None
+        result = await self.db.execute(text(f"EXPLAIN (FORMAT JSON) {sql}"))
+        plan = result.scalar()
+        if isinstance(plan, str):
+            plan = orjson.loads(plan)
+        return int(plan[0]["Plan"]["Plan Rows"])
+    
     async def get_shorts_feed(
         self,
         agent_id: Optional[UUID] = None,
         cursor: Optional[str] = None,
         limit: int = 20,
+        approximate: bool = False,
+        mmr_lambda: Optional[float] = None,
     ) -> FeedResponse:
         """Get feed of short-form content only (like Reels/TikTok)."""
         return await self.get_feed(
@@ -124,6 +784,217 @@ class FeedService:
             cursor=cursor,
             limit=limit,
             content_type="short",
+            approximate=approximate,
+            mmr_lambda=mmr_lambda,
+        )
+    
+    async def get_trending(
+        self,
+        cursor: Optional[str] = None,
+        limit: int = 10,
+        approximate: bool = False,
+        content_type: Optional[str] = None,
+        agent_id: Optional[UUID] = None,
+        window: str = DEFAULT_WINDOW,
+        similar: bool = True,
+    ) -> FeedResponse:
+        """
+        Trending content over a decay window (1h, 24h, 7d), or "all" for
+        all-time consumption count.
+        
+        Windowed pages are read straight from the in-process trending ranking;
+        until it has seen any activity, the all-time ordering is served.
+        With `agent_id`, content the agent already consumed is skipped.
+        `similar=False` leaves `similar_content_ids` to the caller (the blender).
+        """
+        if window not in TRENDING_WINDOWS:
+            window = TRENDING_ALL
+        mode = window if window == TRENDING_ALL or trending.has_scores(window) else TRENDING_ALL
+        
+        # Continue the cursor's scroll, including an all-time fallback scroll
+        state = decode_cursor(cursor, TRENDING_CURSOR)
+        key = None
+        if state and state.get("w", TRENDING_ALL) in (window, TRENDING_ALL):
+            mode = state.get("w", TRENDING_ALL)
+            key = parse_key(state["v"], int if mode == TRENDING_ALL else float, UUID)
+        position = state["p"] if key else 0
+        
+        filters = []
+        if content_type:
+            from app.models.content import ContentType
+            filters.append(Content.content_type == ContentType(content_type))
+        
+        consumed = None
+        if agent_id:
+            if settings.consumed_cache_enabled:
+                consumed = await consumed_cache.get(self.db, agent_id)
+            if consumed is None:
+                filters.append(self.agent_service.not_consumed_filter(agent_id))
+        
+        if mode == TRENDING_ALL:
+            query = (
+                select(Content, Content.agent_consumption_count)
+                .where(*filters)
+                .options(*self.content_service.view_options)
+            )
+            rows, last_key, has_more = await self._seek(
+                query,
+                [Content.agent_consumption_count, Content.id],
+                key,
+                True,
+                limit,
+                skip=consumed,
+            )
+        else:
+            rows, last_key, has_more = await self._seek_trending(
+                mode, key, limit, content_type, filters, skip=consumed
+            )
+        
+        items = []
+        for i, (c, score) in enumerate(rows):
+            context = {"recommendation_type": "trending", "trending_window": mode}
+            if mode != TRENDING_ALL:
+                context["trending_score"] = round(trending.current_score(mode, score), 4)
+            items.append(FeedItem(
+                content=self.content_service.to_agent_view(c),
+                position=position + i,
+                feed_context=context,
+            ))
+        
+        if similar:
+            await self._attach_similar(items)
+        
+        total = await self.count_available(
+            [], agent_id=agent_id, state=state if key else None,
+            approximate=approximate, content_type=content_type,
+        )
+        next_cursor = None
+        if has_more:
+            next_cursor = encode_cursor(
+                TRENDING_CURSOR, list(last_key), position + len(rows), w=mode, t=total
+            )
+        
+        return FeedResponse(
+            items=items,
+            next_cursor=next_cursor,
+            total_available=total,
+            feed_id=str(uuid.uuid4())
+        )
+    
+    async def _seek_trending(
+        self,
+        window: str,
+        key: Optional[tuple],
+        limit: int,
+        content_type: Optional[str],
+        filters: list,
+        skip: Optional[ConsumedSet] = None,
+    ) -> Tuple[list, Optional[tuple], bool]:
+        """`_seek` over the trending ranking: walks (log score, id) entries after `key`."""
+        batch_size = limit * SKIP_OVERFETCH
+        rows = []
+        for _ in range(MAX_SEEK_ROUNDS):
+            batch = list(islice(trending.ranked(window, after=key, content_type=content_type), batch_size))
+            if skip is not None:
+                await skip.confirm(self.db, [cid for _, cid in batch])
+            wanted = [entry for entry in batch if skip is None or entry[1] not in skip]
+            by_id = await self.content_service.get_by_ids([cid for _, cid in wanted], *filters)
+            for entry in batch:
+                key = entry
+                if entry[1] not in by_id:
+                    continue
+                rows.append((by_id[entry[1]], entry[0]))
+                if len(rows) == limit:
+                    return rows, key, True
+            if len(batch) < batch_size:
+                return rows, key, False
+        return rows, key, True
+    
+    async def get_discover(
+        self,
+        agent_id: Optional[UUID] = None,
+        cursor: Optional[str] = None,
+        limit: int = 10,
+        approximate: bool = False,
+        content_type: Optional[str] = None,
+        similar: bool = True,
+    ) -> FeedResponse:
+        """
+        Random discovery feed, sampled by seeking on an indexed random key.
+        
+        Each scroll draws a seed and walks `random_key` upward from it,
+        wrapping around to 0 once, so pages are stable and each costs an
+        index seek however large the catalog is.
+        """
+        state = decode_cursor(cursor, DISCOVER_CURSOR)
+        key = parse_key(state["v"], float, UUID) if state else None
+        if key:
+            seed, wrapped, position = state["seed"], state["w"], state["p"]
+        else:
+            seed, wrapped, position = random.random(), False, 0
+        
+        # Exclude consumed content, in memory when the agent's set is cached
+        filters = [Content.random_key.isnot(None)]
+        if content_type:
+            from app.models.content import ContentType
+            filters.append(Content.content_type == ContentType(content_type))
+        consumed = None
+        if agent_id:
+            if settings.consumed_cache_enabled:
+                consumed = await consumed_cache.get(self.db, agent_id)
+            if consumed is None:
+                filters.append(self.agent_service.not_consumed_filter(agent_id))
+        
+        columns = [Content.random_key, Content.id]
+        rows: list = []
+        has_more = False
+        while True:
+            # First pass covers [seed, 1), the wrapped pass covers [0, seed)
+            arc = Content.random_key < seed if wrapped else Content.random_key >= seed
+            query = (
+                select(Content, Content.random_key)
+                .where(*filters, arc)
+                .options(*self.content_service.view_options)
+            )
+            page, last_key, has_more = await self._seek(
+                query, columns, key, False, limit - len(rows), skip=consumed
+            )
+            rows.extend(page)
+            key = last_key
+            if has_more or wrapped:
+                break
+            wrapped, key = True, None
+        
+        items = [
+            FeedItem(
+                content=self.content_service.to_agent_view(c),
+                position=position + i,
+                feed_context={"recommendation_type": "discover"}
+            )
+            for i, (c, _) in enumerate(rows)
+        ]
+        if similar:
+            await self._attach_similar(items)
+        
+        total = await self.count_available(
+            [], agent_id=agent_id, state=state, approximate=approximate, content_type=content_type
+        )
+        next_cursor = None
+        if has_more:
+            next_cursor = encode_cursor(
+                DISCOVER_CURSOR,
+                list(key),
+                position + len(rows),
+                seed=seed,
+                w=wrapped,
+                t=total,
+            )
+        
+        return FeedResponse(
+            items=items,
+            next_cursor=next_cursor,
+            total_available=total,
+            feed_id=str(uuid.uuid4())
         )
     
     async def get_related_content(
@@ -131,17 +1002,46 @@ class FeedService:
         content_id: UUID,
         limit: int = 10,
     ) -> List[ContentAgentView]:
-        """Get content similar to a specific piece."""
-        content = await self.content_service.get_by_id(content_id)
-        if not content or not content.embedding:
+        """
+        Get content similar to a specific piece.
+        
+        Served from the neighbour table when it holds a full `limit` items;
+        items not in it yet, short lists (after deletes, or before the
+        refresher catches up) and requests for more than `neighbor_count`
+        fall back to a vector query.
+        """
+        if limit <= settings.neighbor_count:
+            neighbors = await NeighborService(self.db).get_neighbors(content_id, limit)
+            if len(neighbors) >= limit:
+                by_id = await self.content_service.get_by_ids([cid for _, cid in neighbors])
+                related = [
+                    self.content_service.to_agent_view(by_id[cid])
+                    for _, cid in neighbors
+                    if cid in by_id
+                ]
+                if len(related) >= limit:
+                    return related
+        
+        result = await self.db.execute(select(Content.embedding).where(Content.id == content_id))
+        embedding = result.scalar()
+        if embedding is None:
             return []
         
+        if vector_backend.enabled:
+            hits = await vector_backend.search(embedding, limit + 1)
+            by_id = await self.content_service.get_by_ids([cid for _, cid in hits])
+            return [
+                self.content_service.to_agent_view(by_id[cid])
+                for _, cid in hits
+                if cid != content_id and cid in by_id
+            ][:limit]
+        
         # Find similar content
         query = select(Content).where(
             Content.id != content_id,
             Content.embedding.isnot(None)
-        ).order_by(
-            Content.embedding.cosine_distance(content.embedding)
+        ).options(*self.content_service.view_options).order_by(
+            Content.embedding.cosine_distance(embedding)
         ).limit(limit)
         
         result = await self.db.execute(query)
@@ -0,0 +1,87 @@
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Any, List, Optional, Set, Tuple
+from uuid import UUID
+import numpy as np
+
+from app.core.config import settings
+
+# Snapshot entries are (sort value, content_id), the feed's keyset key
+SnapshotEntry = Tuple[Any, UUID]
+
+
+def embedding_version(embedding: Any) -> str:
+    """Short fingerprint of a preference embedding, carried in personalized cursors."""
+    data = np.asarray(embedding, dtype=np.float32).tobytes()
+    return hashlib.blake2b(data, digest_size=8).hexdigest()
+
+
+class FeedSnapshot:
+    """A ranked candidate window computed once for a feed session."""
+    
+    def __init__(
+        self,
+        entries: List[SnapshotEntry],
+        tail: Optional[SnapshotEntry],
+        has_more: bool,
+        embedding: Any = None,
+    ):
+        self.entries = entries
+        self.tail = tail  # Last key examined while ranking; live pages resume after it
+        self.has_more = has_more
+        # Preference embedding a personalized session was ranked with, kept for
+        # its lifetime so distance keys stay comparable after the agent's updates
+        self.embedding = embedding
+        self.embedding_version = None if embedding is None else embedding_version(embedding)
+        self.created_at = time.monotonic()
+
+
+class FeedSessionStore:
+    """
+    In-process LRU of feed snapshots keyed by feed_id, with a TTL.
+    
+    Snapshots are an optimization only: cursors always carry the last sort
+    key, so a session evicted here (or served by another worker) continues
+    with a keyset seek in the same order.
+    """
+    
+    def __init__(
+        self,
+        max_sessions: int = settings.feed_session_max_sessions,
+        ttl_seconds: float = settings.feed_session_ttl_seconds,
+    ):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self._snapshots: "OrderedDict[str, FeedSnapshot]" = OrderedDict()
+        self._served: "OrderedDict[str, Tuple[float, Set[str]]]" = OrderedDict()
+    
+    def get(self, feed_id: str) -> Optional[FeedSnapshot]:
+        snapshot = self._snapshots.get(feed_id)
+        if snapshot is None:
+            return None
+        if time.monotonic() - snapshot.created_at > self.ttl_seconds:
+            del self._snapshots[feed_id]
+            return None
+        self._snapshots.move_to_end(feed_id)
+        return snapshot
+    
+    def put(self, feed_id: str, snapshot: FeedSnapshot) -> FeedSnapshot:
+        self._snapshots[feed_id] = snapshot
+        self._snapshots.move_to_end(feed_id)
+        while len(self._snapshots) > self.max_sessions:
+            self._snapshots.popitem(last=False)
+        return snapshot
+    
+    def served(self, feed_id: str) -> Set[str]:
+        """Content IDs already served in a session, so blended sources don't repeat them."""
+        entry = self._served.get(feed_id)
+        if entry is None or time.monotonic() - entry[0] > self.ttl_seconds:
+            entry = self._served[feed_id] = (time.monotonic(), set())
+        self._served.move_to_end(feed_id)
+        while len(self._served) > self.max_sessions:
+            self._served.popitem(last=False)
+        return entry[1]
+
+
+feed_sessions = FeedSessionStore()
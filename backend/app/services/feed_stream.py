@@ -0,0 +1,100 @@
+import asyncio
+import json
+from typing import AsyncIterator, List, Optional, Set, Tuple
+from uuid import UUID
+
+from app.core.database import async_session_maker
+from app.schemas.content import FeedItem
+from app.services.view_cache import render_feed_item
+
+# Stream formats
+STREAM_NDJSON = "ndjson"
+STREAM_SSE = "sse"
+STREAM_MEDIA_TYPES = {
+    STREAM_NDJSON: "application/x-ndjson",
+    STREAM_SSE: "text/event-stream",
+}
+
+FeedChunk = Tuple[List[FeedItem], Optional[str]]
+
+
+async def stream_feed_chunks(
+    agent_id: Optional[UUID],
+    cursor: Optional[str] = None,
+    chunk_size: int = 25,
+    content_type: Optional[str] = None,
+    exclude_consumed: bool = True,
+    ratios: Optional[str] = None,
+    fields: Optional[Set[str]] = None,
+    max_items: Optional[int] = None,
+    prefetch: int = 1,
+) -> AsyncIterator[FeedChunk]:
+    """
+    Yield (items, next_cursor) feed chunks until the feed runs out or `max_items` are sent.
+    
+    A producer task generates chunks ahead of the consumer into a queue of
+    `prefetch` chunks. The consumer is paced by the HTTP transport, which
+    stops accepting writes when the client stops reading, so a slow client
+    stalls the producer after `prefetch` chunks instead of the server
+    buffering an unbounded feed. Each chunk uses its own pooled session, so
+    no connection is held while the stream is idle. The last chunk under
+    `max_items` is generated at the remaining size, so its cursor resumes
+    right after the final item sent.
+    """
+    from app.services.feed_service import FeedService
+    
+    queue: "asyncio.Queue[Optional[FeedChunk]]" = asyncio.Queue(maxsize=prefetch)
+    
+    async def produce() -> None:
+        next_cursor = cursor
+        remaining = max_items
+        try:
+            while remaining is None or remaining > 0:
+                async with async_session_maker() as session:
+                    feed = await FeedService(session, fields=fields).get_feed(
+                        agent_id=agent_id,
+                        cursor=next_cursor,
+                        limit=chunk_size if remaining is None else min(chunk_size, remaining),
+                        content_type=content_type,
+                        exclude_consumed=exclude_consumed,
+                        ratios=ratios,
+                    )
+                next_cursor = feed.next_cursor
+                if remaining is not None:
+                    remaining -= len(feed.items)
+                await queue.put((feed.items, next_cursor))
+                if not next_cursor:
+                    break
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Error streaming feed: {e}")
+        await queue.put(None)
+    
+    producer = asyncio.create_task(produce())
+    try:
+        while True:
+            chunk = await queue.get()
+            if chunk is None:
+                break
+            yield chunk
+    finally:
+        # Client went away (or the feed ended): stop generating candidates
+        producer.cancel()
+
+
+def encode_chunk(items: List[FeedItem], next_cursor: Optional[str], fmt: str) -> str:
+    """
+    Serialize one chunk: a line (or event) per item, then the resume cursor.
+    
+    NDJSON lines are FeedItem objects followed by {"next_cursor": ...};
+    SSE uses `item` and `cursor` events with the same payloads.
+    """
+    lines = []
+    for item in items:
+        data = render_feed_item(item).decode()
+        lines.append(f"event: item\ndata: {data}\n\n" if fmt == STREAM_SSE else data + "\n")
+    
+    cursor_data = json.dumps({"next_cursor": next_cursor})
+    lines.append(f"event: cursor\ndata: {cursor_data}\n\n" if fmt == STREAM_SSE else cursor_data + "\n")
+    return "".join(lines)
@@ -0,0 +1,349 @@
+import asyncio
+import time
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+from uuid import UUID
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, delete, func, insert, or_, true
+from sqlalchemy.orm import aliased
+
+from app.core.config import settings
+from app.core.database import async_session_maker
+from app.models.content import Content, ContentNeighbor
+from app.services.vector_search import vector_backend
+
+# Neighbour lists are (cosine_distance, content_id), nearest first
+Neighbor = Tuple[float, UUID]
+
+
+class NeighborService:
+    """
+    Read and maintain the materialized nearest-neighbour table.
+    
+    Each item keeps its `settings.neighbor_count` nearest items, so /related
+    and similar_content_ids are indexed lookups instead of vector queries.
+    """
+    
+    def __init__(self, db: AsyncSession):
+        self.db = db
+        self.k = settings.neighbor_count
+    
+    async def get_neighbors(self, content_id: UUID, limit: int) -> List[Neighbor]:
+        """An item's stored neighbours, nearest first."""
+        return (await self.get_lists([content_id], limit)).get(content_id, [])
+    
+    async def get_lists(
+        self,
+        content_ids: Sequence[UUID],
+        limit: Optional[int] = None,
+    ) -> Dict[UUID, List[Neighbor]]:
+        """Stored neighbour lists for many items in one primary-key range scan."""
+        if not content_ids:
+            return {}
+        query = select(
+            ContentNeighbor.content_id, ContentNeighbor.distance, ContentNeighbor.neighbor_id
+        ).where(ContentNeighbor.content_id.in_(content_ids))
+        if limit is not None:
+            query = query.where(ContentNeighbor.rank < limit)
+        result = await self.db.execute(
+            query.order_by(ContentNeighbor.content_id, ContentNeighbor.rank)
+        )
+        lists: Dict[UUID, List[Neighbor]] = {}
+        for content_id, distance, neighbor_id in result.all():
+            lists.setdefault(content_id, []).append((distance, neighbor_id))
+        return lists
+    
+    async def similar_ids(self, content_ids: Sequence[UUID]) -> Dict[UUID, List[str]]:
+        """`similar_content_ids` for a page of items."""
+        lists = await self.get_lists(content_ids, settings.neighbor_similar_ids)
+        return {cid: [str(nid) for _, nid in hits] for cid, hits in lists.items()}
+    
+    async def nearest(self, content_id: UUID, embedding) -> List[Neighbor]:
+        """Compute an item's top-k neighbours with the active vector search."""
+        if vector_backend.enabled:
+            hits = await vector_backend.search(embedding, self.k + 1)
+        else:
+            distance = Content.embedding.cosine_distance(embedding)
+            result = await self.db.execute(
+                select(distance, Content.id)
+                .where(Content.embedding.isnot(None), Content.id != content_id)
+                .order_by(distance)
+                .limit(self.k)
+            )
+            hits = [(float(d), cid) for d, cid in result.all()]
+        return [hit for hit in hits if hit[1] != content_id][:self.k]
+    
+    async def _nearest_many(self, content_ids: Sequence[UUID]) -> Dict[UUID, List[Neighbor]]:
+        """pgvector top-k neighbours for many stored items in one round trip."""
+        item = aliased(Content)
+        distance = Content.embedding.cosine_distance(item.embedding)
+        nearest = (
+            select(Content.id.label("neighbor_id"), distance.label("distance"))
+            .where(Content.embedding.isnot(None), Content.id != item.id)
+            .order_by(distance)
+            .limit(self.k)
+            .lateral()
+        )
+        result = await self.db.execute(
+            select(item.id, nearest.c.distance, nearest.c.neighbor_id)
+            .join(nearest, true())
+            .where(item.id.in_(content_ids))
+            .order_by(item.id, nearest.c.distance)
+        )
+        lists: Dict[UUID, List[Neighbor]] = {cid: [] for cid in content_ids}
+        for content_id, d, neighbor_id in result.all():
+            lists[content_id].append((float(d), neighbor_id))
+        return lists
+    
+    async def add(self, content_id: UUID, embedding) -> None:
+        """
+        Store a new (or re-embedded) item's neighbours and merge it into the
+        existing lists of those neighbours where it ranks.
+        
+        kNN is not symmetric: lists the item belongs in need not be among
+        its own top-k. Neighbours without a list yet, and items listing any
+        of its neighbours whose list it would now enter, are queued for the
+        refresher to recompute.
+        """
+        hits = await self.nearest(content_id, embedding)
+        hit_ids = [cid for _, cid in hits]
+        lists = await self.get_lists(hit_ids)
+        
+        updated = {content_id: hits}
+        for distance, neighbor_id in hits:
+            if neighbor_id not in lists:
+                continue
+            current = [entry for entry in lists[neighbor_id] if entry[1] != content_id]
+            if len(current) < self.k or distance < current[-1][0]:
+                updated[neighbor_id] = sorted(current + [(distance, content_id)])[:self.k]
+        await self._replace(updated)
+        await self.db.commit()
+        
+        stale = set(await self._reverse_candidates(hit_ids, embedding))
+        stale.update(cid for cid in hit_ids if cid not in lists)
+        stale.difference_update(updated)
+        neighbor_refresher.mark_stale(stale)
+    
+    async def remove(self, content_id: UUID) -> List[UUID]:
+        """
+        Drop an item's list and its entries in other lists.
+        
+        Returns the items whose lists lost an entry; the caller queues them
+        with `neighbor_refresher.mark_stale` once its transaction commits.
+        """
+        owners = [cid for cid in await self._owners([content_id]) if cid != content_id]
+        await self.db.execute(
+            delete(ContentNeighbor).where(or_(
+                ContentNeighbor.content_id == content_id,
+                ContentNeighbor.neighbor_id == content_id,
+            ))
+        )
+        return owners
+    
+    async def _owners(self, neighbor_ids: Sequence[UUID]) -> List[UUID]:
+        """Items whose stored lists contain any of `neighbor_ids`."""
+        if not neighbor_ids:
+            return []
+        result = await self.db.execute(
+            select(ContentNeighbor.content_id)
+            .where(ContentNeighbor.neighbor_id.in_(neighbor_ids))
+            .distinct()
+        )
+        return list(result.scalars().all())
+    
+    async def _reverse_candidates(self, neighbor_ids: Sequence[UUID], embedding) -> List[UUID]:
+        """Items listing any of `neighbor_ids` whose list `embedding` would enter."""
+        if not neighbor_ids:
+            return []
+        owners = select(ContentNeighbor.content_id).where(
+            ContentNeighbor.neighbor_id.in_(neighbor_ids)
+        )
+        tails = (
+            select(
+                ContentNeighbor.content_id,
+                func.max(ContentNeighbor.distance).label("tail"),
+                func.count().label("size"),
+            )
+            .where(ContentNeighbor.content_id.in_(owners))
+            .group_by(ContentNeighbor.content_id)
+            .subquery()
+        )
+        result = await self.db.execute(
+            select(tails.c.content_id)
+            .join(Content, Content.id == tails.c.content_id)
+            .where(or_(
+                tails.c.size < self.k,
+                Content.embedding.cosine_distance(embedding) < tails.c.tail,
+            ))
+        )
+        return list(result.scalars().all())
+    
+    async def _replace(self, lists: Dict[UUID, List[Neighbor]]) -> None:
+        if not lists:
+            return
+        await self.db.execute(
+            delete(ContentNeighbor).where(ContentNeighbor.content_id.in_(list(lists)))
+        )
+        rows = [
+            {"content_id": cid, "rank": rank, "neighbor_id": nid, "distance": distance}
+            for cid, hits in lists.items()
+            for rank, (distance, nid) in enumerate(hits)
+        ]
+        if rows:
+            await self.db.execute(insert(ContentNeighbor), rows)
+    
+    async def refresh_all(self, progress: Optional[dict] = None) -> int:
+        """
+        Recompute every item's list in batches of `neighbor_refresh_batch`,
+        committing per batch so readers always see whole lists.
+        
+        The memmap backend scores a whole batch in one pass over the matrix;
+        with pgvector the batch is one query, an ANN index scan per item
+        under a LATERAL join.
+        """
+        done = 0
+        after = None
+        while True:
+            query = select(Content.id, Content.embedding).where(Content.embedding.isnot(None))
+            if after is not None:
+                query = query.where(Content.id > after)
+            result = await self.db.execute(
+                query.order_by(Content.id).limit(settings.neighbor_refresh_batch)
+            )
+            batch = result.all()
+            if not batch:
+                return done
+            
+            await self._recompute(batch)
+            done += len(batch)
+            after = batch[-1][0]
+            if progress is not None:
+                progress["items_done"] = done
+    
+    async def refresh_ids(self, content_ids: Sequence[UUID]) -> None:
+        """Recompute the lists of specific items (deleted or unembedded ones are skipped)."""
+        result = await self.db.execute(
+            select(Content.id, Content.embedding)
+            .where(Content.id.in_(content_ids), Content.embedding.isnot(None))
+        )
+        batch = result.all()
+        if batch:
+            await self._recompute(batch)
+    
+    async def _recompute(self, batch: Sequence[Tuple[UUID, object]]) -> None:
+        """Replace the lists of `batch` (id, embedding) pairs in one commit."""
+        if vector_backend.enabled:
+            results = await vector_backend.search_many([e for _, e in batch], self.k + 1)
+            lists = {
+                cid: [hit for hit in hits if hit[1] != cid][:self.k]
+                for (cid, _), hits in zip(batch, results)
+            }
+        else:
+            lists = await self._nearest_many([cid for cid, _ in batch])
+        await self._replace(lists)
+        await self.db.commit()
+
+
+class NeighborRefresher:
+    """
+    Runs full neighbour-table refreshes in the background, one at a time,
+    and recomputes lists marked stale by inserts and deletes.
+    
+    Stale items are collected for `debounce_seconds` so a burst of inserts
+    recomputes each affected list once.
+    """
+    
+    def __init__(
+        self,
+        interval_seconds: float = settings.neighbor_refresh_interval_seconds,
+        debounce_seconds: float = 1.0,
+    ):
+        self.interval_seconds = interval_seconds
+        self.debounce_seconds = debounce_seconds
+        self.status: dict = {
+            "running": False, "items_done": 0, "last_refresh": None, "last_error": None, "stale": 0,
+        }
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.Task] = None
+        self._stale: Set[UUID] = set()
+        self._wake = asyncio.Event()
+        self._drainer: Optional[asyncio.Task] = None
+    
+    def mark_stale(self, content_ids: Iterable[UUID]) -> None:
+        """Queue items whose lists may be missing or holding the wrong neighbours."""
+        self._stale.update(content_ids)
+        self.status["stale"] = len(self._stale)
+        if self._stale:
+            self._wake.set()
+    
+    async def _drain(self) -> None:
+        while True:
+            await self._wake.wait()
+            await asyncio.sleep(self.debounce_seconds)
+            self._wake.clear()
+            while self._stale:
+                size = min(len(self._stale), settings.neighbor_refresh_batch)
+                batch = [self._stale.pop() for _ in range(size)]
+                self.status["stale"] = len(self._stale)
+                try:
+                    async with async_session_maker() as session:
+                        await NeighborService(session).refresh_ids(batch)
+                except Exception as e:
+                    self.status["last_error"] = str(e)
+                    print(f"Error refreshing stale content neighbours: {e}")
+    
+    def start_refresh(self) -> bool:
+        """Start a refresh; False if one is already running."""
+        if self._task and not self._task.done():
+            return False
+        self._task = asyncio.create_task(self._refresh())
+        return True
+    
+    async def _refresh(self) -> None:
+        self.status.update(running=True, items_done=0, last_error=None)
+        started = time.monotonic()
+        try:
+            async with async_session_maker() as session:
+                await NeighborService(session).refresh_all(progress=self.status)
+            self.status["last_refresh"] = {
+                "items": self.status["items_done"],
+                "seconds": round(time.monotonic() - started, 1),
+            }
+        except Exception as e:
+            self.status["last_error"] = str(e)
+            print(f"Error refreshing content neighbours: {e}")
+        finally:
+            self.status["running"] = False
+    
+    async def start(self) -> None:
+        """
+        Build the table if it is empty, then refresh every `interval_seconds`
+        (if set); stale lists are recomputed as they are queued.
+        """
+        async with async_session_maker() as session:
+            stored = await session.execute(select(ContentNeighbor.content_id).limit(1))
+            empty = stored.first() is None
+        if empty:
+            self.start_refresh()
+        if self.interval_seconds > 0 and self._loop is None:
+            self._loop = asyncio.create_task(self._run())
+        if self._drainer is None:
+            self._drainer = asyncio.create_task(self._drain())
+    
+    async def stop(self) -> None:
+        for task in (self._loop, self._task, self._drainer):
+            if task is not None and not task.done():
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._loop = None
+        self._drainer = None
+    
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval_seconds)
+            self.start_refresh()
+
+
+neighbor_refresher = NeighborRefresher()
@@ -0,0 +1,187 @@
+import asyncio
+from typing import Dict, List, Optional, Tuple
+from uuid import UUID
+import numpy as np
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, update
+
+from app.core.config import settings
+from app.core.database import async_session_maker
+from app.models.agent import Agent
+from app.models.content import Content
+from app.services.feed_cache import feed_page_cache
+from app.services.feed_queue import feed_queues
+from app.services.vector_search import normalize, vector_backend
+
+# Pending signals are (content_id, signed weight), in consumption order
+Signal = Tuple[UUID, float]
+
+
+def consumption_weight(rating: Optional[int], completion_percentage: Optional[float]) -> float:
+    """
+    Signed strength of a consumption in [-1, 1].
+    
+    A rating sets the direction (1-2 push away, 3 is neutral, 4-5 pull
+    towards) and completion scales it, with a floor so a low rating on a
+    skimmed item still counts. Unrated items pull by completion alone, at
+    half strength.
+    """
+    completion = min(max(completion_percentage or 0.0, 0.0), 100.0) / 100
+    if rating is None:
+        return 0.5 * completion
+    return (rating - 3) / 2 * max(completion, 0.25)
+
+
+def fold_signals(
+    preference: Optional[np.ndarray],
+    vectors: np.ndarray,
+    weights: np.ndarray,
+    rate: float,
+) -> Optional[np.ndarray]:
+    """
+    Apply consumption signals to a preference vector as an exponential moving average.
+    
+    Each signal with weight w steps p <- (1 - b) p + sign(w) b c, where
+    b = rate * |w| and c is the content's unit vector. The steps compose to
+    p * prod(1 - b) + sum_i sign(w_i) b_i c_i prod_{j>i}(1 - b_j), so the
+    whole batch is one weighted sum over the matrix. Returns a unit vector,
+    or None when nothing moved it. With no preference yet, only positive
+    signals seed one.
+    """
+    if preference is None:
+        weights = np.maximum(weights, 0.0)
+    steps = np.clip(rate * np.abs(weights), 0.0, 1.0)
+    keep = 1.0 - steps
+    # Decay applied to each signal by the ones after it
+    after = np.concatenate([np.cumprod(keep[::-1])[::-1][1:], [1.0]])
+    moved = (np.sign(weights) * steps * after) @ vectors
+    result = moved if preference is None else normalize(preference) * np.prod(keep) + moved
+    norm = np.linalg.norm(result)
+    if not norm:
+        return None
+    return (result / norm).astype(np.float32)
+
+
+class PreferenceUpdater:
+    """
+    Learns preference embeddings from consumption, off the consume path.
+    
+    `record` only appends (content_id, weight) in memory. Each agent's
+    signals are folded into its stored preference embedding at most every
+    `flush_seconds`, or once `flush_events` are pending: one query loads the
+    consumed items' stored embeddings, NumPy applies the moving average and
+    one UPDATE writes the row, which is locked between the read and the
+    write so concurrent flushes from other workers don't lose updates. No
+    embedding API calls are made. Personalized scrolls already under way
+    keep ranking with the embedding they started with (see `FeedSnapshot`).
+    """
+    
+    def __init__(
+        self,
+        rate: float = settings.preference_learning_rate,
+        flush_seconds: float = settings.preference_flush_seconds,
+        flush_events: int = settings.preference_flush_events,
+    ):
+        self.rate = rate
+        self.flush_seconds = flush_seconds
+        self.flush_events = flush_events
+        self._pending: Dict[UUID, List[Signal]] = {}
+        self._due: "asyncio.Queue[UUID]" = asyncio.Queue()
+        self._worker: Optional[asyncio.Task] = None
+        self._ticker: Optional[asyncio.Task] = None
+    
+    def record(self, agent_id: UUID, content_id: UUID, weight: float) -> None:
+        if not settings.preference_learning_enabled or not weight:
+            return
+        signals = self._pending.setdefault(agent_id, [])
+        signals.append((content_id, weight))
+        if len(signals) == self.flush_events:
+            self._due.put_nowait(agent_id)
+    
+    async def start(self) -> None:
+        if self._worker is None:
+            self._worker = asyncio.create_task(self._run())
+            self._ticker = asyncio.create_task(self._tick())
+    
+    async def stop(self) -> None:
+        for task in (self._ticker, self._worker):
+            if task is not None:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._worker = self._ticker = None
+        await self.flush_all()
+    
+    async def _tick(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_seconds)
+            for agent_id in list(self._pending):
+                self._due.put_nowait(agent_id)
+    
+    async def _run(self) -> None:
+        while True:
+            agent_id = await self._due.get()
+            try:
+                await self.flush(agent_id)
+            except Exception as e:
+                print(f"Error updating preference embedding: {e}")
+    
+    async def flush_all(self) -> None:
+        for agent_id in list(self._pending):
+            try:
+                await self.flush(agent_id)
+            except Exception as e:
+                print(f"Error updating preference embedding: {e}")
+    
+    async def flush(self, agent_id: UUID) -> None:
+        """Fold an agent's pending signals into its stored preference embedding."""
+        signals = self._pending.pop(agent_id, None)
+        if not signals:
+            return
+        async with async_session_maker() as session:
+            updated = await self._apply(session, agent_id, signals)
+        if updated:
+            # Queued rankings and cached pages were computed from the old embedding
+            feed_queues.invalidate(agent_id)
+            await feed_page_cache.invalidate(agent_id)
+    
+    async def _apply(self, db: AsyncSession, agent_id: UUID, signals: List[Signal]) -> bool:
+        content_ids = list({cid for cid, _ in signals})
+        if vector_backend.enabled:
+            stored = dict(zip(content_ids, vector_backend.vectors(content_ids)))
+        else:
+            result = await db.execute(
+                select(Content.id, Content.embedding)
+                .where(Content.id.in_(content_ids), Content.embedding.isnot(None))
+            )
+            stored = {cid: normalize(embedding) for cid, embedding in result.all()}
+        
+        usable = [(cid, w) for cid, w in signals if cid in stored and np.any(stored[cid])]
+        if not usable:
+            return False
+        
+        # Row lock: another worker flushing the same agent must fold onto this result
+        result = await db.execute(
+            select(Agent.preference_embedding).where(Agent.id == agent_id).with_for_update()
+        )
+        preference = result.scalar()
+        embedding = fold_signals(
+            None if preference is None else np.asarray(preference, dtype=np.float32),
+            np.stack([stored[cid] for cid, _ in usable]),
+            np.array([w for _, w in usable], dtype=np.float32),
+            self.rate,
+        )
+        if embedding is None:
+            await db.rollback()
+            return False
+        
+        await db.execute(
+            update(Agent).where(Agent.id == agent_id).values(preference_embedding=embedding)
+        )
+        await db.commit()
+        return True
+
+
+preference_updater = PreferenceUpdater()
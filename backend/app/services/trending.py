@@ -0,0 +1,206 @@
+import bisect
+import math
+import time
+from datetime import timedelta
+from typing import Dict, Iterator, List, Optional, Tuple
+from uuid import UUID
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, func
+
+from app.core.config import settings
+
+# Trending windows and the half-life of their decay, in seconds
+TRENDING_WINDOWS = {
+    "1h": 3600,
+    "24h": 86400,
+    "7d": 7 * 86400,
+}
+DEFAULT_WINDOW = "24h"
+
+# Events older than this many half-lives are ignored when seeding (weight < 1/256)
+SEED_HALF_LIVES = 8
+
+# Ranked entries are (log score, content_id); higher ranks first
+TrendingEntry = Tuple[float, UUID]
+
+
+def _log2_add(a: float, b: float) -> float:
+    """log2(2**a + 2**b) without overflow."""
+    if a < b:
+        a, b = b, a
+    return a + math.log2(1.0 + 2.0 ** (b - a))
+
+
+class TrendingWindow:
+    """
+    Exponentially decayed scores for one window, kept ranked.
+    
+    A hit of weight w at time t adds w * 2**((t - now) / half_life) to an
+    item's current score. Scores are stored as log2(sum of w * 2**(t / half_life)),
+    which only grows as hits arrive and orders items exactly like their
+    decayed score at any instant. Nothing has to be rescaled as time passes,
+    and stored values double as stable keyset cursors.
+    
+    The ranking is a sorted list updated on every hit: the item's old entry
+    is found by bisection and moved to its new position, so a hit costs
+    O(log n) comparisons plus a pointer shift bounded by the engine's
+    `max_items`. Pages always see the latest hits.
+    """
+    
+    def __init__(self, half_life: float):
+        self.half_life = half_life
+        self._scores: Dict[UUID, float] = {}
+        self._ranked: List[Tuple[float, UUID]] = []  # (-log score, id), ascending
+    
+    def __len__(self) -> int:
+        return len(self._scores)
+    
+    def add(self, content_id: UUID, weight: float, at: float) -> None:
+        hit = math.log2(weight) + at / self.half_life
+        previous = self._scores.get(content_id)
+        if previous is None:
+            score = hit
+        else:
+            score = _log2_add(previous, hit)
+            self._unrank(previous, content_id)
+        self._scores[content_id] = score
+        bisect.insort(self._ranked, (-score, content_id))
+    
+    def remove(self, content_id: UUID) -> None:
+        score = self._scores.pop(content_id, None)
+        if score is not None:
+            self._unrank(score, content_id)
+    
+    def _unrank(self, score: float, content_id: UUID) -> None:
+        del self._ranked[bisect.bisect_left(self._ranked, (-score, content_id))]
+    
+    def current_score(self, log_score: float, now: float) -> float:
+        """Decayed score at `now` for a stored log score."""
+        return 2.0 ** (log_score - now / self.half_life)
+    
+    def iter_after(self, after: Optional[TrendingEntry] = None) -> Iterator[TrendingEntry]:
+        """Ranked entries strictly after `after`, highest score first."""
+        ranked = self._ranked
+        start = 0
+        if after is not None:
+            start = bisect.bisect_right(ranked, (-after[0], after[1]))
+        for i in range(start, len(ranked)):
+            neg_score, content_id = ranked[i]
+            yield -neg_score, content_id
+    
+    def prune(self, max_items: int) -> None:
+        """Keep only the `max_items` highest-scoring items."""
+        for _, content_id in self._ranked[max_items:]:
+            del self._scores[content_id]
+        del self._ranked[max_items:]
+
+
+class TrendingEngine:
+    """
+    In-process trending rankings, updated incrementally on each view and
+    consumption and seeded from recent consumption and view history at
+    startup.
+    
+    State is per worker: each process ranks the events it handled itself
+    on top of the shared seed, so with several workers their trending pages
+    can differ slightly until the next restart re-seeds them from the
+    database.
+    """
+    
+    def __init__(self, max_items: int = settings.trending_max_items):
+        self.max_items = max_items
+        self.windows = {name: TrendingWindow(h) for name, h in TRENDING_WINDOWS.items()}
+        self._types: Dict[UUID, str] = {}
+    
+    def record(self, content_id: UUID, content_type: str, weight: float = 1.0) -> None:
+        """Count a view or consumption happening now."""
+        now = time.time()
+        self._types[content_id] = content_type
+        for window in self.windows.values():
+            window.add(content_id, weight, now)
+            if len(window) > self.max_items * 1.1:
+                window.prune(self.max_items)
+        if len(self._types) > self.max_items * 1.5:
+            self._drop_untracked_types()
+    
+    def remove(self, content_id: UUID) -> None:
+        self._types.pop(content_id, None)
+        for window in self.windows.values():
+            window.remove(content_id)
+    
+    def has_scores(self, window: str) -> bool:
+        return len(self.windows[window]) > 0
+    
+    def ranked(
+        self,
+        window: str,
+        after: Optional[TrendingEntry] = None,
+        content_type: Optional[str] = None,
+    ) -> Iterator[TrendingEntry]:
+        """Walk a window's ranking after `after`, optionally for one content type."""
+        for entry in self.windows[window].iter_after(after):
+            if content_type is None or self._types.get(entry[1]) == content_type:
+                yield entry
+    
+    def current_score(self, window: str, log_score: float) -> float:
+        return self.windows[window].current_score(log_score, time.time())
+    
+    def _drop_untracked_types(self) -> None:
+        tracked = set()
+        for window in self.windows.values():
+            tracked.update(window._scores)
+        self._types = {cid: t for cid, t in self._types.items() if cid in tracked}
+    
+    async def load(self, db: AsyncSession) -> None:
+        """
+        Seed every window from decayed consumption and view history.
+        
+        Consumptions are timestamped and decay exactly. Views are only kept
+        as a per-item total, so an item's views are taken as spread evenly
+        over its lifetime L, which decays to view_count * h / (L ln 2) *
+        (1 - 2**(-L / h)) for half-life h. Only items created within the
+        seed horizon are read.
+        """
+        from app.models.agent import AgentConsumption
+        from app.models.content import Content
+        
+        now = time.time()
+        for name, half_life in TRENDING_WINDOWS.items():
+            # consumed_at and created_at are naive UTC
+            age = func.extract(
+                "epoch", func.timezone("utc", func.now()) - AgentConsumption.consumed_at
+            )
+            consumed = await db.execute(
+                select(
+                    AgentConsumption.content_id,
+                    Content.content_type,
+                    func.sum(func.power(2, -age / half_life)),
+                )
+                .join(Content, Content.id == AgentConsumption.content_id)
+                .where(age < SEED_HALF_LIVES * half_life)
+                .group_by(AgentConsumption.content_id, Content.content_type)
+            )
+            lifetime = func.greatest(
+                func.extract("epoch", func.timezone("utc", func.now()) - Content.created_at), 1.0
+            )
+            viewed = await db.execute(
+                select(
+                    Content.id,
+                    Content.content_type,
+                    Content.view_count * settings.trending_view_weight * half_life
+                    / (lifetime * math.log(2))
+                    * (1 - func.power(2, -lifetime / half_life)),
+                )
+                .where(Content.view_count > 0)
+                .where(Content.created_at > func.timezone("utc", func.now()) - timedelta(
+                    seconds=SEED_HALF_LIVES * half_life
+                ))
+            )
+            window = self.windows[name]
+            for content_id, content_type, decayed in [*consumed.all(), *viewed.all()]:
+                if decayed and decayed > 0:
+                    self._types[content_id] = content_type.value
+                    window.add(content_id, float(decayed), now)
+            window.prune(self.max_items)
+
+trending = TrendingEngine()
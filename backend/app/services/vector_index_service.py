@@ -0,0 +1,238 @@
+import asyncio
+from typing import Dict, List, Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import text
+
+from app.core.config import settings
+from app.core.database import engine
+
+# Latency-versus-recall presets for pgvector's ANN indexes
+RECALL_PRESETS = {
+    "fast": {"ef_search": 40, "probes": 1},
+    "balanced": {"ef_search": 100, "probes": 10},
+    "accurate": {"ef_search": 400, "probes": 40},
+}
+
+# (table, column) pairs that get a managed ANN index
+VECTOR_COLUMNS = [
+    ("content", "embedding"),
+    ("agents", "preference_embedding"),
+]
+
+INDEX_TYPES = ("hnsw", "ivfflat")
+
+# pgvector's upper bound for hnsw.ef_search
+MAX_EF_SEARCH = 1000
+
+# Rebuilds running in this process, by table
+_rebuilds: Dict[str, asyncio.Task] = {}
+_rebuild_errors: Dict[str, str] = {}
+
+# Whether the installed pgvector supports iterative index scans (0.8+); checked once
+_iterative_scan: Optional[bool] = None
+
+
+def index_name(table: str, column: str, index_type: str) -> str:
+    return f"ix_{table}_{column}_{index_type}"
+
+
+def index_ddl(table: str, column: str, index_type: str, concurrently: bool = False) -> str:
+    """CREATE INDEX statement for a cosine-distance ANN index."""
+    if index_type == "hnsw":
+        options = f"m = {settings.hnsw_m}, ef_construction = {settings.hnsw_ef_construction}"
+    else:
+        options = f"lists = {settings.ivfflat_lists}"
+    return (
+        f"CREATE INDEX {'CONCURRENTLY ' if concurrently else ''}IF NOT EXISTS "
+        f"{index_name(table, column, index_type)} ON {table} "
+        f"USING {index_type} ({column} vector_cosine_ops) WITH ({options})"
+    )
+
+
+async def ensure_vector_indexes() -> None:
+    """
+    Create the configured ANN indexes if missing (called from init_db).
+    
+    Builds run CONCURRENTLY on an autocommit connection, so a first build
+    over an existing catalog does not block writes. An interrupted build
+    leaves an INVALID index that IF NOT EXISTS would keep; it is dropped
+    and built again.
+    """
+    index_type = settings.vector_index_type
+    if index_type not in INDEX_TYPES:
+        return
+    async with engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        for table, column in VECTOR_COLUMNS:
+            name = index_name(table, column, index_type)
+            try:
+                result = await conn.execute(
+                    text(
+                        "SELECT i.indisvalid FROM pg_index i "
+                        "JOIN pg_class c ON c.oid = i.indexrelid WHERE c.relname = :name"
+                    ),
+                    {"name": name},
+                )
+                if result.scalar() is False:
+                    await conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+                await conn.execute(text(index_ddl(table, column, index_type, concurrently=True)))
+            except Exception as e:
+                print(f"Error creating vector index on {table}: {e}")
+
+
+async def apply_search_params(
+    db: AsyncSession,
+    recall: Optional[str] = None,
+    ef_search: Optional[int] = None,
+    probes: Optional[int] = None,
+) -> None:
+    """
+    Set ANN search knobs for the rest of the current transaction.
+    
+    `recall` picks a preset (fast, balanced, accurate); explicit `ef_search`
+    and `probes` override it. With nothing given the server defaults apply.
+    """
+    preset = RECALL_PRESETS.get(recall or settings.vector_search_preset, {})
+    ef_search = ef_search or preset.get("ef_search")
+    probes = probes or preset.get("probes")
+    
+    # SET LOCAL cannot take bind parameters; values are validated ints
+    if ef_search:
+        await db.execute(text(f"SET LOCAL hnsw.ef_search = {int(ef_search)}"))
+    if probes:
+        await db.execute(text(f"SET LOCAL ivfflat.probes = {int(probes)}"))
+
+
+async def prepare_distance_scan(db: AsyncSession, limit: int) -> None:
+    """
+    Let an HNSW `ORDER BY distance LIMIT limit` scan fill its LIMIT past WHERE filters.
+    
+    An HNSW index scan yields at most `hnsw.ef_search` candidates and
+    filters them afterwards, so a filtered or seeking query can come back
+    short. For the rest of the transaction this raises ef_search to at
+    least `limit` (keeping any larger per-request value, capped at
+    pgvector's 1000) and, on pgvector 0.8+, turns on strict-order
+    iterative scans, which keep walking the graph until the LIMIT is met
+    (bounded by `hnsw.max_scan_tuples`). On older pgvector a seek can only
+    reach about ef_search rows deep into the ranking.
+    """
+    global _iterative_scan
+    if settings.vector_index_type != "hnsw":
+        return
+    if _iterative_scan is None:
+        result = await db.execute(
+            text("SELECT extversion FROM pg_extension WHERE extname = 'vector'")
+        )
+        version = result.scalar()
+        try:
+            _iterative_scan = version is not None and tuple(
+                int(part) for part in version.split(".")[:2]
+            ) >= (0, 8)
+        except ValueError:
+            _iterative_scan = False
+    
+    await db.execute(
+        text(
+            "SELECT set_config('hnsw.ef_search', greatest("
+            "coalesce(current_setting('hnsw.ef_search', true), '40')::int, :ef)::text, true)"
+        ),
+        {"ef": min(limit, MAX_EF_SEARCH)},
+    )
+    if _iterative_scan:
+        await db.execute(text("SET LOCAL hnsw.iterative_scan = strict_order"))
+
+
+class VectorIndexService:
+    """Inspect and rebuild the managed ANN indexes."""
+    
+    def __init__(self, db: AsyncSession):
+        self.db = db
+    
+    async def get_status(self) -> List[dict]:
+        """Report each managed index with its size and any build in progress."""
+        statuses = []
+        for table, column in VECTOR_COLUMNS:
+            result = await self.db.execute(
+                text(
+                    "SELECT i.indexname, pg_relation_size(c.oid) AS size_bytes, "
+                    "pg_size_pretty(pg_relation_size(c.oid)) AS size "
+                    "FROM pg_indexes i JOIN pg_class c ON c.relname = i.indexname "
+                    "WHERE i.tablename = :table AND i.indexname = ANY(:names)"
+                ),
+                {
+                    "table": table,
+                    "names": [index_name(table, column, t) for t in INDEX_TYPES],
+                },
+            )
+            indexes = [dict(row._mapping) for row in result.all()]
+            
+            progress = await self.db.execute(
+                text(
+                    "SELECT command, phase, blocks_done, blocks_total, "
+                    "tuples_done, tuples_total "
+                    "FROM pg_stat_progress_create_index "
+                    "WHERE relid = CAST(:table AS regclass)"
+                ),
+                {"table": table},
+            )
+            row = progress.first()
+            build = None
+            if row:
+                build = dict(row._mapping)
+                total = build["blocks_total"] or build["tuples_total"]
+                done = build["blocks_done"] if build["blocks_total"] else build["tuples_done"]
+                build["percent"] = round(100 * done / total, 1) if total else None
+            
+            task = _rebuilds.get(table)
+            statuses.append({
+                "table": table,
+                "column": column,
+                "configured_type": settings.vector_index_type,
+                "indexes": indexes,
+                "rebuilding": bool(task and not task.done()),
+                "build_progress": build,
+                "last_error": _rebuild_errors.get(table),
+            })
+        return statuses
+    
+    def start_rebuild(self, table: str) -> bool:
+        """Start a concurrent rebuild in the background; False if one is already running."""
+        task = _rebuilds.get(table)
+        if task and not task.done():
+            return False
+        column = dict(VECTOR_COLUMNS)[table]
+        _rebuild_errors.pop(table, None)
+        _rebuilds[table] = asyncio.create_task(_rebuild(table, column))
+        return True
+
+
+async def _rebuild(table: str, column: str) -> None:
+    """
+    Rebuild (or switch the type of) one ANN index without blocking writes.
+    
+    CONCURRENTLY cannot run inside a transaction, so this uses its own
+    autocommit connection.
+    """
+    index_type = settings.vector_index_type
+    try:
+        async with engine.connect() as conn:
+            conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+            for other in INDEX_TYPES:
+                if other != index_type:
+                    await conn.execute(text(
+                        f"DROP INDEX CONCURRENTLY IF EXISTS {index_name(table, column, other)}"
+                    ))
+            if index_type not in INDEX_TYPES:
+                return
+            
+            name = index_name(table, column, index_type)
+            exists = await conn.execute(
+                text("SELECT 1 FROM pg_indexes WHERE indexname = :name"), {"name": name}
+            )
+            if exists.first():
+                await conn.execute(text(f"REINDEX INDEX CONCURRENTLY {name}"))
+            else:
+                await conn.execute(text(index_ddl(table, column, index_type, concurrently=True)))
+    except Exception as e:
+        _rebuild_errors[table] = str(e)
+        print(f"Error rebuilding vector index on {table}: {e}")
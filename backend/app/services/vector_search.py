@@ -0,0 +1,394 @@
+import asyncio
+import fcntl
+import json
+import os
+import threading
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+from uuid import UUID
+import numpy as np
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, func
+
+from app.core.config import settings
+from app.models.content import Content, ContentType
+
+# Content type codes stored per row; TOMBSTONE marks deleted or replaced rows
+TYPE_CODES = {t.value: i for i, t in enumerate(ContentType)}
+TOMBSTONE = 255
+
+# Search results are (cosine_distance, content_id), the personalized keyset key
+VectorHit = Tuple[float, UUID]
+
+
+def normalize(vector: Sequence[float]) -> np.ndarray:
+    """Float32, L2-normalized copy of a vector, so cosine similarity is a dot product."""
+    arr = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(arr)
+    return arr / norm if norm else arr
+
+
+class VectorBackend(ABC):
+    """
+    Nearest-neighbour search served from the API process.
+    
+    Scans and writes are blocking, so the async methods run them in a
+    worker thread rather than on the event loop.
+    """
+    
+    @property
+    @abstractmethod
+    def enabled(self) -> bool:
+        ...
+    
+    @abstractmethod
+    async def open_or_build(self, db: AsyncSession) -> None:
+        """Load the index, bringing it up to date with the database."""
+    
+    @abstractmethod
+    async def search(
+        self,
+        query: Sequence[float],
+        k: int,
+        content_type: Optional[str] = None,
+        after: Optional[VectorHit] = None,
+    ) -> List[VectorHit]:
+        """Top-k hits by cosine distance, ranked strictly after `after`."""
+    
+    @abstractmethod
+    async def search_many(
+        self,
+        queries: Sequence[Sequence[float]],
+        k: int,
+        content_type: Optional[str] = None,
+        after: Optional[VectorHit] = None,
+    ) -> List[List[VectorHit]]:
+        """`search` for several queries in one pass."""
+    
+    @abstractmethod
+    async def add(self, content_id: UUID, content_type: str, embedding: Sequence[float]) -> None:
+        """Insert or replace one content vector."""
+    
+    @abstractmethod
+    async def remove(self, content_id: UUID) -> None:
+        """Drop one content vector."""
+    
+    @abstractmethod
+    def vectors(self, content_ids: Sequence[UUID]) -> np.ndarray:
+        """Stored (normalized) vectors for `content_ids`; zero rows for unknown IDs."""
+
+
+class MemmapVectorBackend(VectorBackend):
+    """
+    Exact top-k over an embedding matrix in memory-mapped files.
+    
+    Files under `path` are shared by every uvicorn worker on the host:
+    a (count, capacity) header, a capacity x dimensions float32 matrix of
+    L2-normalized vectors, 16-byte content IDs and one type code per row.
+    Appends happen under an flock and bump the header count last, so readers
+    in other workers pick new rows up on their next search.
+    
+    On startup the store is reconciled with the database (see `catch_up`),
+    since rows written while no worker was running (seed scripts, deletes)
+    never went through `add`/`remove`.
+    """
+    
+    def __init__(
+        self,
+        path: str = settings.vector_store_path,
+        dimensions: int = settings.embedding_dimensions,
+        block_rows: int = 65536,
+    ):
+        self.path = path
+        self.dimensions = dimensions
+        self.block_rows = block_rows
+        self._header: Optional[np.memmap] = None
+        self._vectors: Optional[np.memmap] = None
+        self._ids: Optional[np.memmap] = None
+        self._types: Optional[np.memmap] = None
+        self._mapped_capacity = 0
+        self._row_by_id: Dict[UUID, int] = {}
+        self._indexed = 0
+        # Guards the in-process row index; scans and writes run in worker threads
+        self._sync_lock = threading.Lock()
+    
+    @property
+    def enabled(self) -> bool:
+        return settings.vector_backend == "memmap" and self._header is not None
+    
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+    
+    @contextmanager
+    def _locked(self):
+        os.makedirs(self.path, exist_ok=True)
+        with open(self._file("lock"), "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+    
+    def _map(self) -> None:
+        capacity = int(self._header[1])
+        self._vectors = np.memmap(
+            self._file("vectors.f32"), dtype=np.float32, mode="r+",
+            shape=(capacity, self.dimensions),
+        )
+        self._ids = np.memmap(self._file("ids.u8"), dtype=np.uint8, mode="r+", shape=(capacity, 16))
+        self._types = np.memmap(self._file("types.u8"), dtype=np.uint8, mode="r+", shape=(capacity,))
+        self._mapped_capacity = capacity
+    
+    def _resize(self, capacity: int) -> None:
+        for name, row_bytes in (
+            ("vectors.f32", self.dimensions * 4),
+            ("ids.u8", 16),
+            ("types.u8", 1),
+        ):
+            with open(self._file(name), "ab") as f:
+                f.truncate(capacity * row_bytes)
+        self._header[1] = capacity
+        self._map()
+    
+    def _sync(self) -> int:
+        """Remap after growth and index rows appended by other workers."""
+        with self._sync_lock:
+            if int(self._header[1]) != self._mapped_capacity:
+                self._map()
+            count = int(self._header[0])
+            for row in range(self._indexed, count):
+                content_id = UUID(bytes=self._ids[row].tobytes())
+                if self._types[row] == TOMBSTONE:
+                    self._row_by_id.pop(content_id, None)
+                else:
+                    self._row_by_id[content_id] = row
+            self._indexed = max(self._indexed, count)
+            return count
+    
+    async def open_or_build(self, db: AsyncSession) -> None:
+        """Map the shared store, building it from the database if it does not exist yet."""
+        with self._locked():
+            header_path = self._file("header.i64")
+            if not os.path.exists(header_path):
+                # Build under a temporary header so a failed build is retried
+                await self._build(db, header_path + ".tmp")
+                self._header.flush()
+                os.replace(header_path + ".tmp", header_path)
+            self._header = np.memmap(header_path, dtype=np.int64, mode="r+", shape=(2,))
+            self._map()
+            self._sync()
+        await self.catch_up(db)
+    
+    async def catch_up(self, db: AsyncSession) -> None:
+        """
+        Reconcile the store with the database.
+        
+        Compares the number of live rows and the newest `created_at` synced
+        (kept in `sync.json`) with the database. Newer rows are appended;
+        if the counts still differ (deletes, embeddings filled in later),
+        every ID is compared and missing rows appended, stale ones tombstoned.
+        """
+        stats = await db.execute(
+            select(func.count(), func.max(Content.created_at)).where(Content.embedding.isnot(None))
+        )
+        db_count, db_latest = stats.one()
+        state = self._read_state()
+        synced = datetime.fromisoformat(state["latest"]) if state.get("latest") else None
+        
+        if db_latest is not None and (synced is None or db_latest > synced):
+            query = select(Content.id, Content.content_type, Content.embedding).where(
+                Content.embedding.isnot(None)
+            )
+            if synced is not None:
+                query = query.where(Content.created_at > synced)
+            await self._append_missing(db, query)
+        
+        self._sync()
+        if len(self._row_by_id) != db_count:
+            result = await db.execute(select(Content.id).where(Content.embedding.isnot(None)))
+            wanted = set(result.scalars().all())
+            stale = [cid for cid in list(self._row_by_id) if cid not in wanted]
+            if stale:
+                await asyncio.to_thread(self._remove_many, stale)
+            missing = [cid for cid in wanted if cid not in self._row_by_id]
+            for start in range(0, len(missing), 1000):
+                await self._append_missing(
+                    db,
+                    select(Content.id, Content.content_type, Content.embedding)
+                    .where(Content.id.in_(missing[start:start + 1000])),
+                )
+        
+        self._write_state({"latest": db_latest.isoformat() if db_latest else None})
+    
+    async def _append_missing(self, db: AsyncSession, query) -> None:
+        """Append the rows of `query` this store does not hold yet."""
+        result = await db.stream(query.execution_options(yield_per=1000))
+        async for batch in result.partitions(1000):
+            rows = [
+                (content_id, content_type.value, embedding)
+                for content_id, content_type, embedding in batch
+                if content_id not in self._row_by_id
+            ]
+            if rows:
+                await asyncio.to_thread(self._append_many, rows)
+    
+    def _read_state(self) -> dict:
+        try:
+            with open(self._file("sync.json")) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+    
+    def _write_state(self, state: dict) -> None:
+        with self._locked():
+            with open(self._file("sync.json.tmp"), "w") as f:
+                json.dump(state, f)
+            os.replace(self._file("sync.json.tmp"), self._file("sync.json"))
+    
+    async def _build(self, db: AsyncSession, header_path: str) -> None:
+        total = (await db.execute(
+            select(func.count()).select_from(Content).where(Content.embedding.isnot(None))
+        )).scalar() or 0
+        
+        self._header = np.memmap(header_path, dtype=np.int64, mode="w+", shape=(2,))
+        self._header[:] = (0, 0)
+        self._resize(max(1024, int(total * 1.25)))
+        
+        result = await db.stream(
+            select(Content.id, Content.content_type, Content.embedding)
+            .where(Content.embedding.isnot(None))
+            .execution_options(yield_per=1000)
+        )
+        count = 0
+        async for content_id, content_type, embedding in result:
+            if count >= self._mapped_capacity:
+                self._resize(count * 2)
+            self._write_row(count, content_id, content_type.value, embedding)
+            count += 1
+        self._header[0] = count
+    
+    def _write_row(self, row: int, content_id: UUID, content_type: str, embedding) -> None:
+        self._vectors[row] = normalize(embedding)
+        self._ids[row] = np.frombuffer(content_id.bytes, dtype=np.uint8)
+        self._types[row] = TYPE_CODES[content_type]
+    
+    async def add(self, content_id: UUID, content_type: str, embedding: Sequence[float]) -> None:
+        """Append (or replace) one content vector."""
+        await asyncio.to_thread(self._append_many, [(content_id, content_type, embedding)])
+    
+    async def remove(self, content_id: UUID) -> None:
+        await asyncio.to_thread(self._remove_many, [content_id])
+    
+    def _append_many(self, rows: Iterable[Tuple[UUID, str, Sequence[float]]]) -> None:
+        rows = list(rows)
+        with self._locked():
+            count = self._sync()
+            for content_id, _, _ in rows:
+                previous = self._row_by_id.get(content_id)
+                if previous is not None:
+                    self._types[previous] = TOMBSTONE
+            if count + len(rows) > self._mapped_capacity:
+                self._resize(max(count * 2, count + len(rows)))
+            for offset, (content_id, content_type, embedding) in enumerate(rows):
+                self._write_row(count + offset, content_id, content_type, embedding)
+            # Publish the rows only once they are fully written
+            self._header[0] = count + len(rows)
+            self._sync()
+    
+    def _remove_many(self, content_ids: Iterable[UUID]) -> None:
+        with self._locked():
+            self._sync()
+            with self._sync_lock:
+                for content_id in content_ids:
+                    row = self._row_by_id.pop(content_id, None)
+                    if row is not None:
+                        self._types[row] = TOMBSTONE
+    
+    def vectors(self, content_ids: Sequence[UUID]) -> np.ndarray:
+        self._sync()
+        matrix = np.zeros((len(content_ids), self.dimensions), dtype=np.float32)
+        for i, content_id in enumerate(content_ids):
+            row = self._row_by_id.get(content_id)
+            if row is not None:
+                matrix[i] = self._vectors[row]
+        return matrix
+    
+    async def search(
+        self,
+        query: Sequence[float],
+        k: int,
+        content_type: Optional[str] = None,
+        after: Optional[VectorHit] = None,
+    ) -> List[VectorHit]:
+        return (await self.search_many([query], k, content_type=content_type, after=after))[0]
+    
+    async def search_many(
+        self,
+        queries: Sequence[Sequence[float]],
+        k: int,
+        content_type: Optional[str] = None,
+        after: Optional[VectorHit] = None,
+    ) -> List[List[VectorHit]]:
+        return await asyncio.to_thread(self._search_many, queries, k, content_type, after)
+    
+    def _search_many(
+        self,
+        queries: Sequence[Sequence[float]],
+        k: int,
+        content_type: Optional[str] = None,
+        after: Optional[VectorHit] = None,
+    ) -> List[List[VectorHit]]:
+        """
+        Batched top-k: one pass over the matrix scores every query.
+        
+        Each block keeps its best k (plus ties at the cursor distance and at
+        the k-th distance) by partitioning, so memory stays bounded by the
+        block size.
+        """
+        count = self._sync()
+        if count == 0 or k <= 0:
+            return [[] for _ in queries]
+        
+        q = np.stack([normalize(v) for v in queries])
+        code = TYPE_CODES[content_type] if content_type else None
+        candidates: List[List[np.ndarray]] = [[] for _ in queries]
+        
+        for start in range(0, count, self.block_rows):
+            stop = min(start + self.block_rows, count)
+            types = self._types[start:stop]
+            valid = types != TOMBSTONE if code is None else types == code
+            distances = 1.0 - q @ self._vectors[start:stop].T
+            
+            for i, row_distances in enumerate(distances):
+                mask = valid
+                if after is not None:
+                    mask = mask & (row_distances >= after[0])
+                idx = np.flatnonzero(mask)
+                keep = k
+                if after is not None:
+                    # Rows tied with the cursor may be filtered out below
+                    keep += int(np.count_nonzero(row_distances[idx] == after[0]))
+                if len(idx) > keep:
+                    # Keep every row tied with the k-th distance: the (distance, id)
+                    # order below needs the smallest IDs, which argpartition may drop
+                    block = row_distances[idx]
+                    idx = idx[block <= np.partition(block, keep - 1)[keep - 1]]
+                candidates[i].append(np.stack([idx + start, row_distances[idx]], axis=1))
+        
+        results = []
+        for i, blocks in enumerate(candidates):
+            merged = np.concatenate(blocks) if blocks else np.empty((0, 2))
+            hits = [
+                (float(np.float32(d)), UUID(bytes=self._ids[int(row)].tobytes()))
+                for row, d in merged
+            ]
+            if after is not None:
+                hits = [hit for hit in hits if hit > after]
+            hits.sort()
+            results.append(hits[:k])
+        return results
+
+
+vector_backend = MemmapVectorBackend()
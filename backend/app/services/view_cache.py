@@ -0,0 +1,127 @@
+import time
+from collections import OrderedDict
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+import orjson
+
+from app.core.config import settings
+from app.schemas.content import ContentAgentView, FeedItem, FeedResponse
+
+# relevance_score depends on the query and similar_content_ids changes as
+# content is added, so they are spliced in rather than cached
+PER_REQUEST_FIELDS = {"relevance_score", "similar_content_ids"}
+
+
+class AgentViewCache:
+    """
+    Serialized ContentAgentView JSON per content ID and field projection.
+    
+    An LRU bounded by total bytes. Entries record the row version
+    (`updated_at`) they were encoded from and only hit for a view built
+    from that same version, so a hit is never older than the row the
+    caller just loaded, including after updates made by other workers.
+    Views without a version fall back to a TTL; `invalidate` drops an
+    item's entries immediately.
+    """
+    
+    def __init__(
+        self,
+        max_bytes: int = settings.view_cache_max_bytes,
+        ttl_seconds: float = settings.view_cache_ttl_seconds,
+    ):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, Dict[FrozenSet[str], Tuple[float, Any, bytes]]]" = OrderedDict()
+    
+    def fragment(self, view: ContentAgentView) -> bytes:
+        """JSON for a view (without per-request fields), from cache or freshly encoded."""
+        fields = frozenset(view.model_fields_set - PER_REQUEST_FIELDS)
+        version = view._version
+        entries = self._entries.get(view.id)
+        if entries is not None:
+            entry = entries.get(fields)
+            if entry is not None and (
+                entry[1] == version if version is not None
+                else time.monotonic() - entry[0] <= self.ttl_seconds
+            ):
+                self._entries.move_to_end(view.id)
+                self.hits += 1
+                return entry[2]
+        
+        self.misses += 1
+        data = orjson.dumps({name: getattr(view, name) for name in view.model_fields if name in fields})
+        self._put(view.id, fields, version, data)
+        return data
+    
+    def _put(self, content_id: str, fields: FrozenSet[str], version: Any, data: bytes) -> None:
+        if len(data) > self.max_bytes:
+            return
+        entries = self._entries.setdefault(content_id, {})
+        previous = entries.get(fields)
+        if previous is not None:
+            self.size -= len(previous[2])
+        entries[fields] = (time.monotonic(), version, data)
+        self.size += len(data)
+        self._entries.move_to_end(content_id)
+        while self.size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.size -= sum(len(d) for _, _, d in evicted.values())
+    
+    def invalidate(self, content_id) -> None:
+        entries = self._entries.pop(str(content_id), None)
+        if entries:
+            self.size -= sum(len(d) for _, _, d in entries.values())
+    
+    def render(self, view: ContentAgentView) -> bytes:
+        """Full view JSON: the cached fragment plus any per-request fields."""
+        data = self.fragment(view)
+        extra = [
+            b'"%s":%s' % (name.encode(), orjson.dumps(getattr(view, name)))
+            for name in PER_REQUEST_FIELDS
+            if name in view.model_fields_set
+        ]
+        if not extra:
+            return data
+        return data[:-1] + b"," + b",".join(extra) + b"}"
+
+
+view_cache = AgentViewCache()
+
+
+def _join(parts: Iterable[bytes]) -> bytes:
+    return b"[" + b",".join(parts) + b"]"
+
+
+def render_feed_item(item: FeedItem) -> bytes:
+    return b'{"content":%s,"position":%d,"feed_context":%s}' % (
+        view_cache.render(item.content),
+        item.position,
+        orjson.dumps(item.feed_context),
+    )
+
+
+def render_feed(feed: FeedResponse) -> bytes:
+    """FeedResponse JSON stitched from cached item views."""
+    return b'{"items":%s,"next_cursor":%s,"total_available":%d,"feed_id":%s}' % (
+        _join(render_feed_item(item) for item in feed.items),
+        orjson.dumps(feed.next_cursor),
+        feed.total_available,
+        orjson.dumps(feed.feed_id),
+    )
+
+
+def render_views(views: List[ContentAgentView]) -> bytes:
+    return _join(view_cache.render(view) for view in views)
+
+
+def render_search_results(results: List[Tuple[ContentAgentView, Optional[float]]]) -> bytes:
+    return _join(
+        b'{"content":%s,"relevance_score":%s}' % (
+            view_cache.render(view),
+            orjson.dumps(float(score) if score is not None else None),
+        )
+        for view, score in results
+    )
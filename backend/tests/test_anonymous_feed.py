@@ -0,0 +1,81 @@
+import time
+
+import orjson
+
+from app.core.cursor import decode_cursor, encode_cursor
+from app.services.anonymous_feed import ANON_FEED, AnonymousFeedCache, AnonymousSnapshot
+from app.services.feed_sessions import feed_sessions
+
+
+def snapshot(prefix: str, n: int, tail_cursor=None) -> AnonymousSnapshot:
+    ids = [f"{prefix}{i}" for i in range(n)]
+    return AnonymousSnapshot(
+        [orjson.dumps({"content": {"id": i}}) for i in ids], ids, tail_cursor, n, f"feed-{prefix}"
+    )
+
+
+def read(page):
+    body, etag = page
+    data = orjson.loads(body)
+    return [entry["content"]["id"] for entry in data["items"]], data["next_cursor"], etag
+
+
+def rebuild(cache: AnonymousFeedCache, new: AnonymousSnapshot) -> None:
+    """What the refresh worker does when a new build replaces a snapshot."""
+    old = cache._snapshots[(ANON_FEED, None)]
+    old.retired_at = time.monotonic()
+    cache._retired[old.version] = old
+    cache._snapshots[(ANON_FEED, None)] = new
+
+
+def test_missing_snapshot_is_served_live():
+    cache = AnonymousFeedCache(window=10)
+    assert cache.page(ANON_FEED, None, None, 5) is None
+
+
+def test_paging_across_a_rebuild_stays_on_the_issuing_snapshot():
+    cache = AnonymousFeedCache(window=10, refresh_seconds=60)
+    cache._snapshots[(ANON_FEED, None)] = snapshot("a", 6)
+    
+    first, cursor, _ = read(cache.page(ANON_FEED, None, None, 2))
+    assert first == ["a0", "a1"]
+    
+    rebuild(cache, snapshot("b", 6))
+    second, cursor, _ = read(cache.page(ANON_FEED, None, cursor, 2))
+    assert second == ["a2", "a3"]
+    
+    fresh, _, _ = read(cache.page(ANON_FEED, None, None, 2))
+    assert fresh == ["b0", "b1"]
+
+
+def test_cursor_from_an_expired_snapshot_is_served_live():
+    cache = AnonymousFeedCache(window=10, refresh_seconds=60)
+    cache._snapshots[(ANON_FEED, None)] = snapshot("a", 6)
+    _, cursor, _ = read(cache.page(ANON_FEED, None, None, 2))
+    
+    rebuild(cache, snapshot("b", 6))
+    cache._retired[decode_cursor(cursor)["v"][0]].retired_at -= 120
+    assert cache.page(ANON_FEED, None, cursor, 2) is None
+
+
+def test_cursor_for_another_feed_is_served_live():
+    cache = AnonymousFeedCache(window=10)
+    cache._snapshots[(ANON_FEED, None)] = snapshot("a", 6)
+    cache._snapshots[(ANON_FEED, "short")] = snapshot("s", 6)
+    _, cursor, _ = read(cache.page(ANON_FEED, "short", None, 2))
+    assert cache.page(ANON_FEED, None, cursor, 2) is None
+
+
+def test_tail_cursor_forks_a_session_seeded_with_the_window():
+    tail = encode_cursor("blend", [], 3, c={"trending": "x"}, f="shared")
+    cache = AnonymousFeedCache(window=3)
+    cache._snapshots[(ANON_FEED, None)] = snapshot("a", 3, tail_cursor=tail)
+    
+    items, cursor, _ = read(cache.page(ANON_FEED, None, None, 5))
+    _, other, _ = read(cache.page(ANON_FEED, None, None, 5))
+    assert items == ["a0", "a1", "a2"]
+    
+    state = decode_cursor(cursor, "blend")
+    assert state["f"] not in ("shared", decode_cursor(other)["f"])
+    assert state["c"] == {"trending": "x"}
+    assert feed_sessions.served(state["f"]) == {"a0", "a1", "a2"}
@@ -0,0 +1,60 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from app.services import chunking
+from app.services.embedding_service import EmbeddingService
+
+
+@pytest.fixture(autouse=True)
+def character_tokenizer(monkeypatch):
+    # Count tokens by characters, so tests don't depend on downloading BPE files
+    monkeypatch.setattr(chunking, "get_encoding", lambda model: None)
+
+
+class FakeProvider:
+    name = "fake"
+    model = "fake-model"
+    remote = False
+    
+    def __init__(self):
+        self.calls = []
+    
+    async def embed(self, texts):
+        self.calls.append(list(texts))
+        # A direction per text: its length and its first character
+        return [[float(len(text)), float(ord(text[0]))] for text in texts]
+
+
+def test_chunk_text_overlaps_and_samples_evenly():
+    text = "".join(chr(ord("a") + i % 26) for i in range(400))
+    chunks = chunking.chunk_text(text, "m", chunk_tokens=20, overlap=5, max_chunks=100)
+    assert chunks[0][0] == text[:80]
+    assert chunks[1][0].startswith(text[60:80])
+    assert "".join(chunk[20:] if i else chunk for i, (chunk, _) in enumerate(chunks)) == text
+    
+    sampled = chunking.chunk_text(text, "m", chunk_tokens=20, overlap=5, max_chunks=3)
+    assert [chunk for chunk, _ in sampled] == [chunks[0][0], chunks[len(chunks) // 2][0], chunks[-1][0]]
+
+
+def test_document_embedding_pools_chunks_by_token_count():
+    provider = FakeProvider()
+    service = EmbeddingService(provider)
+    text = "x" * 5000 + "y" * 3000
+    
+    pooled = asyncio.run(service.generate_document_embedding(text))
+    
+    chunks = chunking.chunk_text(text, service.model)
+    assert len(chunks) > 1
+    vectors = np.array([[len(chunk), ord(chunk[0])] for chunk, _ in chunks], dtype=np.float32)
+    expected = np.average(vectors, axis=0, weights=[tokens for _, tokens in chunks])
+    assert np.allclose(pooled, expected / np.linalg.norm(expected), atol=1e-6)
+    assert provider.calls == [[chunk for chunk, _ in chunks]]
+
+
+def test_short_document_is_embedded_whole():
+    provider = FakeProvider()
+    service = EmbeddingService(provider)
+    assert asyncio.run(service.generate_document_embedding("hello")) == [5.0, float(ord("h"))]
+    assert asyncio.run(service.generate_document_embedding("")) is None
@@ -0,0 +1,128 @@
+import asyncio
+from uuid import uuid4
+
+from sqlalchemy import select
+
+from app.models.content import Content
+from app.services.consumed_cache import BloomFilter, ConsumedSet
+from app.services.feed_service import FeedService
+
+
+class FakeResult:
+    def __init__(self, rows):
+        self._rows = rows
+    
+    def all(self):
+        return self._rows
+
+
+class FakeSession:
+    """Answers each query with the next batch of rows."""
+    
+    def __init__(self, batches):
+        self.batches = list(batches)
+        self.queries = 0
+    
+    async def execute(self, query):
+        self.queries += 1
+        return FakeResult(self.batches.pop(0) if self.batches else [])
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(1000, 0.01)
+    items = [uuid4() for _ in range(1000)]
+    added = sum(bloom.add(item) for item in items)
+    assert added > 950  # add() reports a false positive as already present
+    assert all(item in bloom for item in items)
+    assert not bloom.add(items[0])
+
+
+def test_bloom_filter_false_positive_rate():
+    bloom = BloomFilter(1000, 0.01)
+    for _ in range(1000):
+        bloom.add(uuid4())
+    false_positives = sum(uuid4() in bloom for _ in range(20000))
+    assert false_positives / 20000 < 0.03
+
+
+def test_consumed_set_counts_distinct_items_per_type():
+    consumed = ConsumedSet(capacity=2, error_rate=0.01)
+    first, second, third = uuid4(), uuid4(), uuid4()
+    consumed.add(first, "video")
+    consumed.add(first, "video")
+    consumed.add(second, "short")
+    
+    assert consumed.count_for() == 2
+    assert consumed.count_for("video") == 1
+    assert not consumed.saturated
+    consumed.add(third, "short")
+    assert consumed.saturated
+
+
+def test_seek_skips_consumed_rows_and_continues():
+    ids = [uuid4() for _ in range(8)]
+    consumed = ConsumedSet(capacity=100, error_rate=0.001)
+    for content_id in ids[:5]:
+        consumed.add(content_id)
+    
+    rows = [(content_id, 100 - i) for i, content_id in enumerate(ids)]
+    # limit 2 over-fetches 2 x SKIP_OVERFETCH rows per round
+    session = FakeSession([rows[:4], rows[4:]])
+    service = FeedService(session)
+    query = select(Content.id, Content.agent_consumption_count)
+    
+    found, key, has_more = asyncio.run(service._seek(
+        query, [Content.agent_consumption_count, Content.id], None, True, 2, skip=consumed
+    ))
+    
+    assert [content_id for content_id, _ in found] == ids[5:7]
+    assert key == (94, ids[6])
+    assert has_more
+
+
+def test_seek_reports_exhaustion():
+    ids = [uuid4() for _ in range(3)]
+    consumed = ConsumedSet(capacity=100, error_rate=0.001)
+    consumed.add(ids[1])
+    session = FakeSession([[(content_id, i) for i, content_id in enumerate(ids)]])
+    query = select(Content.id, Content.created_at)
+    
+    found, key, has_more = asyncio.run(FeedService(session)._seek(
+        query, [Content.created_at, Content.id], None, True, 5, skip=consumed
+    ))
+    
+    assert [content_id for content_id, _ in found] == [ids[0], ids[2]]
+    assert key == (2, ids[2])
+    assert not has_more
+
+
+def test_confirm_serves_bloom_false_positives():
+    agent_id = uuid4()
+    consumed = ConsumedSet(capacity=100, error_rate=0.001, agent_id=agent_id)
+    seen, unseen = uuid4(), uuid4()
+    consumed.add(seen)
+    consumed.bloom.add(unseen)  # Stands in for a false positive
+    
+    class Scalars:
+        def all(self):
+            return [seen]
+    
+    class Result:
+        def scalars(self):
+            return Scalars()
+    
+    class Session:
+        queries = 0
+        
+        async def execute(self, query):
+            Session.queries += 1
+            return Result()
+    
+    assert unseen in consumed
+    asyncio.run(consumed.confirm(Session(), [seen, unseen]))
+    assert seen in consumed
+    assert unseen not in consumed
+    asyncio.run(consumed.confirm(Session(), [seen, unseen]))
+    assert Session.queries == 1
+    consumed.add(unseen)
+    assert unseen in consumed
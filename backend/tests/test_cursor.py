@@ -0,0 +1,53 @@
+import base64
+import json
+from datetime import datetime
+from uuid import uuid4
+
+from app.core.cursor import decode_cursor, encode_cursor, parse_key
+
+
+def test_round_trip():
+    content_id = uuid4()
+    cursor = encode_cursor("feed", [0.25, content_id], 10, s="personalized", f="abc")
+    
+    state = decode_cursor(cursor, "feed")
+    assert state["p"] == 10
+    assert state["s"] == "personalized"
+    assert state["f"] == "abc"
+    assert parse_key(state["v"], float, type(content_id)) == (0.25, content_id)
+
+
+def test_datetime_keys():
+    now = datetime(2024, 1, 2, 3, 4, 5)
+    content_id = uuid4()
+    state = decode_cursor(encode_cursor("feed", [now, content_id], 0))
+    assert parse_key(state["v"], datetime, type(content_id)) == (now, content_id)
+
+
+def test_tampered_payload_is_rejected():
+    cursor = encode_cursor("feed", [1, str(uuid4())], 5)
+    body, signature = cursor.rsplit(".", 1)
+    payload = json.loads(base64.urlsafe_b64decode(body + "=" * (-len(body) % 4)))
+    payload["p"] = 5000
+    forged = base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip("=")
+    
+    assert decode_cursor(f"{forged}.{signature}") is None
+
+
+def test_tampered_signature_is_rejected():
+    cursor = encode_cursor("feed", [], 1)
+    assert decode_cursor(cursor[:-1] + ("B" if cursor.endswith("A") else "A")) is None
+
+
+def test_garbage_and_foreign_kinds():
+    assert decode_cursor(None) is None
+    assert decode_cursor("") is None
+    assert decode_cursor("no-signature") is None
+    assert decode_cursor("!!!.???") is None
+    assert decode_cursor(encode_cursor("trending", [], 0), "feed") is None
+
+
+def test_parse_key_rejects_bad_values():
+    assert parse_key(None, float) is None
+    assert parse_key([1.0], float, float) is None
+    assert parse_key(["x", "not-a-uuid"], float, type(uuid4())) is None
@@ -0,0 +1,28 @@
+import numpy as np
+
+from app.services.diversity import mmr_select, parse_mmr_lambda
+
+
+def test_pure_relevance_keeps_order():
+    vectors = np.eye(4, dtype=np.float32)
+    assert mmr_select([0.9, 0.8, 0.7, 0.6], vectors, 4, 1.0) == [0, 1, 2, 3]
+
+
+def test_near_duplicates_are_pushed_down():
+    # 0 and 1 are the same direction; 2 is orthogonal but slightly less relevant
+    vectors = np.array([[1, 0], [1, 0.01], [0, 1]], dtype=np.float32)
+    assert mmr_select([1.0, 0.99, 0.9], vectors, 2, 0.5) == [0, 2]
+
+
+def test_k_is_capped_and_picks_are_unique():
+    vectors = np.random.default_rng(0).normal(size=(5, 8))
+    picked = mmr_select(np.linspace(1, 0, 5), vectors, 10, 0.3)
+    assert sorted(picked) == [0, 1, 2, 3, 4]
+    assert mmr_select([], np.zeros((0, 8)), 3, 0.5) == []
+
+
+def test_parse_mmr_lambda():
+    assert parse_mmr_lambda(None, 1.0) is None
+    assert parse_mmr_lambda(None, 0.7) == 0.7
+    assert parse_mmr_lambda(0.2, 1.0) == 0.2
+    assert parse_mmr_lambda(1.0, 0.5) is None
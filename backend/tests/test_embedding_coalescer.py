@@ -0,0 +1,47 @@
+import asyncio
+
+from app.services.embedding_service import EmbeddingCoalescer
+
+
+def test_coalescer_batches_concurrent_calls_and_dedups():
+    sent = []
+    
+    async def send(texts):
+        sent.append(list(texts))
+        return [[float(len(text))] for text in texts]
+    
+    async def main():
+        coalescer = EmbeddingCoalescer(send, window_seconds=0.01, max_batch=10)
+        return await asyncio.gather(*(coalescer.embed(t) for t in ["a", "bb", "a", "ccc"])), coalescer
+    
+    vectors, coalescer = asyncio.run(main())
+    assert vectors == [[1.0], [2.0], [1.0], [3.0]]
+    assert sent == [["a", "bb", "ccc"]]
+    assert coalescer.stats()["batches"] == 1
+
+
+def test_coalescer_flushes_at_max_batch():
+    sent = []
+    
+    async def send(texts):
+        sent.append(list(texts))
+        return [[0.0] for _ in texts]
+    
+    async def main():
+        coalescer = EmbeddingCoalescer(send, window_seconds=10, max_batch=2)
+        await asyncio.gather(coalescer.embed("a"), coalescer.embed("b"))
+    
+    asyncio.run(asyncio.wait_for(main(), 1))
+    assert sent == [["a", "b"]]
+
+
+def test_coalescer_fails_every_caller_in_a_failed_batch():
+    async def send(texts):
+        raise RuntimeError("boom")
+    
+    async def main():
+        coalescer = EmbeddingCoalescer(send, window_seconds=0.01)
+        return await asyncio.gather(coalescer.embed("a"), coalescer.embed("b"), return_exceptions=True)
+    
+    results = asyncio.run(main())
+    assert all(isinstance(result, RuntimeError) for result in results)
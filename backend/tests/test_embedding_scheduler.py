@@ -0,0 +1,106 @@
+import asyncio
+
+import pytest
+
+from app.services import chunking
+from app.services.embedding_scheduler import BACKGROUND, INTERACTIVE, EmbeddingScheduler
+
+
+@pytest.fixture(autouse=True)
+def character_tokenizer(monkeypatch):
+    monkeypatch.setattr(chunking, "get_encoding", lambda model: None)
+
+
+class RateLimited(Exception):
+    status_code = 429
+
+
+def scheduler(send, **kwargs):
+    options = dict(
+        requests_per_minute=0, tokens_per_minute=0, max_concurrency=1,
+        max_batch_inputs=1, retry_base_seconds=0.001, retry_max_seconds=0.01,
+    )
+    options.update(kwargs)
+    return EmbeddingScheduler(send, "m", **options)
+
+
+def test_batches_are_split_and_results_kept_in_order():
+    sent = []
+    
+    async def send(texts):
+        sent.append(list(texts))
+        return [[float(len(t))] for t in texts]
+    
+    async def main():
+        return await scheduler(send, max_batch_inputs=2).submit(["a", "bb", "ccc"])
+    
+    assert asyncio.run(main()) == [[1.0], [2.0], [3.0]]
+    assert sent == [["a", "bb"], ["ccc"]]
+
+
+def test_retryable_errors_are_retried():
+    attempts = []
+    
+    async def send(texts):
+        attempts.append(texts[0])
+        if len(attempts) < 3:
+            raise RateLimited()
+        return [[1.0]]
+    
+    async def main():
+        s = scheduler(send)
+        return await s.submit(["a"]), s.stats()
+    
+    result, stats = asyncio.run(main())
+    assert result == [[1.0]]
+    assert stats["retries"] == 2
+    assert stats["failures"] == 0
+
+
+def test_failures_only_affect_their_own_batch():
+    async def send(texts):
+        if texts == ["bad"]:
+            raise ValueError("rejected")
+        return [[0.0]]
+    
+    async def main():
+        s = scheduler(send)
+        return await s.submit(["ok", "bad", "ok2"]), s.stats()
+    
+    result, stats = asyncio.run(main())
+    assert result == [[0.0], None, [0.0]]
+    assert stats["retries"] == 0
+    assert stats["failures"] == 1
+
+
+def test_interactive_work_overtakes_rate_limited_backfill():
+    order = []
+    
+    async def send(texts):
+        order.append(texts[0])
+        return [[0.0]]
+    
+    async def main():
+        s = scheduler(send, requests_per_minute=600)  # one request every 0.1s
+        s._requests.level = 1
+        backfill = asyncio.create_task(s.submit(["b1", "b2", "b3"], BACKGROUND))
+        await asyncio.sleep(0.03)
+        await s.submit(["i1"], INTERACTIVE)
+        await backfill
+    
+    asyncio.run(main())
+    assert order == ["b1", "i1", "b2", "b3"]
+
+
+def test_stop_fails_queued_work():
+    async def send(texts):
+        await asyncio.sleep(10)
+    
+    async def main():
+        s = scheduler(send)
+        pending = asyncio.create_task(s.submit(["a", "b"]))
+        await asyncio.sleep(0.01)
+        await s.stop()
+        return await asyncio.wait_for(pending, 1)
+    
+    assert asyncio.run(main()) == [None, None]
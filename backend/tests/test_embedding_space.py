@@ -0,0 +1,26 @@
+import asyncio
+
+from app.services.embedding_service import EmbeddingService
+
+
+class FakeProvider:
+    name = "fake"
+    model = "fake-model"
+    remote = False
+    
+    def __init__(self):
+        self.calls = []
+    
+    async def embed(self, texts):
+        self.calls.append(list(texts))
+        # A direction per text: its length and its first character
+        return [[float(len(text)), float(ord(text[0]))] for text in texts]
+
+
+def test_mismatched_embedding_space_is_refused():
+    provider = FakeProvider()
+    service = EmbeddingService(provider)
+    service.mismatch = "openai/text-embedding-3-small/1536"
+    assert asyncio.run(service.generate_embedding("hello")) is None
+    assert asyncio.run(service.generate_embeddings_batch(["a", "b"])) == [None, None]
+    assert provider.calls == []
@@ -0,0 +1,98 @@
+import asyncio
+
+import pytest
+
+from app.schemas.content import ContentAgentView, FeedItem, FeedResponse
+from app.services.feed_blender import allocate_quotas, interleave, parse_blend_ratios
+from app.services.feed_service import FeedService
+
+
+def item(content_id: str) -> FeedItem:
+    return FeedItem(content=ContentAgentView(id=content_id), position=0)
+
+
+def test_parse_blend_ratios():
+    assert parse_blend_ratios("trending:1, personalized:3,bogus:2,discover:-1,discover:x") == {
+        "personalized": 3.0,
+        "trending": 1.0,
+    }
+    assert parse_blend_ratios("") == {}
+
+
+def test_allocate_quotas_uses_largest_remainder():
+    quotas = allocate_quotas(10, {"personalized": 0.6, "trending": 0.25, "discover": 0.15})
+    assert quotas == {"personalized": 6, "trending": 3, "discover": 1}
+    assert sum(allocate_quotas(7, {"a": 1, "b": 1, "c": 1}).values()) == 7
+    assert allocate_quotas(5, {}) == {}
+
+
+def test_interleave_spreads_sources():
+    pages = {
+        "personalized": [item(f"p{i}") for i in range(4)],
+        "trending": [item(f"t{i}") for i in range(2)],
+    }
+    order = [source[0] for source, _ in interleave(pages)]
+    assert order == ["p", "t", "p", "p", "t", "p"]
+
+
+@pytest.fixture
+def sources(monkeypatch):
+    """Trending and discover sources over fixed ID lists, paged by offset cursors."""
+    pools = {}
+    
+    def paged(name, cursor, n):
+        offset = int(cursor or 0)
+        ids = pools[name][offset:offset + n]
+        end = offset + len(ids)
+        return FeedResponse(
+            items=[item(i) for i in ids],
+            next_cursor=str(end) if end < len(pools[name]) else None,
+            total_available=len(pools[name]),
+            feed_id="source",
+        )
+    
+    async def get_trending(self, cursor, limit, approximate, **kwargs):
+        return paged("trending", cursor, limit)
+    
+    async def get_discover(self, agent_id, cursor, limit, approximate, **kwargs):
+        return paged("discover", cursor, limit)
+    
+    async def attach_similar(self, items):
+        pass
+    
+    monkeypatch.setattr(FeedService, "get_trending", get_trending)
+    monkeypatch.setattr(FeedService, "get_discover", get_discover)
+    monkeypatch.setattr(FeedService, "_attach_similar", attach_similar)
+    return pools
+
+
+def blend(cursor=None, limit=6):
+    return asyncio.run(FeedService(None).get_feed(
+        cursor=cursor, limit=limit, ratios="trending:0.5,discover:0.5"
+    ))
+
+
+def test_blend_dedups_and_tops_up_short_pages(sources):
+    sources["trending"] = [f"t{i}" for i in range(10)]
+    sources["discover"] = ["t0", "t1", "t2", "d0", "d1", "d2"]
+    
+    page = blend()
+    ids = [i.content.id for i in page.items]
+    assert len(ids) == 6
+    assert len(set(ids)) == 6
+    assert [i.position for i in page.items] == list(range(6))
+    
+    following = blend(page.next_cursor)
+    later = [i.content.id for i in following.items]
+    assert not set(ids) & set(later)
+    assert [i.position for i in following.items] == list(range(6, 6 + len(later)))
+
+
+def test_blend_ends_when_every_source_runs_dry(sources):
+    sources["trending"] = ["a", "b", "c"]
+    sources["discover"] = ["b", "c", "d"]
+    
+    page = blend(limit=10)
+    assert sorted(i.content.id for i in page.items) == ["a", "b", "c", "d"]
+    assert page.next_cursor is None
+    assert {i.feed_context["blend_source"] for i in page.items} == {"trending", "discover"}
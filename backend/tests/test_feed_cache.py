@@ -0,0 +1,78 @@
+import asyncio
+from uuid import uuid4
+
+from app.services.feed_cache import FeedPageCache, MemoryPageBackend, page_key
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_page_key_ignores_parameter_order():
+    assert page_key(path="/feed/", query=[("a", "1")]) == page_key(query=[("a", "1")], path="/feed/")
+    assert page_key(path="/feed/", query=[("a", "1")]) != page_key(path="/feed/", query=[("a", "2")])
+
+
+def test_invalidate_drops_only_that_agents_pages():
+    backend = MemoryPageBackend(max_entries=10, ttl_seconds=60)
+    agent, other = uuid4(), uuid4()
+    run(backend.set(agent, "p1", b"one"))
+    run(backend.set(other, "p1", b"two"))
+    
+    run(backend.invalidate(agent))
+    
+    assert run(backend.get(agent, "p1")) is None
+    assert run(backend.get(other, "p1")) == b"two"
+    assert agent not in backend._keys and len(backend._pages) == 1
+
+
+def test_eviction_is_lru_and_drops_empty_agents():
+    backend = MemoryPageBackend(max_entries=2, ttl_seconds=60)
+    first, second = uuid4(), uuid4()
+    run(backend.set(first, "p1", b"a"))
+    run(backend.set(second, "p1", b"b"))
+    run(backend.get(first, "p1"))  # first is now the most recent
+    run(backend.set(second, "p2", b"c"))
+    
+    assert run(backend.get(first, "p1")) == b"a"
+    assert run(backend.get(second, "p1")) is None
+    run(backend.set(uuid4(), "p1", b"d"))  # Evicts second's last page
+    assert second not in backend._keys
+    assert len(backend._pages) == 2 and len(backend._keys) == 2
+
+
+def test_many_agents_stay_bounded():
+    backend = MemoryPageBackend(max_entries=5, ttl_seconds=60)
+    for _ in range(100):
+        agent = uuid4()
+        run(backend.set(agent, "p1", b"x"))
+        run(backend.invalidate(agent))
+        run(backend.set(uuid4(), "p1", b"y"))
+    
+    assert len(backend._pages) == 5 and len(backend._keys) == 5
+
+
+def test_expired_pages_miss():
+    backend = MemoryPageBackend(max_entries=5, ttl_seconds=-1)
+    agent = uuid4()
+    run(backend.set(agent, "p1", b"x"))
+    
+    assert run(backend.get(agent, "p1")) is None
+    assert not backend._keys
+
+
+def test_cache_counts_hits_and_treats_backend_errors_as_misses():
+    class Broken:
+        async def get(self, agent_id, key):
+            raise ConnectionError("down")
+    
+    cache = FeedPageCache(MemoryPageBackend(max_entries=5, ttl_seconds=60))
+    agent = uuid4()
+    run(cache.set(agent, "p1", b"x"))
+    assert run(cache.get(agent, "p1")) == b"x"
+    assert run(cache.get(agent, "p2")) is None
+    assert (cache.hits, cache.misses) == (1, 1)
+    
+    broken = FeedPageCache(Broken())
+    assert run(broken.get(agent, "p1")) is None
+    assert (broken.errors, broken.misses) == (1, 1)
@@ -0,0 +1,89 @@
+from uuid import uuid4
+
+import numpy as np
+
+from app.services.consumed_cache import ConsumedSet
+from app.services.feed_queue import FeedQueueManager
+
+
+def make_manager(entries, complete=False, depth=10, watermark=2):
+    manager = FeedQueueManager(depth=depth, watermark=watermark, max_agents=10, idle_seconds=60)
+    agent_id = uuid4()
+    manager.read(agent_id, None, 1)  # Creates the queue
+    queue = manager._queues[(agent_id, None)]
+    queue.entries = list(entries)
+    queue.tail = entries[-1] if entries else None
+    queue.complete = complete
+    queue.embedding = np.array([1.0, 0.0], dtype=np.float32)
+    return manager, agent_id, queue
+
+
+def ranked(count):
+    return [(i / 10, uuid4()) for i in range(count)]
+
+
+def test_read_seeks_past_cursor_without_consuming():
+    entries = ranked(6)
+    manager, agent_id, _ = make_manager(entries)
+    
+    assert manager.read(agent_id, None, 2) == entries[:2]
+    assert manager.read(agent_id, None, 2, after=entries[1]) == entries[2:4]
+    # A fresh scroll starts from the top again
+    assert manager.read(agent_id, None, 2) == entries[:2]
+
+
+def test_read_goes_live_when_short_and_schedules_refill():
+    entries = ranked(3)
+    manager, agent_id, _ = make_manager(entries)
+    manager._scheduled.clear()
+    
+    assert manager.read(agent_id, None, 2, after=entries[1]) is None
+    assert (agent_id, None) in manager._scheduled
+
+
+def test_read_skips_consumed_and_discard_removes():
+    entries = ranked(4)
+    manager, agent_id, queue = make_manager(entries)
+    consumed = ConsumedSet(capacity=10, error_rate=0.001)
+    consumed.add(entries[0][1])
+    
+    assert manager.read(agent_id, None, 2, skip=consumed) == entries[1:3]
+    manager.discard(agent_id, [entries[1][1]])
+    assert entries[1] not in queue.entries
+
+
+def test_offer_inserts_inside_ranked_prefix_only():
+    entries = ranked(4)  # Distances 0.0 .. 0.3
+    manager, agent_id, queue = make_manager(entries)
+    close, far = uuid4(), uuid4()
+    
+    manager.offer(close, "video", [0.99, 0.141])  # Distance ~0.01
+    manager.offer(far, "video", [0.0, 1.0])  # Distance 1.0, past the tail
+    
+    assert queue.entries[1][1] == close
+    assert far not in [cid for _, cid in queue.entries]
+    assert len(queue.entries) == 5
+
+
+def test_offer_trims_to_depth_and_moves_tail():
+    entries = ranked(3)
+    manager, _, queue = make_manager(entries, complete=True, depth=3)
+    new_id = uuid4()
+    
+    manager.offer(new_id, "video", [0.995, 0.0998])  # Distance ~0.005
+    
+    assert [cid for _, cid in queue.entries] == [entries[0][1], new_id, entries[1][1]]
+    assert queue.tail == queue.entries[-1]
+    assert not queue.complete
+
+
+def test_offer_replaces_reembedded_entry_and_respects_type():
+    entries = ranked(4)
+    manager, agent_id, queue = make_manager(entries)
+    queue_key = (agent_id, "short")
+    manager._queues[queue_key] = manager._queues.pop((agent_id, None))
+    moved = entries[3][1]
+    
+    manager.offer(moved, "video", [1.0, 0.0])
+    
+    assert moved not in [cid for _, cid in queue.entries]
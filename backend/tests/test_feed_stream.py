@@ -0,0 +1,31 @@
+import asyncio
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+
+from app.services import feed_stream
+from app.services.feed_service import FeedService
+
+
+def test_max_items_sizes_last_chunk_and_keeps_its_cursor(monkeypatch):
+    limits = []
+    
+    @asynccontextmanager
+    async def session_maker():
+        yield None
+    
+    async def get_feed(self, cursor=None, limit=10, **kwargs):
+        start = int(cursor or 0)
+        limits.append(limit)
+        return SimpleNamespace(items=list(range(start, start + limit)), next_cursor=str(start + limit))
+    
+    monkeypatch.setattr(feed_stream, "async_session_maker", session_maker)
+    monkeypatch.setattr(FeedService, "get_feed", get_feed)
+    
+    async def collect():
+        return [chunk async for chunk in feed_stream.stream_feed_chunks(None, chunk_size=4, max_items=10)]
+    
+    chunks = asyncio.run(collect())
+    
+    assert limits == [4, 4, 2]
+    assert [item for items, _ in chunks for item in items] == list(range(10))
+    assert chunks[-1][1] == "10"
@@ -0,0 +1,93 @@
+import asyncio
+from uuid import uuid4
+
+from sqlalchemy.sql import Delete, Insert, Select
+
+from app.services import neighbors
+from app.services.neighbors import NeighborService
+
+
+class FakeResult:
+    def __init__(self, rows):
+        self.rows = rows
+    
+    def all(self):
+        return self.rows
+    
+    def scalars(self):
+        return self
+
+
+class FakeSession:
+    """Answers SELECTs with queued row lists and records every statement."""
+    
+    def __init__(self, selects):
+        self.selects = list(selects)
+        self.statements = []
+        self.commits = 0
+    
+    async def execute(self, statement, params=None):
+        self.statements.append((statement, params))
+        if isinstance(statement, Select):
+            return FakeResult(self.selects.pop(0))
+        return FakeResult([])
+    
+    async def commit(self):
+        self.commits += 1
+
+
+def inserted_lists(session):
+    lists = {}
+    for statement, params in session.statements:
+        if isinstance(statement, Insert):
+            for row in sorted(params, key=lambda r: r["rank"]):
+                lists.setdefault(row["content_id"], []).append((row["distance"], row["neighbor_id"]))
+    return lists
+
+
+def service(session, k=2):
+    svc = NeighborService(session)
+    svc.k = k
+    return svc
+
+
+def test_pgvector_recompute_is_one_query_per_batch(monkeypatch):
+    monkeypatch.setattr(neighbors.vector_backend, "_header", None)
+    a, b, c = uuid4(), uuid4(), uuid4()
+    session = FakeSession([[
+        (a, 0.1, b), (a, 0.3, c),
+        (b, 0.1, a), (b, 0.2, c),
+    ]])
+    
+    asyncio.run(service(session)._recompute([(a, None), (b, None), (c, None)]))
+    
+    selects = [s for s, _ in session.statements if isinstance(s, Select)]
+    assert len(selects) == 1
+    assert "LATERAL" in str(selects[0])
+    assert any(isinstance(s, Delete) for s, _ in session.statements)
+    assert inserted_lists(session) == {a: [(0.1, b), (0.3, c)], b: [(0.1, a), (0.2, c)]}
+    assert session.commits == 1
+
+
+def test_add_merges_into_neighbour_lists_and_queues_the_rest(monkeypatch):
+    new, near, far, unlisted, owner, other = (uuid4() for _ in range(6))
+    stale = []
+    monkeypatch.setattr(neighbors.neighbor_refresher, "mark_stale", lambda ids: stale.extend(ids))
+    svc = service(FakeSession([
+        # get_lists for the new item's hits
+        [(near, 0.2, owner), (near, 0.5, far), (far, 0.01, near), (far, 0.02, owner), (far, 0.03, other)],
+        # _reverse_candidates
+        [owner],
+    ]), k=3)
+    
+    async def nearest(content_id, embedding):
+        return [(0.1, near), (0.3, far), (0.4, unlisted)]
+    
+    svc.nearest = nearest
+    asyncio.run(svc.add(new, [1.0, 0.0]))
+    
+    lists = inserted_lists(svc.db)
+    assert lists[new] == [(0.1, near), (0.3, far), (0.4, unlisted)]
+    assert lists[near] == [(0.1, new), (0.2, owner), (0.5, far)]
+    assert far not in lists  # Full, and 0.3 does not beat its tail of 0.03
+    assert set(stale) == {owner, unlisted}
@@ -0,0 +1,133 @@
+import asyncio
+from contextlib import asynccontextmanager
+from uuid import uuid4
+
+import numpy as np
+from sqlalchemy.sql import Update
+
+from app.core.config import settings
+from app.services import preferences
+from app.services.preferences import PreferenceUpdater, consumption_weight, fold_signals
+from app.services.vector_search import normalize
+
+
+def sequential(preference, vectors, weights, rate):
+    p = preference
+    for c, w in zip(vectors, weights):
+        b = min(rate * abs(w), 1.0)
+        step = np.sign(w) * b * c
+        p = step if p is None else (1 - b) * p + step
+    return p / np.linalg.norm(p)
+
+
+def test_fold_matches_stepwise_moving_average():
+    rng = np.random.default_rng(0)
+    preference = normalize(rng.normal(size=8))
+    vectors = np.stack([normalize(v) for v in rng.normal(size=(6, 8))])
+    weights = np.array([1.0, -0.5, 0.25, 1.0, -1.0, 0.5], dtype=np.float32)
+    
+    folded = fold_signals(preference, vectors, weights, rate=0.3)
+    
+    np.testing.assert_allclose(folded, sequential(preference, vectors, weights, 0.3), atol=1e-5)
+    assert abs(np.linalg.norm(folded) - 1.0) < 1e-5
+
+
+def test_fold_without_preference_seeds_from_positive_signals_only():
+    vectors = np.eye(3, dtype=np.float32)
+    
+    seeded = fold_signals(None, vectors, np.array([1.0, -1.0, 0.0]), rate=0.5)
+    
+    np.testing.assert_allclose(seeded, [1.0, 0.0, 0.0], atol=1e-6)
+    assert fold_signals(None, vectors, np.array([-1.0, -0.5, 0.0]), rate=0.5) is None
+
+
+def test_consumption_weight():
+    assert consumption_weight(5, 100) == 1.0
+    assert consumption_weight(1, 100) == -1.0
+    assert consumption_weight(3, 100) == 0.0
+    assert consumption_weight(1, 0) == -0.25  # Floor for skimmed items
+    assert consumption_weight(None, 50) == 0.25
+
+
+def test_record_queues_agent_at_flush_events(monkeypatch):
+    monkeypatch.setattr(settings, "preference_learning_enabled", True)
+    updater = PreferenceUpdater(rate=0.1, flush_seconds=60, flush_events=2)
+    agent_id = uuid4()
+    
+    updater.record(agent_id, uuid4(), 0.0)
+    updater.record(agent_id, uuid4(), 1.0)
+    assert updater._due.empty()
+    updater.record(agent_id, uuid4(), -0.5)
+    assert updater._due.get_nowait() == agent_id
+    assert len(updater._pending[agent_id]) == 2
+
+
+class FakeResult:
+    def __init__(self, value):
+        self.value = value
+    
+    def all(self):
+        return self.value
+    
+    def scalar(self):
+        return self.value
+
+
+class FakeSession:
+    """Answers the stored-embedding and locked-preference SELECTs in order."""
+    
+    def __init__(self, *answers):
+        self.answers = list(answers)
+        self.updates = []
+        self.commits = 0
+    
+    async def execute(self, statement):
+        if isinstance(statement, Update):
+            self.updates.append(statement.compile().params)
+            return FakeResult(None)
+        return FakeResult(self.answers.pop(0))
+    
+    async def commit(self):
+        self.commits += 1
+    
+    async def rollback(self):
+        pass
+
+
+def test_flush_folds_stored_embeddings_and_invalidates(monkeypatch):
+    monkeypatch.setattr(preferences.vector_backend, "_header", None)
+    agent_id, liked, unknown = uuid4(), uuid4(), uuid4()
+    preference = [1.0, 0.0, 0.0]
+    session = FakeSession([(liked, [0.0, 2.0, 0.0])], preference)
+    invalidated = []
+    
+    @asynccontextmanager
+    async def session_maker():
+        yield session
+    
+    async def invalidate_pages(agent):
+        invalidated.append(("pages", agent))
+    
+    monkeypatch.setattr(preferences, "async_session_maker", session_maker)
+    monkeypatch.setattr(preferences.feed_queues, "invalidate", lambda agent: invalidated.append(("queue", agent)))
+    monkeypatch.setattr(preferences.feed_page_cache, "invalidate", invalidate_pages)
+    updater = PreferenceUpdater(rate=0.5, flush_seconds=60, flush_events=10)
+    updater._pending[agent_id] = [(liked, 1.0), (unknown, 1.0)]
+    
+    asyncio.run(updater.flush(agent_id))
+    
+    (params,) = session.updates
+    expected = fold_signals(np.array(preference), np.array([[0.0, 1.0, 0.0]]), np.array([1.0]), 0.5)
+    np.testing.assert_allclose(params["preference_embedding"], expected, atol=1e-6)
+    assert session.commits == 1
+    assert invalidated == [("queue", agent_id), ("pages", agent_id)]
+    assert agent_id not in updater._pending
+
+
+def test_apply_skips_signals_without_embeddings(monkeypatch):
+    monkeypatch.setattr(preferences.vector_backend, "_header", None)
+    session = FakeSession([])
+    updater = PreferenceUpdater(rate=0.5, flush_seconds=60, flush_events=10)
+    
+    assert not asyncio.run(updater._apply(session, uuid4(), [(uuid4(), 1.0)]))
+    assert not session.updates and not session.answers
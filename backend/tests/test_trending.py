@@ -0,0 +1,96 @@
+import asyncio
+from uuid import uuid4
+
+from app.models.content import ContentType
+from app.services.trending import TrendingEngine, TrendingWindow
+
+
+def ids_of(window, after=None):
+    return [content_id for _, content_id in window.iter_after(after)]
+
+
+def test_ranking_follows_decayed_scores():
+    window = TrendingWindow(half_life=100)
+    old, recent, repeated = uuid4(), uuid4(), uuid4()
+    window.add(old, 3.0, at=0)  # Worth 1.5 at t=100
+    window.add(recent, 2.0, at=100)
+    window.add(repeated, 1.0, at=0)
+    
+    assert ids_of(window) == [recent, old, repeated]
+    window.add(repeated, 2.5, at=100)  # 0.5 + 2.5
+    assert ids_of(window) == [repeated, recent, old]
+    assert len(window._ranked) == 3
+
+
+def test_cursor_pages_stay_stable_as_hits_arrive():
+    window = TrendingWindow(half_life=100)
+    items = [uuid4() for _ in range(5)]
+    for i, content_id in enumerate(items):
+        window.add(content_id, float(5 - i), at=0)
+    
+    first = list(window.iter_after())[:2]
+    window.add(items[4], 10.0, at=0)  # Jumps to the top, behind the cursor
+    
+    assert ids_of(window, after=first[-1]) == items[2:4]
+
+
+def test_remove_and_prune():
+    window = TrendingWindow(half_life=100)
+    items = [uuid4() for _ in range(5)]
+    for i, content_id in enumerate(items):
+        window.add(content_id, float(5 - i), at=0)
+    
+    window.remove(items[1])
+    window.remove(uuid4())
+    assert ids_of(window) == [items[0], *items[2:]]
+    window.prune(2)
+    assert ids_of(window) == [items[0], items[2]]
+    assert set(window._scores) == {items[0], items[2]}
+
+
+def test_engine_filters_by_type_and_drops_removed():
+    engine = TrendingEngine(max_items=10)
+    video, short = uuid4(), uuid4()
+    engine.record(video, "video")
+    engine.record(short, "short", weight=2.0)
+    
+    assert [cid for _, cid in engine.ranked("24h")] == [short, video]
+    assert [cid for _, cid in engine.ranked("24h", content_type="video")] == [video]
+    engine.remove(short)
+    assert [cid for _, cid in engine.ranked("1h")] == [video]
+
+
+class FakeResult:
+    def __init__(self, rows):
+        self.rows = rows
+    
+    def all(self):
+        return self.rows
+
+
+class FakeSession:
+    """Answers each window's consumption query, then its view query."""
+    
+    def __init__(self, consumed, viewed):
+        self.consumed = consumed
+        self.viewed = viewed
+        self.calls = 0
+    
+    async def execute(self, query):
+        self.calls += 1
+        return FakeResult(self.consumed if self.calls % 2 else self.viewed)
+
+
+def test_load_seeds_from_consumptions_and_views():
+    consumed, viewed, both = uuid4(), uuid4(), uuid4()
+    session = FakeSession(
+        consumed=[(consumed, ContentType.VIDEO, 2.0), (both, ContentType.SHORT, 1.0)],
+        viewed=[(viewed, ContentType.VIDEO, 0.5), (both, ContentType.SHORT, 1.5)],
+    )
+    engine = TrendingEngine(max_items=10)
+    
+    asyncio.run(engine.load(session))
+    
+    assert session.calls == 6
+    assert [cid for _, cid in engine.ranked("7d")] == [both, consumed, viewed]
+    assert [cid for _, cid in engine.ranked("7d", content_type="short")] == [both]
@@ -0,0 +1,153 @@
+import asyncio
+import json
+from datetime import datetime
+from uuid import uuid4
+
+import numpy as np
+
+from app.models.content import ContentType
+from app.services.vector_search import MemmapVectorBackend, normalize
+
+
+def make_backend(tmp_path, rows=()):
+    backend = MemmapVectorBackend(path=str(tmp_path), dimensions=4, block_rows=3)
+    with backend._locked():
+        backend._header = np.memmap(str(tmp_path / "header.i64"), dtype=np.int64, mode="w+", shape=(2,))
+        backend._header[:] = (0, 0)
+        backend._resize(4)
+    if rows:
+        backend._append_many(rows)
+    return backend
+
+
+def random_rows(count, seed=0):
+    rng = np.random.default_rng(seed)
+    return [
+        (uuid4(), "video" if i % 2 else "short", rng.normal(size=4).tolist())
+        for i in range(count)
+    ]
+
+
+def brute_force(rows, query, content_type=None):
+    q = normalize(query)
+    hits = [
+        (float(np.float32(1.0 - normalize(vector) @ q)), content_id)
+        for content_id, row_type, vector in rows
+        if content_type is None or row_type == content_type
+    ]
+    return sorted(hits)
+
+
+def test_search_many_matches_brute_force_across_blocks(tmp_path):
+    rows = random_rows(20)
+    backend = make_backend(tmp_path, rows)
+    queries = [[1, 0, 0, 0], [0, 1, 1, 0]]
+    
+    results = backend._search_many(queries, 5)
+    
+    for query, hits in zip(queries, results):
+        assert [cid for _, cid in hits] == [cid for _, cid in brute_force(rows, query)[:5]]
+    assert backend._search_many(queries, 5, content_type="short")[0] == brute_force(
+        rows, queries[0], "short"
+    )[:5]
+
+
+def test_search_many_pages_through_ties_with_cursor(tmp_path):
+    rows = random_rows(7) + [(uuid4(), "video", [1.0, 1.0, 0.0, 0.0]) for _ in range(5)]
+    backend = make_backend(tmp_path, rows)
+    query = [1.0, 1.0, 0.0, 0.0]
+    
+    seen, after = [], None
+    while True:
+        page = backend._search_many([query], 2, after=after)[0]
+        if not page:
+            break
+        seen += page
+        after = page[-1]
+    
+    assert seen == brute_force(rows, query)
+
+
+def test_replaced_and_removed_rows_leave_results(tmp_path):
+    rows = random_rows(6)
+    backend = make_backend(tmp_path, rows)
+    moved, gone = rows[0][0], rows[1][0]
+    
+    backend._append_many([(moved, "video", [0.0, 0.0, 0.0, 1.0])])
+    backend._remove_many([gone])
+    hits = backend._search_many([[0.0, 0.0, 0.0, 1.0]], 10)[0]
+    
+    ids = [cid for _, cid in hits]
+    assert ids[0] == moved and ids.count(moved) == 1
+    assert gone not in ids
+    assert len(hits) == 5
+
+
+class FakeResult:
+    def __init__(self, value):
+        self.value = value
+    
+    def one(self):
+        return self.value
+    
+    def scalars(self):
+        return self
+    
+    def all(self):
+        return self.value
+
+
+class FakeStream:
+    def __init__(self, rows):
+        self.rows = rows
+    
+    async def partitions(self, size):
+        for start in range(0, len(self.rows), size):
+            yield self.rows[start:start + size]
+
+
+class FakeSession:
+    """Answers execute() and stream() calls in order."""
+    
+    def __init__(self, executes, streams):
+        self.executes = list(executes)
+        self.streams = list(streams)
+    
+    async def execute(self, query):
+        return FakeResult(self.executes.pop(0))
+    
+    async def stream(self, query):
+        return FakeStream(self.streams.pop(0))
+
+
+def test_catch_up_appends_new_rows_and_tombstones_deleted(tmp_path):
+    kept, deleted = random_rows(2)
+    backend = make_backend(tmp_path, [kept, deleted])
+    added = (uuid4(), "short", [0.0, 1.0, 0.0, 0.0])
+    latest = datetime(2024, 5, 1)
+    session = FakeSession(
+        executes=[(2, latest), [kept[0], added[0]]],
+        streams=[[
+            (kept[0], ContentType.VIDEO, kept[2]),
+            (added[0], ContentType.SHORT, added[2]),
+        ]],
+    )
+    
+    asyncio.run(backend.catch_up(session))
+    
+    assert set(backend._row_by_id) == {kept[0], added[0]}
+    assert backend._search_many([added[2]], 1)[0][0][1] == added[0]
+    with open(tmp_path / "sync.json") as f:
+        assert json.load(f) == {"latest": latest.isoformat()}
+
+
+def test_catch_up_skips_scan_when_in_sync(tmp_path):
+    rows = random_rows(3)
+    backend = make_backend(tmp_path, rows)
+    latest = datetime(2024, 5, 1)
+    backend._write_state({"latest": latest.isoformat()})
+    session = FakeSession(executes=[(3, latest)], streams=[])
+    
+    asyncio.run(backend.catch_up(session))
+    
+    assert not session.executes and len(backend._row_by_id) == 3
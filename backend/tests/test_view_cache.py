@@ -0,0 +1,67 @@
+import json
+from datetime import datetime
+
+from app.schemas.content import ContentAgentView
+from app.services.view_cache import AgentViewCache
+
+
+def make_view(version=None, **fields):
+    view = ContentAgentView(id="c1", **fields)
+    view._version = version
+    return view
+
+
+def test_hits_only_for_the_same_row_version():
+    cache = AgentViewCache(max_bytes=10_000, ttl_seconds=60)
+    first, second = datetime(2024, 1, 1), datetime(2024, 1, 2)
+    
+    cache.fragment(make_view(first, title="Old"))
+    assert cache.fragment(make_view(first, title="Old")) == b'{"id":"c1","title":"Old"}'
+    assert cache.fragment(make_view(second, title="New")) == b'{"id":"c1","title":"New"}'
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_projections_are_cached_separately():
+    cache = AgentViewCache(max_bytes=10_000, ttl_seconds=60)
+    version = datetime(2024, 1, 1)
+    
+    full = cache.fragment(make_view(version, title="T", summary="S"))
+    short = cache.fragment(make_view(version, title="T"))
+    
+    assert json.loads(full) == {"id": "c1", "title": "T", "summary": "S"}
+    assert json.loads(short) == {"id": "c1", "title": "T"}
+    assert cache.misses == 2
+
+
+def test_unversioned_views_expire_by_ttl():
+    cache = AgentViewCache(max_bytes=10_000, ttl_seconds=0)
+    cache.fragment(make_view(title="T"))
+    cache.fragment(make_view(title="T"))
+    assert cache.hits == 0
+
+
+def test_render_splices_per_request_fields_uncached():
+    cache = AgentViewCache(max_bytes=10_000, ttl_seconds=60)
+    version = datetime(2024, 1, 1)
+    
+    first = json.loads(cache.render(make_view(version, title="T", relevance_score=0.9)))
+    second = json.loads(cache.render(make_view(version, title="T", relevance_score=0.5)))
+    
+    assert first == {"id": "c1", "title": "T", "relevance_score": 0.9}
+    assert second["relevance_score"] == 0.5
+    assert cache.hits == 1
+
+
+def test_evicts_least_recent_by_bytes_and_invalidates():
+    cache = AgentViewCache(max_bytes=70, ttl_seconds=60)  # Two 31-byte views
+    version = datetime(2024, 1, 1)
+    for content_id in ("a", "b", "c"):
+        view = ContentAgentView(id=content_id, title="x" * 10)
+        view._version = version
+        cache.fragment(view)
+    
+    assert list(cache._entries) == ["b", "c"]
+    assert cache.size == 62
+    cache.invalidate("c")
+    assert list(cache._entries) == ["b"]
+    assert cache.size == len(b'{"id":"b","title":"xxxxxxxxxx"}')